@@ -350,6 +350,10 @@ let activeState = "ALL";
 let reportBundle = fallbackReportBundle;
 let scoreBundle = fallbackScoreBundle;
 let peerOutlierBundle = fallbackPeerOutlierBundle;
+let stateShardIndex = null;
+const stateShardRequests = {};
+const ARTIFACT_ROOT = "outputs/json/";
+let artifactManifest = null;
 let mapPaths = null;
 let mapPuertoRicoPath = null;
 let currentMapStates = [];
@@ -393,8 +397,25 @@ function ensureReadout(canvas) {
   return el;
 }
 
+async function loadArtifactManifest() {
+  // The manifest is the only mutable file; everything it points at is content-hashed.
+  try {
+    const res = await fetch(`${ARTIFACT_ROOT}manifest.json`, { cache: "no-store" });
+    if (res.ok) artifactManifest = await res.json();
+  } catch (_err) {
+    artifactManifest = null;
+  }
+}
+
+function artifactPath(path) {
+  if (!path.startsWith(ARTIFACT_ROOT)) return null;
+  const entry = artifactManifest?.files?.[path.slice(ARTIFACT_ROOT.length)];
+  return entry ? ARTIFACT_ROOT + entry.path : null;
+}
+
 async function loadJSON(path) {
-  const res = await fetch(path, { cache: "no-store" });
+  const hashed = artifactPath(path);
+  const res = hashed ? await fetch(hashed) : await fetch(path, { cache: "no-store" });
   if (!res.ok) throw new Error(`Missing ${path}`);
   return res.json();
 }
@@ -421,9 +442,47 @@ async function loadScoreBundle() {
   return { default_state: "ALL", available_states: ["ALL"], scores: { ALL: score } };
 }
 
+async function loadStateShardIndex() {
+  try {
+    const index = await loadJSON("outputs/json/states/index.json");
+    if (index && index.states) return index;
+  } catch (_err) {
+    // fall through
+  }
+  return null;
+}
+
 async function loadData() {
-  const [reports, scores, peerOutliers] = await Promise.all([loadReportBundle(), loadScoreBundle(), loadPeerOutlierBundle()]);
-  return { reports, scores, peerOutliers };
+  await loadArtifactManifest();
+  const [index, scores] = await Promise.all([loadStateShardIndex(), loadScoreBundle()]);
+  if (index) {
+    // Sharded layout: only the index up front; each state's report and outliers load on selection.
+    const header = { default_state: index.default_state || "ALL", available_states: index.available_states || ["ALL"] };
+    return {
+      index,
+      reports: { ...header, reports: {} },
+      scores,
+      peerOutliers: { ...header, methodology: index.peer_methodology || fallbackPeerOutlierBundle.methodology, outliers: {} }
+    };
+  }
+  const [reports, peerOutliers] = await Promise.all([loadReportBundle(), loadPeerOutlierBundle()]);
+  return { index: null, reports, scores, peerOutliers };
+}
+
+function loadStateShard(state) {
+  const name = stateShardIndex?.states?.[state];
+  if (!name) return Promise.resolve();
+  if (!stateShardRequests[state]) {
+    stateShardRequests[state] = loadJSON(`outputs/json/states/${name}`)
+      .then((shard) => {
+        reportBundle.reports[state] = shard.report;
+        peerOutlierBundle.outliers[state] = shard.peer_outliers || [];
+      })
+      .catch(() => {
+        delete stateShardRequests[state];
+      });
+  }
+  return stateShardRequests[state];
 }
 
 async function loadPeerOutlierBundle() {
@@ -1068,7 +1127,10 @@ function updateMapActiveState() {
   }
 }
 
-function renderActiveState() {
+async function renderActiveState() {
+  const state = activeState;
+  await loadStateShard(state);
+  if (state !== activeState) return;
   const report = resolveReportForState(activeState);
   const score = resolveScoreForState(activeState);
   renderReport(report);
@@ -1227,7 +1289,8 @@ function scheduleMapResize() {
   }, 140);
 }
 
-loadData().then(async ({ reports, scores, peerOutliers }) => {
+loadData().then(async ({ index, reports, scores, peerOutliers }) => {
+  stateShardIndex = index;
   reportBundle = reports || fallbackReportBundle;
   scoreBundle = scores || fallbackScoreBundle;
   peerOutlierBundle = peerOutliers || fallbackPeerOutlierBundle;
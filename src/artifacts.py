@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import time
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # optional: without it only the .gz variants are written
+    brotli = None
+
+# Immutable copies of the site's JSON outputs. Each published file is copied to
+# assets/<name>.<content hash>.json next to .gz/.br siblings, and manifest.json maps the logical
+# name (path under outputs/json) to the hashed copy. Only the manifest has to be fetched uncached;
+# a hashed file never changes once written, so it can be cached indefinitely. A page that loaded an
+# older manifest keeps fetching state shards lazily, so superseded copies stay on disk while one of
+# the last ARTIFACT_KEEP_MANIFESTS manifests (listed in manifest_history.json) still points at them,
+# or while they are younger than ARTIFACT_GRACE_SECONDS.
+
+OUT_JSON = Path("outputs/json")
+ASSETS_DIRNAME = "assets"
+ARTIFACT_MANIFEST_NAME = "manifest.json"
+ARTIFACT_MANIFEST_VERSION = 1
+ARTIFACT_HISTORY_NAME = "manifest_history.json"
+ARTIFACT_KEEP_MANIFESTS = 5
+ARTIFACT_GRACE_SECONDS = 7 * 24 * 3600
+HASH_CHARS = 16
+
+PUBLISHED_JSON = (
+    "report.json",
+    "report_by_state.json",
+    "provider_peer_outliers_by_state.json",
+    "signal_score.json",
+    "signal_score_by_state.json",
+    "states/index.json",
+)
+PUBLISHED_GLOBS = ("states/*.json",)
+
+
+def published_names(json_dir: Path) -> list[str]:
+    names = {name for name in PUBLISHED_JSON if (json_dir / name).exists()}
+    for pattern in PUBLISHED_GLOBS:
+        names.update(path.relative_to(json_dir).as_posix() for path in json_dir.glob(pattern))
+    return sorted(names)
+
+
+def hashed_name(name: str, digest: str) -> str:
+    stem, _, suffix = name.rpartition(".")
+    return f"{stem}.{digest[:HASH_CHARS]}.{suffix}"
+
+
+def write_if_missing(path: Path, data: bytes) -> int:
+    # Content-addressed, so an existing file already holds these bytes.
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(data)
+        tmp.replace(path)
+    return path.stat().st_size
+
+
+def publish_file(json_dir: Path, assets_dir: Path, name: str) -> dict:
+    data = (json_dir / name).read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+    target = assets_dir / hashed_name(name, digest)
+    entry = {
+        "path": target.relative_to(json_dir).as_posix(),
+        "sha256": digest,
+        "bytes": write_if_missing(target, data),
+    }
+    gz_path = target.with_name(target.name + ".gz")
+    if not gz_path.exists():
+        # mtime=0 keeps the compressed bytes a function of the content alone.
+        write_if_missing(gz_path, gzip.compress(data, compresslevel=9, mtime=0))
+    entry["gzip_bytes"] = gz_path.stat().st_size
+    if brotli is not None:
+        br_path = target.with_name(target.name + ".br")
+        if not br_path.exists():
+            write_if_missing(br_path, brotli.compress(data, quality=11))
+        entry["br_bytes"] = br_path.stat().st_size
+    return entry
+
+
+def write_json_atomic(path: Path, data: object) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    tmp.replace(path)
+
+
+def manifest_history(json_dir: Path, files: dict) -> list[dict]:
+    # Most recent first: this publish, then the manifests it replaces.
+    history_path = json_dir / ARTIFACT_HISTORY_NAME
+    history = json.loads(history_path.read_text(encoding="utf-8")) if history_path.exists() else []
+    manifest_path = json_dir / ARTIFACT_MANIFEST_NAME
+    if not history and manifest_path.exists():
+        previous = json.loads(manifest_path.read_text(encoding="utf-8"))
+        paths = sorted(entry["path"] for entry in previous["files"].values())
+        history = [{"published_at": int(manifest_path.stat().st_mtime), "paths": paths}]
+    current = {"published_at": int(time.time()), "paths": sorted(e["path"] for e in files.values())}
+    if history and history[0]["paths"] == current["paths"]:
+        history = history[1:]
+    return [current, *history][:ARTIFACT_KEEP_MANIFESTS]
+
+
+def publish_artifacts(json_dir: Path = OUT_JSON) -> Path:
+    assets_dir = json_dir / ASSETS_DIRNAME
+    files = {name: publish_file(json_dir, assets_dir, name) for name in published_names(json_dir)}
+    history = manifest_history(json_dir, files)
+
+    manifest_path = json_dir / ARTIFACT_MANIFEST_NAME
+    write_json_atomic(manifest_path, {"version": ARTIFACT_MANIFEST_VERSION, "files": files})
+    write_json_atomic(json_dir / ARTIFACT_HISTORY_NAME, history)
+
+    # Drop hashed copies that no recent manifest points at, once they are past the grace period.
+    keep = set()
+    for entry in history:
+        for path in entry["paths"]:
+            target = json_dir / path
+            keep.update({target, target.with_name(target.name + ".gz"), target.with_name(target.name + ".br")})
+    cutoff = time.time() - ARTIFACT_GRACE_SECONDS
+    if assets_dir.exists():
+        for path in assets_dir.rglob("*"):
+            if path.is_file() and path not in keep and path.stat().st_mtime < cutoff:
+                path.unlink()
+    return manifest_path
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from signal_score import (
+    FAMILY_NAMES,
+    FEATURE_KEYS,
+    THRESHOLD_NAMES,
+    calibrate_null_baseline,
+    failure_masks,
+    read_state_bundle,
+    state_feature_matrix,
+)
+
+# Scores every state of many report bundles (releases, synthetic variants) in one pass for
+# backtesting. Features of all bundles form one table; thresholds are calibrated once on a reference
+# bundle or per bundle, broadcast to the rows, and the signal rules run column-wise over everything.
+
+BATCH_SCORES_PATH = Path("outputs/tables/batch_scores.csv")
+BUNDLE_NAMES = ("report_features_by_state.json", "states/index.json", "report_by_state.json")
+
+
+def resolve_bundle(path: Path) -> Path:
+    if path.is_file():
+        return path
+    for name in BUNDLE_NAMES:
+        if (path / name).exists():
+            return path / name
+    raise SystemExit(f"No report bundle under {path} (looked for {', '.join(BUNDLE_NAMES)})")
+
+
+def bundle_features(label: str, reports: dict[str, dict]) -> pd.DataFrame:
+    states = [state for state, rep in reports.items() if isinstance(rep, dict)]
+    frame = pd.DataFrame(state_feature_matrix([reports[state] for state in states]), columns=list(FEATURE_KEYS))
+    frame.insert(0, "state", states)
+    frame.insert(0, "bundle", label)
+    return frame
+
+
+def score_features(features: pd.DataFrame, thresholds: pd.DataFrame) -> pd.DataFrame:
+    # thresholds holds one row per feature row, so bundles with different calibrations score together.
+    signals, families = failure_masks(
+        features[list(FEATURE_KEYS)].to_numpy(), thresholds[list(THRESHOLD_NAMES)].to_numpy()
+    )
+
+    out = features.copy()
+    for k, name in enumerate(FAMILY_NAMES):
+        out[f"fail_{name}"] = families[:, k]
+    out["fail_count"] = families.sum(axis=1)
+    out["raw_fail_count"] = signals.sum(axis=1)
+    out["verdict"] = np.where(out["fail_count"] >= 3, "LIKELY_SYNTHETIC_OR_ALTERED", "NOT_FLAGGED_BY_3PLUS_RULE")
+    for name in THRESHOLD_NAMES:
+        out[f"threshold_{name}"] = thresholds[name].to_numpy()
+    return out
+
+
+def batch_score(
+    bundles: dict[str, dict],
+    calibration: str = "once",
+    reference: str | None = None,
+    n_samples: int | None = None,
+) -> pd.DataFrame:
+    if not bundles:
+        return pd.DataFrame()
+    features = pd.concat(
+        [bundle_features(label, bundle.get("reports", {})) for label, bundle in bundles.items()], ignore_index=True
+    )
+
+    if calibration == "per-bundle":
+        calibrated_on = {label: label for label in bundles}
+    else:
+        ref = reference or next(iter(bundles))
+        calibrated_on = {label: ref for label in bundles}
+    calibrations = {
+        label: calibrate_null_baseline(bundles[label].get("reports", {}), n_samples=n_samples)["thresholds"]
+        for label in set(calibrated_on.values())
+    }
+    per_bundle = pd.DataFrame.from_dict({label: calibrations[ref] for label, ref in calibrated_on.items()}, orient="index")
+    thresholds = per_bundle.loc[features["bundle"]].reset_index(drop=True)
+
+    scored = score_features(features, thresholds)
+    scored.insert(2, "calibrated_on", features["bundle"].map(calibrated_on))
+    return scored
+
+
+def write_table(frame: pd.DataFrame, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix == ".parquet":
+        frame.to_parquet(path, index=False)
+    else:
+        frame.to_csv(path, index=False)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Score many report bundles in one pass for backtesting.")
+    parser.add_argument(
+        "bundles",
+        nargs="+",
+        type=Path,
+        help="report_features_by_state.json, states/index.json or report_by_state.json files, or directories containing one",
+    )
+    parser.add_argument(
+        "--labels",
+        default="",
+        help="comma-separated bundle labels in the same order (default: the paths as given)",
+    )
+    parser.add_argument(
+        "--calibration",
+        choices=("once", "per-bundle"),
+        default="once",
+        help="calibrate thresholds once on the reference bundle, or separately for each bundle",
+    )
+    parser.add_argument("--reference", default=None, help="label of the bundle calibrated on with --calibration once (default: first)")
+    parser.add_argument("--null-samples", type=int, default=None, help="null-model bootstrap samples per calibration")
+    parser.add_argument("--out", type=Path, default=BATCH_SCORES_PATH, help="results table (.csv or .parquet)")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    labels = [label.strip() for label in args.labels.split(",") if label.strip()] or [str(p) for p in args.bundles]
+    if len(labels) != len(args.bundles):
+        raise SystemExit("--labels needs one label per bundle")
+    if len(set(labels)) != len(labels):
+        raise SystemExit("Bundle labels must be unique")
+    if args.reference is not None and args.reference not in labels:
+        raise SystemExit(f"Unknown --reference {args.reference}")
+
+    bundles = {label: read_state_bundle(resolve_bundle(path)) for label, path in zip(labels, args.bundles)}
+    scored = batch_score(bundles, args.calibration, args.reference, args.null_samples)
+    write_table(scored, args.out)
+
+    flagged = scored[scored["verdict"] == "LIKELY_SYNTHETIC_OR_ALTERED"]
+    print(f"Scored {len(scored)} states across {len(bundles)} bundles ({len(flagged)} flagged)")
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import duckdb
+
+from provider_score import PROVIDER_BASELINE_PATH, PROVIDER_FAMILY_FAIL_RATE
+from report import BUILD_PROFILE_PATH
+from synth_claims import DEFAULT_CODES, DEFAULT_MONTHS, default_providers, generate, parse_scale
+
+# Runs the pipeline against synthetic data at several scales. report.py and friends use paths
+# relative to the working directory, so each scale gets its own workspace and the scripts run there.
+
+SRC_DIR = Path(__file__).resolve().parent
+BENCH_DIR = Path("outputs/bench")
+BENCH_RESULTS_PATH = BENCH_DIR / "results.jsonl"
+DEFAULT_SCALES = "1M,10M,100M"
+REGRESSION_TOLERANCE = 0.10
+REGRESSION_MIN_SECONDS = 0.5
+# Synthetic claims carry no planted anomalies, so each family's cross-fitted provider fail rate should sit
+# near the nominal rate the thresholds were calibrated to: within a point, or three standard errors when
+# there are too few providers for that. The calibration folds count too, since thresholds are estimates.
+PROVIDER_FAIL_RATE_TOLERANCE = 0.01
+PROVIDER_FAIL_RATE_SIGMAS = 3.0
+
+# Both report configurations rebuild medicaid_enriched so every run pays the same base cost.
+REPORT_CONFIGS = {
+    "fused": ["--no-enriched-cache"],
+    "per-builder": ["--no-enriched-cache", "--scan-mode", "per-builder", "--builder-workers", "1"],
+}
+
+
+def run_step(workdir: Path, script: str, args: list[str], log_path: Path) -> float:
+    started = time.perf_counter()
+    with log_path.open("a", encoding="utf-8") as log:
+        log.write(f"$ {script} {' '.join(args)}\n")
+        log.flush()
+        result = subprocess.run(
+            [sys.executable, "-u", str(SRC_DIR / script), *args],
+            cwd=workdir,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"{script} failed in {workdir} (exit {result.returncode}); see {log_path}")
+    return time.perf_counter() - started
+
+
+def bench_scale(scale: str, workdir: Path, configs: list[str], seed: int) -> dict:
+    rows = parse_scale(scale)
+    workdir.mkdir(parents=True, exist_ok=True)
+    log_path = workdir / "benchmark.log"
+    log_path.write_text("", encoding="utf-8")
+
+    started = time.perf_counter()
+    generated = generate(workdir, rows, default_providers(rows), DEFAULT_CODES, DEFAULT_MONTHS, seed)
+    generate_s = time.perf_counter() - started if generated else None
+
+    timings: dict[str, float] = {}
+    timings["build_npi_state_lookup"] = run_step(workdir, "build_npi_state_lookup.py", [], log_path)
+    for config in configs:
+        key = f"report[{config}]"
+        timings[key] = run_step(workdir, "report.py", [*REPORT_CONFIGS[config], "--profile"], log_path)
+        profile = json.loads((workdir / BUILD_PROFILE_PATH).read_text(encoding="utf-8"))
+        for stage in profile["stages"]:
+            timings[f"{key}.{stage['stage']}"] = stage["wall_s"]
+    timings["signal_score"] = run_step(workdir, "signal_score.py", [], log_path)
+    timings["provider_score"] = run_step(workdir, "provider_score.py", [], log_path)
+    baseline = json.loads((workdir / PROVIDER_BASELINE_PATH).read_text(encoding="utf-8"))
+
+    return {
+        "scale": scale,
+        "rows": rows,
+        "seed": seed,
+        "generate_s": generate_s,
+        "timings_s": timings,
+        "provider_calibration": baseline["n_calibration"],
+        "provider_holdout": baseline["n_holdout"],
+        "provider_family_fail_rate": baseline["holdout_family_fail_rate"],
+    }
+
+
+def git_revision() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=SRC_DIR, capture_output=True, text=True, check=True
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip() or None
+
+
+def load_results(path: Path) -> list[dict]:
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def compare_results(current: dict, previous: dict | None, tolerance: float) -> list[str]:
+    if previous is None:
+        return [f"{current['scale']}: no earlier result to compare against"]
+    lines = [f"{current['scale']}: compared with {previous.get('revision') or '?'} ({previous.get('timestamp')})"]
+    for key, seconds in current["timings_s"].items():
+        before = previous["timings_s"].get(key)
+        if not before:
+            continue
+        change = (seconds - before) / before
+        regressed = change > tolerance and seconds - before > REGRESSION_MIN_SECONDS
+        flag = "  REGRESSION" if regressed else ""
+        lines.append(f"  {key:<55} {before:9.2f}s -> {seconds:9.2f}s ({change:+.1%}){flag}")
+    return lines
+
+
+def check_provider_rates(current: dict) -> list[str]:
+    n = current.get("provider_holdout") or 0
+    n_cal = current.get("provider_calibration") or 0
+    p = PROVIDER_FAMILY_FAIL_RATE
+    stderr = math.sqrt(p * (1 - p) * (1 / max(n, 1) + 1 / max(n_cal, 1)))
+    tolerance = max(PROVIDER_FAIL_RATE_TOLERANCE, PROVIDER_FAIL_RATE_SIGMAS * stderr)
+    lines = [f"{current['scale']}: held-out provider fail rates over {n} providers (nominal {p:.1%} ± {tolerance:.1%})"]
+    for family, rate in current.get("provider_family_fail_rate", {}).items():
+        off = rate is None or abs(rate - p) > tolerance
+        flag = "  OFF-NOMINAL" if off else ""
+        shown = "n/a" if rate is None else f"{rate:.2%}"
+        lines.append(f"  {family:<55} {shown:>9}{flag}")
+    return lines
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic claims at several scales.")
+    parser.add_argument("--scales", default=DEFAULT_SCALES, help="comma-separated row counts, e.g. 1M,10M,100M")
+    parser.add_argument("--workdir", type=Path, default=BENCH_DIR, help="parent directory for per-scale workspaces")
+    parser.add_argument("--results", type=Path, default=BENCH_RESULTS_PATH, help="JSON-lines file results are appended to")
+    parser.add_argument(
+        "--report-configs",
+        default=",".join(REPORT_CONFIGS),
+        help=f"comma-separated report.py configurations to time ({', '.join(REPORT_CONFIGS)})",
+    )
+    parser.add_argument("--label", default="", help="free-form note stored with the results")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=REGRESSION_TOLERANCE,
+        help="flag timings that got slower than this fraction versus the previous run at the same scale",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    configs = [c.strip() for c in args.report_configs.split(",") if c.strip()]
+    unknown = [c for c in configs if c not in REPORT_CONFIGS]
+    if unknown:
+        raise SystemExit(f"Unknown report configuration(s): {', '.join(unknown)}")
+
+    history = load_results(args.results)
+    args.results.parent.mkdir(parents=True, exist_ok=True)
+    environment = {
+        "revision": git_revision(),
+        "label": args.label,
+        "python": platform.python_version(),
+        "duckdb": duckdb.__version__,
+        "cpu_count": os.cpu_count(),
+    }
+
+    for scale in [s.strip() for s in args.scales.split(",") if s.strip()]:
+        result = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            **environment,
+            **bench_scale(scale, args.workdir / scale.lower(), configs, args.seed),
+        }
+        previous = next(
+            (r for r in reversed(history) if r.get("scale") == scale and r.get("seed") == result["seed"]), None
+        )
+        with args.results.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+        history.append(result)
+        print("\n".join(compare_results(result, previous, args.tolerance)), flush=True)
+        print("\n".join(check_provider_rates(result)), flush=True)
+
+    print(f"Wrote {args.results}")
+
+
+if __name__ == "__main__":
+    main()
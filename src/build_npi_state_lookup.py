@@ -1,12 +1,17 @@
 from __future__ import annotations
 
-import csv
-import io
+import hashlib
 import json
+import re
+import time
 import zipfile
+from datetime import datetime
 from pathlib import Path
 
 import duckdb
+import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
 
 PARQUET_PATH = Path("data/medicaid-provider-spending.parquet")
 NPPES_ZIP_PATH = Path("data/nppes/NPPES_Data_Dissemination_February_2026.zip")
@@ -15,6 +20,23 @@ OUT_SUMMARY_PATH = Path("outputs/json/state_enrichment.json")
 OUT_STATE_ROLLUP_PATH = Path("outputs/tables/state_rollup_by_billing_state.csv")
 OUT_PREVIEW_PATH = Path("outputs/tables/medicaid_with_state_preview.csv")
 
+NPPES_NPI_COLUMN = "NPI"
+NPPES_PRACTICE_STATE_COLUMN = "Provider Business Practice Location Address State Name"
+NPPES_MAILING_STATE_COLUMN = "Provider Business Mailing Address State Name"
+NPPES_BLOCK_SIZE = 64 << 20
+MAX_NPI_KEY = 9_999_999_999
+NPPES_INDEX_DIR = Path("outputs/cache/nppes")
+NPPES_INDEX_FORMAT_VERSION = 3
+NPPES_WEEKLY_GLOB = "NPPES_Data_Dissemination_*_Weekly*.zip"
+NPPES_WEEKLY_DATES_RE = re.compile(r"_(\d{6})_(\d{6})_Weekly")
+NPPES_MONTHLY_DATE_RE = re.compile(r"_([A-Za-z]+_\d{4})$")
+
+
+def npi_key_sql(expr: str) -> str:
+    # NPIs are joined as BIGINT keys; the zero-padded 10-digit string only appears in outputs.
+    value = f"TRY_CAST(TRIM(CAST({expr} AS VARCHAR)) AS BIGINT)"
+    return f"(CASE WHEN {value} BETWEEN 0 AND {MAX_NPI_KEY} THEN {value} END)"
+
 
 def find_main_nppes_csv(zf: zipfile.ZipFile) -> str:
     names = [n for n in zf.namelist() if n.startswith("npidata_pfile_") and n.endswith(".csv")]
@@ -25,68 +47,215 @@ def find_main_nppes_csv(zf: zipfile.ZipFile) -> str:
     return names[0]
 
 
-def get_target_npis(con: duckdb.DuckDBPyConnection) -> set[str]:
-    rows = con.execute(
+def build_npi_activity(con: duckdb.DuckDBPyConnection) -> int:
+    # The only full pass over the claims parquet: per-NPI row counts and sums for the billing
+    # and the servicing role. Targets, coverage and the state rollup are all derived from it.
+    con.execute(
         f"""
-        WITH npis AS (
-          SELECT BILLING_PROVIDER_NPI_NUM AS npi
-          FROM read_parquet('{PARQUET_PATH}')
-          WHERE BILLING_PROVIDER_NPI_NUM IS NOT NULL
-          UNION
-          SELECT SERVICING_PROVIDER_NPI_NUM AS npi
+        CREATE OR REPLACE TEMP TABLE npi_activity AS
+        SELECT *, {npi_key_sql("npi")} AS npi_key
+        FROM (
+          SELECT
+            CASE WHEN GROUPING(BILLING_PROVIDER_NPI_NUM) = 0 THEN 'billing' ELSE 'servicing' END AS role,
+            COALESCE(BILLING_PROVIDER_NPI_NUM, SERVICING_PROVIDER_NPI_NUM) AS npi,
+            COUNT(*) AS rows,
+            SUM(TOTAL_CLAIMS) AS total_claims,
+            SUM(TOTAL_PAID) AS total_paid,
+            SUM(TOTAL_UNIQUE_BENEFICIARIES) AS total_bens
           FROM read_parquet('{PARQUET_PATH}')
-          WHERE SERVICING_PROVIDER_NPI_NUM IS NOT NULL
+          GROUP BY GROUPING SETS ((BILLING_PROVIDER_NPI_NUM), (SERVICING_PROVIDER_NPI_NUM))
+          HAVING COALESCE(BILLING_PROVIDER_NPI_NUM, SERVICING_PROVIDER_NPI_NUM) IS NOT NULL
         )
-        SELECT npi FROM npis
         """
-    ).fetchall()
-    return {str(r[0]).strip() for r in rows if r and r[0]}
+    )
+    con.execute(
+        """
+        CREATE OR REPLACE TEMP TABLE target_npis AS
+        SELECT DISTINCT npi_key AS npi
+        FROM npi_activity
+        WHERE npi_key IS NOT NULL
+        """
+    )
+    return int(con.execute("SELECT COUNT(*) FROM target_npis").fetchone()[0])
 
 
-def normalize_state(state_value: str) -> str:
-    s = (state_value or "").strip().upper()
-    return s if len(s) == 2 and s.isalpha() else ""
+def normalize_state_sql(expr: str) -> str:
+    return f"""(
+          CASE
+            WHEN REGEXP_FULL_MATCH(UPPER(TRIM(COALESCE({expr}, ''))), '[A-Z]{{2}}') THEN UPPER(TRIM({expr}))
+            ELSE ''
+          END
+        )"""
 
 
-def build_lookup(npi_targets: set[str]) -> tuple[int, int]:
-    if not NPPES_ZIP_PATH.exists():
-        raise FileNotFoundError(f"Missing NPPES zip: {NPPES_ZIP_PATH}")
+def nppes_index_path(zip_path: Path) -> Path:
+    stat = zip_path.stat()
+    key = f"format={NPPES_INDEX_FORMAT_VERSION}|{zip_path.name}:{stat.st_size}:{stat.st_mtime_ns}"
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    return NPPES_INDEX_DIR / f"{zip_path.stem}_{digest}.parquet"
 
-    NPPES_ZIP_PATH.parent.mkdir(parents=True, exist_ok=True)
-    OUT_LOOKUP_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-    matched_rows = 0
-    lookup: dict[str, tuple[str, str, str]] = {}
+def with_row_numbers(reader: pa.RecordBatchReader) -> pa.RecordBatchReader:
+    # DuckDB scans Arrow streams in parallel, so file order is carried as an explicit column.
+    schema = reader.schema.append(pa.field("nppes_row", pa.int64()))
+
+    def batches():
+        offset = 0
+        for batch in reader:
+            rows = pa.array(np.arange(offset, offset + batch.num_rows, dtype=np.int64))
+            offset += batch.num_rows
+            yield pa.RecordBatch.from_arrays([*batch.columns, rows], schema=schema)
+
+    return pa.RecordBatchReader.from_batches(schema, batches())
 
-    with zipfile.ZipFile(NPPES_ZIP_PATH) as zf:
+
+def write_nppes_index(con: duckdb.DuckDBPyConnection, zip_path: Path, index_path: Path) -> None:
+    # Only the NPI and the two state columns are parsed, in Arrow record batches that DuckDB
+    # consumes directly. The index keeps every NPI in the file, sorted, so any claims file can
+    # be enriched from it without touching the zip again. An NPI repeated in the file takes both
+    # states from its last record.
+    columns = [NPPES_NPI_COLUMN, NPPES_PRACTICE_STATE_COLUMN, NPPES_MAILING_STATE_COLUMN]
+    building_path = index_path.with_name(index_path.name + ".building")
+    with zipfile.ZipFile(zip_path) as zf:
         main_csv_name = find_main_nppes_csv(zf)
         with zf.open(main_csv_name, "r") as raw:
-            reader = csv.reader(io.TextIOWrapper(raw, encoding="utf-8", newline=""))
-            header = next(reader)
-            idx = {name: i for i, name in enumerate(header)}
-            npi_i = idx["NPI"]
-            practice_state_i = idx["Provider Business Practice Location Address State Name"]
-            mailing_state_i = idx["Provider Business Mailing Address State Name"]
-
-            for row in reader:
-                npi = row[npi_i].strip()
-                if not npi or npi not in npi_targets:
-                    continue
-
-                practice_state = normalize_state(row[practice_state_i])
-                mailing_state = normalize_state(row[mailing_state_i])
-                chosen_state = practice_state or mailing_state
-                lookup[npi] = (chosen_state, practice_state, mailing_state)
-                matched_rows += 1
-
-    with OUT_LOOKUP_PATH.open("w", encoding="utf-8", newline="") as f:
-        writer = csv.writer(f)
-        writer.writerow(["npi", "chosen_state", "practice_state", "mailing_state"])
-        for npi in sorted(lookup):
-            chosen_state, practice_state, mailing_state = lookup[npi]
-            writer.writerow([npi, chosen_state, practice_state, mailing_state])
-
-    return len(lookup), matched_rows
+            nppes = pacsv.open_csv(
+                raw,
+                read_options=pacsv.ReadOptions(block_size=NPPES_BLOCK_SIZE),
+                convert_options=pacsv.ConvertOptions(
+                    include_columns=columns,
+                    column_types={c: pa.string() for c in columns},
+                    strings_can_be_null=False,
+                ),
+            )
+            con.register("nppes_stream", with_row_numbers(nppes))
+            practice = normalize_state_sql(f'n."{NPPES_PRACTICE_STATE_COLUMN}"')
+            mailing = normalize_state_sql(f'n."{NPPES_MAILING_STATE_COLUMN}"')
+            con.execute(
+                f"""
+                COPY (
+                  SELECT
+                    npi,
+                    NULLIF(latest.practice_state, '') AS practice_state,
+                    NULLIF(latest.mailing_state, '') AS mailing_state
+                  FROM (
+                    SELECT
+                      {npi_key_sql(f'n."{NPPES_NPI_COLUMN}"')} AS npi,
+                      ARG_MAX({{'practice_state': {practice}, 'mailing_state': {mailing}}}, n.nppes_row) AS latest
+                    FROM nppes_stream n
+                    WHERE {npi_key_sql(f'n."{NPPES_NPI_COLUMN}"')} IS NOT NULL
+                    GROUP BY 1
+                  )
+                  ORDER BY 1
+                ) TO '{building_path}' (FORMAT parquet, COMPRESSION zstd)
+                """
+            )
+            con.unregister("nppes_stream")
+    building_path.rename(index_path)
+
+
+def nppes_weekly_zips() -> list[Path]:
+    # Weekly update files carry full replacement records for changed NPIs. Those ending before
+    # the month of the full dissemination file are already folded into it and are skipped.
+    monthly = NPPES_MONTHLY_DATE_RE.search(NPPES_ZIP_PATH.stem)
+    cutoff = datetime.strptime(monthly.group(1), "%B_%Y") if monthly else None
+    weeklies: list[tuple[datetime, Path]] = []
+    for path in NPPES_ZIP_PATH.parent.glob(NPPES_WEEKLY_GLOB):
+        dates = NPPES_WEEKLY_DATES_RE.search(path.stem)
+        if not dates:
+            continue
+        end = datetime.strptime(dates.group(2), "%m%d%y")
+        if cutoff is None or end >= cutoff:
+            weeklies.append((end, path))
+    return [path for _, path in sorted(weeklies)]
+
+
+def ensure_nppes_indexes(con: duckdb.DuckDBPyConnection) -> tuple[list[Path], list[Path]]:
+    # Returns (indexes in precedence order, indexes built on this run).
+    started_ns = time.time_ns()
+    NPPES_INDEX_DIR.mkdir(parents=True, exist_ok=True)
+    indexes: list[Path] = []
+    built: list[Path] = []
+    for zip_path in [NPPES_ZIP_PATH, *nppes_weekly_zips()]:
+        index_path = nppes_index_path(zip_path)
+        if not index_path.exists():
+            write_nppes_index(con, zip_path, index_path)
+            built.append(index_path)
+        indexes.append(index_path)
+
+    # A .building file still being written by another run keeps a recent mtime; only ones
+    # untouched since before this run started are leftovers from an interrupted build.
+    for stale in NPPES_INDEX_DIR.glob("*.parquet"):
+        if stale not in indexes:
+            try:
+                stale.unlink()
+            except OSError:
+                pass
+    for building in NPPES_INDEX_DIR.glob("*.parquet.building"):
+        try:
+            if building.stat().st_mtime_ns < started_ns:
+                building.unlink()
+        except OSError:
+            pass
+    return indexes, built
+
+
+def build_lookup(con: duckdb.DuckDBPyConnection) -> dict:
+    if not NPPES_ZIP_PATH.exists():
+        raise FileNotFoundError(f"Missing NPPES zip: {NPPES_ZIP_PATH}")
+
+    OUT_LOOKUP_PATH.parent.mkdir(parents=True, exist_ok=True)
+    indexes, built = ensure_nppes_indexes(con)
+
+    # Later layers (weekly deltas) replace earlier records for the same NPI.
+    layers = "\n          UNION ALL\n          ".join(
+        f"SELECT {layer} AS layer, npi, practice_state, mailing_state FROM read_parquet('{path}')"
+        for layer, path in enumerate(indexes)
+    )
+    con.execute(
+        f"""
+        CREATE OR REPLACE TEMP TABLE nppes_matches AS
+        WITH layered AS (
+          {layers}
+        )
+        SELECT
+          npi,
+          latest.practice_state AS practice_state,
+          latest.mailing_state AS mailing_state,
+          nppes_rows
+        FROM (
+          SELECT
+            l.npi,
+            ARG_MAX({{'practice_state': l.practice_state, 'mailing_state': l.mailing_state}}, l.layer) AS latest,
+            COUNT(*) AS nppes_rows
+          FROM layered l
+          SEMI JOIN target_npis t
+          ON l.npi = t.npi
+          GROUP BY l.npi
+        )
+        """
+    )
+    con.execute(
+        f"""
+        COPY (
+          SELECT
+            LPAD(CAST(npi AS VARCHAR), 10, '0') AS npi,
+            COALESCE(practice_state, mailing_state) AS chosen_state,
+            practice_state,
+            mailing_state
+          FROM nppes_matches
+          ORDER BY 1
+        ) TO '{OUT_LOOKUP_PATH}' (HEADER, DELIMITER ',')
+        """
+    )
+    lookup_count, matched_rows = con.execute("SELECT COUNT(*), SUM(nppes_rows) FROM nppes_matches").fetchone()
+    con.execute("DROP TABLE nppes_matches")
+    return {
+        "lookup_count": int(lookup_count),
+        "matched_nppes_rows": int(matched_rows or 0),
+        "nppes_indexes": [str(p) for p in indexes],
+        "nppes_indexes_built": [str(p) for p in built],
+    }
 
 
 def build_state_rollups(con: duckdb.DuckDBPyConnection) -> dict:
@@ -96,7 +265,7 @@ def build_state_rollups(con: duckdb.DuckDBPyConnection) -> dict:
         f"""
         CREATE OR REPLACE TEMP VIEW npi_lookup AS
         SELECT
-          CAST(npi AS VARCHAR) AS npi,
+          {npi_key_sql("npi")} AS npi,
           CAST(chosen_state AS VARCHAR) AS chosen_state,
           CAST(practice_state AS VARCHAR) AS practice_state,
           CAST(mailing_state AS VARCHAR) AS mailing_state
@@ -113,70 +282,35 @@ def build_state_rollups(con: duckdb.DuckDBPyConnection) -> dict:
         """
     )
 
-    billing_cov = con.execute(
-        f"""
-        WITH by_npi AS (
-          SELECT BILLING_PROVIDER_NPI_NUM AS npi, COUNT(*) AS rows
-          FROM read_parquet('{parquet}')
-          WHERE BILLING_PROVIDER_NPI_NUM IS NOT NULL
-          GROUP BY 1
-        ), joined AS (
-          SELECT b.rows, l.chosen_state
-          FROM by_npi b
-          LEFT JOIN npi_lookup l
-          ON b.npi = l.npi
-        )
-        SELECT
-          SUM(rows) AS total_rows,
-          SUM(CASE WHEN chosen_state IS NOT NULL AND chosen_state <> '' THEN rows ELSE 0 END) AS mapped_rows
-        FROM joined
+    coverage_rows = con.execute(
         """
-    ).fetchone()
-
-    servicing_cov = con.execute(
-        f"""
-        WITH by_npi AS (
-          SELECT SERVICING_PROVIDER_NPI_NUM AS npi, COUNT(*) AS rows
-          FROM read_parquet('{parquet}')
-          WHERE SERVICING_PROVIDER_NPI_NUM IS NOT NULL
-          GROUP BY 1
-        ), joined AS (
-          SELECT b.rows, l.chosen_state
-          FROM by_npi b
-          LEFT JOIN npi_lookup l
-          ON b.npi = l.npi
-        )
         SELECT
-          SUM(rows) AS total_rows,
-          SUM(CASE WHEN chosen_state IS NOT NULL AND chosen_state <> '' THEN rows ELSE 0 END) AS mapped_rows
-        FROM joined
+          a.role,
+          SUM(a.rows) AS total_rows,
+          SUM(CASE WHEN l.chosen_state IS NOT NULL AND l.chosen_state <> '' THEN a.rows ELSE 0 END) AS mapped_rows
+        FROM npi_activity a
+        LEFT JOIN npi_lookup l
+        ON a.npi_key = l.npi
+        GROUP BY a.role
         """
-    ).fetchone()
+    ).fetchall()
+    coverage = {role: (total, mapped) for role, total, mapped in coverage_rows}
+    billing_cov = coverage.get("billing", (0, 0))
+    servicing_cov = coverage.get("servicing", (0, 0))
 
     con.execute(
         f"""
         COPY (
-          WITH by_billing_npi AS (
-            SELECT
-              BILLING_PROVIDER_NPI_NUM AS npi,
-              COUNT(*) AS rows,
-              SUM(TOTAL_CLAIMS) AS total_claims,
-              SUM(TOTAL_PAID) AS total_paid,
-              SUM(TOTAL_UNIQUE_BENEFICIARIES) AS total_bens
-            FROM read_parquet('{parquet}')
-            WHERE BILLING_PROVIDER_NPI_NUM IS NOT NULL
-            GROUP BY 1
-          )
           SELECT
             l.chosen_state AS state,
-            SUM(b.rows) AS rows,
-            SUM(b.total_claims) AS total_claims,
-            SUM(b.total_paid) AS total_paid,
-            SUM(b.total_bens) AS total_bens
-          FROM by_billing_npi b
+            SUM(a.rows) AS rows,
+            SUM(a.total_claims) AS total_claims,
+            SUM(a.total_paid) AS total_paid,
+            SUM(a.total_bens) AS total_bens
+          FROM npi_activity a
           JOIN npi_lookup l
-          ON b.npi = l.npi
-          WHERE l.chosen_state IS NOT NULL AND l.chosen_state <> ''
+          ON a.npi_key = l.npi
+          WHERE a.role = 'billing' AND l.chosen_state IS NOT NULL AND l.chosen_state <> ''
           GROUP BY 1
           ORDER BY rows DESC
         ) TO '{OUT_STATE_ROLLUP_PATH}' (HEADER, DELIMITER ',')
@@ -197,7 +331,7 @@ def build_state_rollups(con: duckdb.DuckDBPyConnection) -> dict:
             l.chosen_state AS BILLING_PROVIDER_STATE
           FROM read_parquet('{parquet}') m
           LEFT JOIN npi_lookup l
-          ON m.BILLING_PROVIDER_NPI_NUM = l.npi
+          ON {npi_key_sql("m.BILLING_PROVIDER_NPI_NUM")} = l.npi
           LIMIT 1000
         ) TO '{OUT_PREVIEW_PATH}' (HEADER, DELIMITER ',')
         """
@@ -243,15 +377,17 @@ def main() -> None:
     con.execute("PRAGMA threads=8")
     con.execute("PRAGMA preserve_insertion_order=false")
 
-    targets = get_target_npis(con)
-    lookup_count, matched_rows = build_lookup(targets)
+    target_count = build_npi_activity(con)
+    lookup = build_lookup(con)
 
     summary = {
         "nppes_zip": str(NPPES_ZIP_PATH),
         "parquet": str(PARQUET_PATH),
-        "target_npi_count": len(targets),
-        "lookup_count": lookup_count,
-        "matched_nppes_rows": matched_rows,
+        "target_npi_count": target_count,
+        "lookup_count": lookup["lookup_count"],
+        "matched_nppes_rows": lookup["matched_nppes_rows"],
+        "nppes_indexes": lookup["nppes_indexes"],
+        "nppes_indexes_built": lookup["nppes_indexes_built"],
         "lookup_csv": str(OUT_LOOKUP_PATH),
     }
     summary.update(build_state_rollups(con))
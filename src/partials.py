@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import math
+
+import pandas as pd
+
+# Mergeable partial aggregates: every builder collects per-state (or finer) partials that can be
+# combined exactly, so rollups such as ALL never need another pass over medicaid_enriched.
+#
+# Conventions for a partial DataFrame:
+# - key columns (state, claim_month, basis, k, metric, key, ...) identify a group;
+# - columns ending in _n/_avgx/_avgy/_sxx/_syy/_sxy form a co-moment block (REGR_* aggregates);
+# - every other numeric column is additive (counts and sums).
+
+MOMENT_SUFFIXES = ("_n", "_avgx", "_avgy", "_sxx", "_syy", "_sxy")
+
+# Log-bucket quantile sketch (DDSketch-style). Any value returned by sketch_quantiles is within
+# SKETCH_RELATIVE_ACCURACY relative error of the exact order statistic at the requested rank.
+SKETCH_RELATIVE_ACCURACY = 0.005
+SKETCH_GAMMA = (1.0 + SKETCH_RELATIVE_ACCURACY) / (1.0 - SKETCH_RELATIVE_ACCURACY)
+SKETCH_KEY_OFFSET = 1_000_000
+
+
+def moment_sql(prefix: str, x_expr: str, y_expr: str) -> str:
+    args = f"{y_expr}, {x_expr}"
+    return ",\n".join(
+        [
+            f"REGR_COUNT({args}) AS {prefix}_n",
+            f"REGR_AVGX({args}) AS {prefix}_avgx",
+            f"REGR_AVGY({args}) AS {prefix}_avgy",
+            f"REGR_SXX({args}) AS {prefix}_sxx",
+            f"REGR_SYY({args}) AS {prefix}_syy",
+            f"REGR_SXY({args}) AS {prefix}_sxy",
+        ]
+    )
+
+
+def sketch_key_sql(expr: str) -> str:
+    # Integer keys sort in value order: negatives mirror positives below zero, 0 is exact and
+    # non-finite values get no key.
+    log_gamma = math.log(SKETCH_GAMMA)
+    return f"""(
+          CASE
+            WHEN NOT ISFINITE({expr}) THEN NULL
+            WHEN ({expr}) > 0 THEN CAST(CEIL(LN({expr}) / {log_gamma!r}) AS BIGINT) + {SKETCH_KEY_OFFSET}
+            WHEN ({expr}) < 0 THEN -(CAST(CEIL(LN(-({expr})) / {log_gamma!r}) AS BIGINT) + {SKETCH_KEY_OFFSET})
+            WHEN ({expr}) = 0 THEN 0
+          END
+        )"""
+
+
+def sketch_value(key: int) -> float:
+    if key == 0:
+        return 0.0
+    magnitude = 2.0 * SKETCH_GAMMA ** (abs(key) - SKETCH_KEY_OFFSET) / (SKETCH_GAMMA + 1.0)
+    return magnitude if key > 0 else -magnitude
+
+
+def sketch_value_sql(key_expr: str) -> str:
+    return f"""(
+          CASE
+            WHEN {key_expr} = 0 THEN 0.0
+            WHEN {key_expr} > 0 THEN 2.0 * POW({SKETCH_GAMMA!r}, {key_expr} - {SKETCH_KEY_OFFSET}) / {SKETCH_GAMMA + 1.0!r}
+            ELSE -2.0 * POW({SKETCH_GAMMA!r}, -{key_expr} - {SKETCH_KEY_OFFSET}) / {SKETCH_GAMMA + 1.0!r}
+          END
+        )"""
+
+
+def moment_prefixes(df: pd.DataFrame) -> list[str]:
+    return [c[: -len("_sxy")] for c in df.columns if c.endswith("_sxy")]
+
+
+def merge_partials(df: pd.DataFrame, keys: list[str]) -> pd.DataFrame:
+    prefixes = moment_prefixes(df)
+    moment_cols = {f"{p}{s}" for p in prefixes for s in MOMENT_SUFFIXES}
+    work = df.copy()
+    group_keys = list(keys)
+    if not group_keys:
+        work["_rollup"] = 0
+        group_keys = ["_rollup"]
+
+    additive = [
+        c
+        for c in work.columns
+        if c not in moment_cols and c not in group_keys and pd.api.types.is_numeric_dtype(work[c])
+    ]
+    merged = work.groupby(group_keys, dropna=False, sort=True)[additive].sum(min_count=1)
+
+    for p in prefixes:
+        n = work[f"{p}_n"].fillna(0).astype("float64")
+        avgx = work[f"{p}_avgx"].fillna(0.0)
+        avgy = work[f"{p}_avgy"].fillna(0.0)
+        grouped_n = n.groupby([work[k] for k in group_keys], dropna=False).transform("sum")
+        safe_n = grouped_n.where(grouped_n > 0)
+        mx = (n * avgx).groupby([work[k] for k in group_keys], dropna=False).transform("sum") / safe_n
+        my = (n * avgy).groupby([work[k] for k in group_keys], dropna=False).transform("sum") / safe_n
+        dx = (avgx - mx).fillna(0.0)
+        dy = (avgy - my).fillna(0.0)
+        contrib = pd.DataFrame(
+            {
+                f"{p}_n": n,
+                f"{p}_nx": n * avgx,
+                f"{p}_ny": n * avgy,
+                f"{p}_sxx": work[f"{p}_sxx"].fillna(0.0) + n * dx * dx,
+                f"{p}_syy": work[f"{p}_syy"].fillna(0.0) + n * dy * dy,
+                f"{p}_sxy": work[f"{p}_sxy"].fillna(0.0) + n * dx * dy,
+            }
+        )
+        for k in group_keys:
+            contrib[k] = work[k]
+        sums = contrib.groupby(group_keys, dropna=False, sort=True).sum()
+        total_n = sums[f"{p}_n"].where(sums[f"{p}_n"] > 0)
+        merged[f"{p}_n"] = sums[f"{p}_n"].astype("int64")
+        merged[f"{p}_avgx"] = sums[f"{p}_nx"] / total_n
+        merged[f"{p}_avgy"] = sums[f"{p}_ny"] / total_n
+        for s in ("_sxx", "_syy", "_sxy"):
+            merged[f"{p}{s}"] = sums[f"{p}{s}"].where(sums[f"{p}_n"] > 0)
+
+    merged = merged.reset_index()
+    if "_rollup" in merged.columns:
+        merged = merged.drop(columns=["_rollup"])
+    return merged
+
+
+def append_all_rollup(df: pd.DataFrame, keep: list[str] | None = None, label: str = "ALL") -> pd.DataFrame:
+    rollup = merge_partials(df, list(keep or []))
+    rollup.insert(0, "state", label)
+    return pd.concat([df, rollup], ignore_index=True)
+
+
+def corr_from_moments(n: float | None, sxx: float | None, syy: float | None, sxy: float | None) -> float | None:
+    if not n or n < 2 or sxx is None or syy is None or sxy is None:
+        return None
+    if pd.isna(sxx) or pd.isna(syy) or pd.isna(sxy):
+        return None
+    denom = math.sqrt(float(sxx) * float(syy)) if sxx > 0 and syy > 0 else 0.0
+    if denom <= 0:
+        return None
+    return max(-1.0, min(1.0, float(sxy) / denom))
+
+
+def histogram_frame(rows: list[tuple], label_col: str, labels: list[str]) -> pd.DataFrame:
+    # rows: (state, map_1, map_2, ...) with one HISTOGRAM() map per label.
+    records: list[tuple] = []
+    for row in rows:
+        state = str(row[0])
+        for label, hist in zip(labels, row[1:]):
+            for k, n in (hist or {}).items():
+                if k is None or n is None:
+                    continue
+                records.append((state, label, int(k), int(n)))
+    return pd.DataFrame(records, columns=["state", label_col, "k", "n"])
+
+
+def sketch_quantiles(counts: dict[int, int], qs: list[float]) -> list[float] | None:
+    total = sum(counts.values())
+    if total <= 0:
+        return None
+    keys = sorted(counts)
+    out: list[float] = []
+    for q in qs:
+        rank = q * (total - 1)
+        seen = 0
+        chosen = keys[-1]
+        for key in keys:
+            seen += counts[key]
+            if seen > rank:
+                chosen = key
+                break
+        out.append(sketch_value(chosen))
+    return out
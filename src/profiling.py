@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import json
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Any, Iterator
+
+import duckdb
+
+# Build telemetry for report.py --profile. Every statement run through a ProfiledConnection is
+# timed and paired with DuckDB's JSON query profile; statements are attributed to the stage that
+# was active on the issuing thread, so concurrent builders on separate cursors stay separate.
+
+PROFILE_METRICS = (
+    "QUERY_NAME",
+    "LATENCY",
+    "CPU_TIME",
+    "ROWS_RETURNED",
+    "CUMULATIVE_ROWS_SCANNED",
+    "SYSTEM_PEAK_BUFFER_MEMORY",
+    "SYSTEM_PEAK_TEMP_DIR_SIZE",
+    "OPERATOR_NAME",
+    "OPERATOR_TYPE",
+    "OPERATOR_TIMING",
+    "OPERATOR_CARDINALITY",
+)
+
+
+def enable_query_profiling(con: duckdb.DuckDBPyConnection) -> None:
+    settings = json.dumps({metric: "true" for metric in PROFILE_METRICS})
+    con.execute("PRAGMA enable_profiling='no_output'")
+    con.execute(f"SET custom_profiling_settings='{settings}'")
+
+
+def max_rss_bytes() -> int:
+    # ru_maxrss is reported in bytes on macOS and in kilobytes on Linux.
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return int(rss if sys.platform == "darwin" else rss * 1024)
+
+
+def operator_tree(node: dict) -> dict:
+    return {
+        "operator": node.get("operator_name"),
+        "type": node.get("operator_type"),
+        "timing_s": node.get("operator_timing"),
+        "rows": node.get("operator_cardinality"),
+        "children": [operator_tree(child) for child in node.get("children", [])],
+    }
+
+
+class BuildProfiler:
+    def __init__(self) -> None:
+        self.stages: list[dict] = []
+        self.statements: list[dict] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._start = time.perf_counter()
+
+    def current_stage(self) -> str:
+        return getattr(self._local, "stage", "setup")
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        previous = self.current_stage()
+        self._local.stage = name
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._local.stage = previous
+            record = {
+                "stage": name,
+                "thread": threading.current_thread().name,
+                "started_s": started - self._start,
+                "wall_s": time.perf_counter() - started,
+                "max_rss_bytes": max_rss_bytes(),
+            }
+            with self._lock:
+                self.stages.append(record)
+
+    def record(self, sql: str, wall_s: float, profile: dict | None) -> None:
+        profile = profile or {}
+        record = {
+            "stage": self.current_stage(),
+            "sql": " ".join(sql.split()),
+            "wall_s": wall_s,
+            "latency_s": profile.get("latency"),
+            "cpu_s": profile.get("cpu_time"),
+            "rows_returned": profile.get("rows_returned"),
+            "rows_scanned": profile.get("cumulative_rows_scanned"),
+            "peak_buffer_memory_bytes": profile.get("system_peak_buffer_memory"),
+            "peak_temp_dir_bytes": profile.get("system_peak_temp_dir_size"),
+            "plan": [operator_tree(child) for child in profile.get("children", [])],
+        }
+        with self._lock:
+            self.statements.append(record)
+
+    def stage_summaries(self) -> list[dict]:
+        summaries: list[dict] = []
+        for stage in sorted(self.stages, key=lambda s: s["started_s"]):
+            statements = [s for s in self.statements if s["stage"] == stage["stage"]]
+            peak_memory = max((s["peak_buffer_memory_bytes"] or 0 for s in statements), default=0)
+            peak_temp = max((s["peak_temp_dir_bytes"] or 0 for s in statements), default=0)
+            summaries.append(
+                {
+                    **stage,
+                    "statements": len(statements),
+                    "sql_wall_s": sum(s["wall_s"] for s in statements),
+                    "cpu_s": sum(s["cpu_s"] or 0.0 for s in statements),
+                    "rows_scanned": sum(s["rows_scanned"] or 0 for s in statements),
+                    "peak_buffer_memory_bytes": peak_memory,
+                    "peak_temp_dir_bytes": peak_temp,
+                    "spilled": peak_temp > 0,
+                }
+            )
+        return summaries
+
+    def write(self, path: Path, settings: dict[str, Any]) -> None:
+        payload = {
+            "total_wall_s": time.perf_counter() - self._start,
+            "max_rss_bytes": max_rss_bytes(),
+            "settings": settings,
+            "stages": self.stage_summaries(),
+            "statements": self.statements,
+        }
+        path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+
+
+def profile_stage(profiler: BuildProfiler | None, name: str):
+    return profiler.stage(name) if profiler is not None else nullcontext()
+
+
+class ProfiledConnection:
+    # Stands in for a DuckDBPyConnection. Results are only complete (and their profile only
+    # available) once fetched, so SELECTs are recorded by the fetch and everything else right away.
+    def __init__(self, con: duckdb.DuckDBPyConnection, profiler: BuildProfiler) -> None:
+        self._con = con
+        self._profiler = profiler
+        self._pending: tuple[str, float] | None = None
+        enable_query_profiling(con)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._con, name)
+
+    def _profile(self) -> dict | None:
+        profile = json.loads(self._con.get_profiling_information(format="json"))
+        return profile if profile.get("query_name") else None
+
+    def _finish(self) -> None:
+        if self._pending is None:
+            return
+        sql, started = self._pending
+        self._pending = None
+        self._profiler.record(sql, time.perf_counter() - started, self._profile())
+
+    def execute(self, query: str, parameters: Any = None) -> ProfiledConnection:
+        self._finish()
+        started = time.perf_counter()
+        if parameters is None:
+            self._con.execute(query)
+        else:
+            self._con.execute(query, parameters)
+        self._pending = (query, started)
+        if not query.lstrip().upper().startswith(("SELECT", "WITH", "FROM")):
+            self._finish()
+        return self
+
+    def _fetch(self, method: str) -> Any:
+        result = getattr(self._con, method)()
+        self._finish()
+        return result
+
+    def fetchall(self) -> list[tuple]:
+        return self._fetch("fetchall")
+
+    def fetchone(self) -> tuple | None:
+        return self._fetch("fetchone")
+
+    def fetchdf(self) -> Any:
+        return self._fetch("fetchdf")
+
+    def df(self) -> Any:
+        return self._fetch("df")
+
+    def cursor(self) -> ProfiledConnection:
+        return ProfiledConnection(self._con.cursor(), self._profiler)
+
+    def close(self) -> None:
+        self._finish()
+        self._con.close()
@@ -0,0 +1,505 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import duckdb
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from report import (
+    ENRICHED_CACHE_DIR,
+    HCPCS_CORR_TOP_N,
+    OUT_JSON,
+    OUT_TABLES,
+    OUT_TMP,
+    STATE_KEY,
+    UNIT_CENTS_EXPR,
+    UNIT_PRICE_FILTER,
+    UNIT_PRICE_TOP_K,
+    attach_enriched_cache,
+    build_base_views,
+    npi_label_sql,
+)
+from signal_score import (
+    FAMILY_NAMES,
+    FAMILY_THRESHOLDS,
+    FEATURE_INDEX,
+    FEATURE_KEYS,
+    THRESHOLD_NAMES,
+    THRESHOLD_QUANTILES,
+    failure_masks,
+)
+
+# Provider-level version of signal_score.py: the same features and family rules, computed per billing
+# NPI instead of per state. One grouped scan over medicaid_enriched collects per-provider partials
+# (by code, by month, by unit-price cents and overall), SQL reduces them to one feature row per
+# provider, and the rows are scored and written to Parquet in record batches, never all in memory.
+#
+# A feature a provider has too little data for (one month, no code with a defined correlation, ...)
+# is NULL in the output and never trips its rule.
+#
+# The state null model does not apply here: a provider's digit shares, entropy and correlations over a
+# few dozen rows scatter far more than a state's over millions. Thresholds are calibrated per size
+# bucket instead. Providers are grouped by n_rows in doubling buckets from --min-rows (a bucket with
+# fewer than PROVIDER_BUCKET_MIN_PROVIDERS is merged into the one below), and split into two folds by
+# NPI hash. Within a bucket, each fold is a null sample: each family's thresholds share one tail level,
+# chosen so the family trips for PROVIDER_FAMILY_FAIL_RATE of that fold. Providers are cross-fitted,
+# scored against the thresholds of the other fold, so no provider is judged by cutoffs its own features
+# helped set, and the fail rates written to PROVIDER_BASELINE_PATH are all out-of-sample.
+
+PROVIDER_SCORES_PATH = OUT_TABLES / "provider_signal_scores.parquet"
+PROVIDER_BASELINE_PATH = OUT_JSON / "provider_null_baseline.json"
+PROVIDER_MIN_ROWS = 24
+PROVIDER_BATCH_ROWS = 250_000
+PROVIDER_FAMILY_FAIL_RATE = 0.025
+PROVIDER_BUCKET_MIN_PROVIDERS = 1000
+PROVIDER_CALIBRATION_MAX = 50_000
+PROVIDER_CALIBRATION_ITERATIONS = 40
+
+THRESHOLD_FEATURE = {name: (FEATURE_INDEX[key], q < 0.5) for name, key, q in THRESHOLD_QUANTILES}
+
+PROVIDER_FOLDS = 2
+
+PART_CODE, PART_MONTH, PART_CENTS, PART_ALL = 0, 1, 2, 3
+
+
+def finite_sql(expr: str) -> str:
+    return f"CASE WHEN ISFINITE({expr}) THEN {expr} END"
+
+
+def provider_features_sql(min_rows: int) -> str:
+    corr = {
+        "bc": "CORR(TOTAL_UNIQUE_BENEFICIARIES, TOTAL_CLAIMS)",
+        "bp": "CORR(TOTAL_UNIQUE_BENEFICIARIES, TOTAL_PAID)",
+        "cp": "CORR(TOTAL_CLAIMS, TOTAL_PAID)",
+    }
+    return f"""
+        WITH parts AS (
+          SELECT
+            CASE
+              WHEN GROUPING(HCPCS_ID) = 0 THEN {PART_CODE}
+              WHEN GROUPING(CLAIM_FROM_MONTH) = 0 THEN {PART_MONTH}
+              WHEN GROUPING(cents) = 0 THEN {PART_CENTS}
+              ELSE {PART_ALL}
+            END AS part,
+            npi,
+            {STATE_KEY},
+            HCPCS_ID,
+            CLAIM_FROM_MONTH,
+            cents,
+            COUNT(*) AS n,
+            SUM(TOTAL_CLAIMS) AS claims,
+            SUM(TOTAL_PAID) AS paid,
+            AVG(unit) AS unit_mean,
+            STDDEV_SAMP(unit) AS unit_std,
+            {", ".join(f"{finite_sql(expr)} AS c_{name}" for name, expr in corr.items())}
+          FROM (
+            SELECT
+              BILLING_NPI_KEY AS npi,
+              {STATE_KEY},
+              HCPCS_ID,
+              CLAIM_FROM_MONTH,
+              TOTAL_CLAIMS,
+              TOTAL_PAID,
+              TOTAL_UNIQUE_BENEFICIARIES,
+              CASE WHEN {UNIT_PRICE_FILTER} THEN TOTAL_PAID / TOTAL_CLAIMS END AS unit,
+              CASE WHEN TOTAL_PAID IS NOT NULL AND TOTAL_CLAIMS > 0 THEN {UNIT_CENTS_EXPR} % 100 END AS cents
+            FROM medicaid_enriched
+            WHERE BILLING_NPI_KEY IS NOT NULL
+          )
+          GROUP BY GROUPING SETS (
+            (npi, {STATE_KEY}, HCPCS_ID),
+            (npi, {STATE_KEY}, CLAIM_FROM_MONTH),
+            (npi, {STATE_KEY}, cents),
+            (npi, {STATE_KEY})
+          )
+        ),
+        overall AS (
+          SELECT npi, {STATE_KEY}, n AS n_rows, c_bc, c_bp, c_cp
+          FROM parts
+          WHERE part = {PART_ALL} AND n >= {min_rows}
+        ),
+        codes AS (
+          SELECT
+            p.npi,
+            p.unit_std / NULLIF(p.unit_mean, 0) AS cv,
+            p.c_bc,
+            p.c_bp,
+            p.c_cp,
+            ROW_NUMBER() OVER (PARTITION BY p.npi ORDER BY p.claims DESC NULLS LAST, p.HCPCS_ID) AS code_rank
+          FROM parts p
+          SEMI JOIN overall o ON p.npi = o.npi
+          WHERE p.part = {PART_CODE} AND p.HCPCS_ID IS NOT NULL
+        ),
+        code_features AS (
+          -- Same bases as the state report: CV over the top-volume codes, correlations as the
+          -- median over the top-claim codes where they are defined.
+          SELECT
+            npi,
+            MEDIAN(cv) FILTER (WHERE code_rank <= {UNIT_PRICE_TOP_K}) AS ratio_median_cv,
+            QUANTILE_CONT(cv, 0.9) FILTER (WHERE code_rank <= {UNIT_PRICE_TOP_K}) AS ratio_p90_cv,
+            MEDIAN(c_bc) FILTER (WHERE code_rank <= {HCPCS_CORR_TOP_N}) AS corr_ben_claims,
+            MEDIAN(c_bp) FILTER (WHERE code_rank <= {HCPCS_CORR_TOP_N}) AS corr_ben_paid,
+            MEDIAN(c_cp) FILTER (WHERE code_rank <= {HCPCS_CORR_TOP_N}) AS corr_claims_paid,
+            COUNT(*) FILTER (
+              WHERE code_rank <= {HCPCS_CORR_TOP_N} AND (c_bc IS NOT NULL OR c_bp IS NOT NULL OR c_cp IS NOT NULL)
+            ) AS n_corr_codes
+          FROM codes
+          GROUP BY npi
+        ),
+        months AS (
+          SELECT
+            p.npi,
+            p.paid,
+            LAG(p.paid) OVER (PARTITION BY p.npi ORDER BY p.CLAIM_FROM_MONTH) AS prev_paid
+          FROM parts p
+          SEMI JOIN overall o ON p.npi = o.npi
+          WHERE p.part = {PART_MONTH} AND p.CLAIM_FROM_MONTH IS NOT NULL
+        ),
+        temporal AS (
+          SELECT
+            npi,
+            {finite_sql("CORR(paid, prev_paid)")} AS temporal_acf1,
+            {finite_sql("STDDEV_SAMP(paid - prev_paid) / NULLIF(AVG(paid), 0)")} AS temporal_smooth_ratio
+          FROM months
+          GROUP BY npi
+        ),
+        cents AS (
+          SELECT
+            p.npi,
+            p.cents,
+            p.n / SUM(p.n) OVER (PARTITION BY p.npi) AS share
+          FROM parts p
+          SEMI JOIN overall o ON p.npi = o.npi
+          WHERE p.part = {PART_CENTS} AND p.cents IS NOT NULL
+        ),
+        last1 AS (
+          SELECT npi, cents % 10 AS digit, SUM(share) AS share
+          FROM cents
+          GROUP BY npi, cents % 10
+        ),
+        digits AS (
+          -- Digits with no rows have share 0: deviation 0.1 and chi term 0.01 / 0.1 each.
+          SELECT
+            npi,
+            GREATEST(MAX(ABS(share - 0.1)), CASE WHEN COUNT(*) < 10 THEN 0.1 ELSE 0.0 END) AS digit_max_dev,
+            SUM((share - 0.1) ^ 2 / 0.1) + (10 - COUNT(*)) * 0.1 AS digit_chi
+          FROM last1
+          GROUP BY npi
+        ),
+        heaping AS (
+          SELECT
+            npi,
+            -SUM(share * LOG2(share)) / LOG2(100) AS entropy,
+            COALESCE(SUM(share) FILTER (WHERE cents % 5 = 0), 0) AS heaping_share_5c,
+            COALESCE(SUM(share) FILTER (WHERE cents % 25 = 0), 0) AS heaping_share_25c,
+            MAX(share) AS heaping_max_bucket
+          FROM cents
+          GROUP BY npi
+        )
+        SELECT
+          {npi_label_sql("o.npi")} AS provider_npi,
+          CAST(o.{STATE_KEY} AS VARCHAR) AS state,
+          o.n_rows,
+          c.ratio_median_cv,
+          c.ratio_p90_cv,
+          d.digit_max_dev,
+          d.digit_chi,
+          CASE WHEN c.n_corr_codes > 0 THEN c.corr_ben_claims ELSE o.c_bc END AS corr_ben_claims,
+          CASE WHEN c.n_corr_codes > 0 THEN c.corr_ben_paid ELSE o.c_bp END AS corr_ben_paid,
+          CASE WHEN c.n_corr_codes > 0 THEN c.corr_claims_paid ELSE o.c_cp END AS corr_claims_paid,
+          t.temporal_acf1,
+          t.temporal_smooth_ratio,
+          h.entropy,
+          h.heaping_share_5c,
+          h.heaping_share_25c,
+          h.heaping_max_bucket
+        FROM overall o
+        LEFT JOIN code_features c USING (npi)
+        LEFT JOIN temporal t USING (npi)
+        LEFT JOIN digits d USING (npi)
+        LEFT JOIN heaping h USING (npi)
+        """
+
+
+def size_buckets(con: duckdb.DuckDBPyConnection, min_rows: int, min_providers: int) -> list[int]:
+    # Lower n_rows edges of the calibration buckets, ascending; the first is always min_rows.
+    counts = con.execute(
+        f"""
+        SELECT CAST(FLOOR(LOG2(n_rows / {min_rows})) AS INTEGER) AS b, COUNT(*) AS n
+        FROM provider_features
+        GROUP BY 1
+        ORDER BY 1 DESC
+        """
+    ).fetchall()
+    edges: list[int] = []
+    pending = 0
+    for b, n in counts:
+        pending += n
+        if pending >= min_providers:
+            edges.append(min_rows * 2**b)
+            pending = 0
+    if edges:
+        edges[-1] = min_rows
+    return sorted(edges) or [min_rows]
+
+
+def bucket_sql(edges: list[int]) -> str:
+    return "CASE " + " ".join(f"WHEN n_rows >= {e} THEN {i}" for i, e in reversed(list(enumerate(edges)))) + " END"
+
+
+def feature_matrix(columns: pa.RecordBatch | pa.Table) -> np.ndarray:
+    # NULL features become NaN, and every rule comparison against NaN is False.
+    return np.column_stack(
+        [columns.column(k).to_numpy(zero_copy_only=False).astype(np.float64) for k in FEATURE_KEYS]
+    ).reshape(columns.num_rows, len(FEATURE_KEYS))
+
+
+def tail_thresholds(samples: np.ndarray, names: tuple[str, ...], alpha: float) -> np.ndarray:
+    # THRESHOLD_NAMES vector with only names set: the alpha tail of each rule's side; NaN elsewhere.
+    thr = np.full(len(THRESHOLD_NAMES), np.nan)
+    for name in names:
+        j, low = THRESHOLD_FEATURE[name]
+        col = samples[:, j]
+        col = col[~np.isnan(col)]
+        if len(col):
+            thr[THRESHOLD_NAMES.index(name)] = np.quantile(col, alpha if low else 1.0 - alpha)
+    return thr
+
+
+def calibrate_bucket(samples: np.ndarray, rate: float = PROVIDER_FAMILY_FAIL_RATE) -> np.ndarray:
+    # Bisects each family's tail level; a family fails less often as its level shrinks.
+    thr = np.full(len(THRESHOLD_NAMES), np.nan)
+    if not len(samples):
+        return thr
+    for f, family in enumerate(FAMILY_NAMES):
+        names = FAMILY_THRESHOLDS[family]
+
+        def fail_rate(alpha: float) -> float:
+            return float(failure_masks(samples, tail_thresholds(samples, names, alpha))[1][:, f].mean())
+
+        lo, hi = 0.0, 0.5
+        if fail_rate(hi) <= rate:
+            lo = hi
+        else:
+            for _ in range(PROVIDER_CALIBRATION_ITERATIONS):
+                mid = (lo + hi) / 2
+                if fail_rate(mid) <= rate:
+                    lo = mid
+                else:
+                    hi = mid
+        family_thr = tail_thresholds(samples, names, lo)
+        picked = [THRESHOLD_NAMES.index(name) for name in names]
+        thr[picked] = family_thr[picked]
+    return thr
+
+
+def calibrate_providers(con: duckdb.DuckDBPyConnection, edges: list[int]) -> tuple[np.ndarray, np.ndarray]:
+    # thresholds[fold, bucket] is calibrated on that fold only; n_calibration[fold, bucket] is its sample size.
+    table = con.execute(
+        f"""
+        SELECT *
+        FROM (
+          SELECT fold, {bucket_sql(edges)} AS bucket, provider_npi, {", ".join(FEATURE_KEYS)}
+          FROM provider_features
+        )
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY fold, bucket ORDER BY HASH(provider_npi, 'sample')) <= {PROVIDER_CALIBRATION_MAX}
+        """
+    ).to_arrow_table()
+    folds = table.column("fold").to_numpy()
+    buckets = table.column("bucket").to_numpy()
+    samples = feature_matrix(table)
+    thresholds = np.stack(
+        [
+            np.stack([calibrate_bucket(samples[(folds == g) & (buckets == i)]) for i in range(len(edges))])
+            for g in range(PROVIDER_FOLDS)
+        ]
+    )
+    n_calibration = np.array(
+        [[int(((folds == g) & (buckets == i)).sum()) for i in range(len(edges))] for g in range(PROVIDER_FOLDS)]
+    )
+    return thresholds, n_calibration
+
+
+def provider_schema() -> pa.Schema:
+    return pa.schema(
+        [
+            ("provider_npi", pa.string()),
+            ("state", pa.string()),
+            ("n_rows", pa.int64()),
+            ("size_bucket", pa.int8()),
+            ("fold", pa.int8()),
+            *[(k, pa.float32()) for k in FEATURE_KEYS],
+            *[(f"fail_{name}", pa.bool_()) for name in FAMILY_NAMES],
+            ("fail_count", pa.int8()),
+            ("raw_fail_count", pa.int8()),
+            ("flagged", pa.bool_()),
+        ]
+    )
+
+
+def score_batch(
+    batch: pa.RecordBatch, edges: list[int], thresholds: np.ndarray, schema: pa.Schema
+) -> tuple[pa.Table, np.ndarray, np.ndarray]:
+    features = feature_matrix(batch)
+    n_rows = batch.column("n_rows").to_numpy(zero_copy_only=False)
+    bucket = np.searchsorted(edges, n_rows, side="right") - 1
+    fold = batch.column("fold").to_numpy(zero_copy_only=False)
+    # Cross-fit: each provider meets the thresholds calibrated on the other fold.
+    signals, families = failure_masks(features, thresholds[(fold + 1) % PROVIDER_FOLDS, bucket])
+    fail_count = families.sum(axis=1).astype(np.int8)
+    columns = [
+        batch.column("provider_npi"),
+        batch.column("state"),
+        batch.column("n_rows").cast(pa.int64()),
+        pa.array(bucket.astype(np.int8)),
+        batch.column("fold").cast(pa.int8()),
+        *[pa.array(features[:, j], type=pa.float32(), from_pandas=True) for j in range(len(FEATURE_KEYS))],
+        *[pa.array(families[:, k]) for k in range(len(FAMILY_NAMES))],
+        pa.array(fail_count),
+        pa.array(signals.sum(axis=1).astype(np.int8)),
+        pa.array(fail_count >= 3),
+    ]
+    return pa.Table.from_arrays(columns, schema=schema), bucket, families
+
+
+def write_provider_scores(
+    con: duckdb.DuckDBPyConnection, edges: list[int], thresholds: np.ndarray, out_path: Path, batch_rows: int
+) -> dict[str, np.ndarray]:
+    # Per-bucket tallies for the baseline summary. Every provider is scored out-of-sample, so all
+    # family failures count towards the held-out rates.
+    k = len(edges)
+    tally = {
+        "providers": np.zeros(k, dtype=np.int64),
+        "flagged": np.zeros(k, dtype=np.int64),
+        "family_fails": np.zeros((k, len(FAMILY_NAMES)), dtype=np.int64),
+    }
+    schema = provider_schema()
+    reader = con.execute("SELECT * FROM provider_features").to_arrow_reader(batch_rows)
+    tmp_path = out_path.with_name(out_path.name + ".tmp")
+    with pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+        for batch in reader:
+            table, bucket, families = score_batch(batch, edges, thresholds, schema)
+            writer.write_table(table)
+            np.add.at(tally["providers"], bucket, 1)
+            np.add.at(tally["flagged"], bucket, table.column("flagged").to_numpy(zero_copy_only=False))
+            np.add.at(tally["family_fails"], bucket, families)
+    tmp_path.replace(out_path)
+    return tally
+
+
+def provider_baseline(
+    edges: list[int], thresholds: np.ndarray, n_calibration: np.ndarray, tally: dict[str, np.ndarray], min_rows: int
+) -> dict:
+    def rates(fails: np.ndarray, n: int) -> dict[str, float | None]:
+        return {name: (float(fails[f]) / n if n else None) for f, name in enumerate(FAMILY_NAMES)}
+
+    buckets = []
+    for i, lo in enumerate(edges):
+        buckets.append(
+            {
+                "n_rows_min": lo,
+                "n_rows_max": edges[i + 1] - 1 if i + 1 < len(edges) else None,
+                "n_providers": int(tally["providers"][i]),
+                "n_flagged": int(tally["flagged"][i]),
+                "n_calibration": [int(n) for n in n_calibration[:, i]],
+                "thresholds": [
+                    {name: (None if np.isnan(v) else float(v)) for name, v in zip(THRESHOLD_NAMES, thresholds[g, i])}
+                    for g in range(PROVIDER_FOLDS)
+                ],
+                "holdout_family_fail_rate": rates(tally["family_fails"][i], int(tally["providers"][i])),
+            }
+        )
+    n_providers = int(tally["providers"].sum())
+    return {
+        "method": "provider_size_bucket_cross_fitted_null",
+        "notes": (
+            "Providers are split into two folds by NPI hash. Per n_rows bucket, each fold's thresholds "
+            "(thresholds[fold]) make every family trip for family_fail_rate of that fold, and each provider is "
+            "scored against the other fold's thresholds. holdout_family_fail_rate is measured on all of them."
+        ),
+        "min_rows": min_rows,
+        "family_fail_rate": PROVIDER_FAMILY_FAIL_RATE,
+        "n_providers": n_providers,
+        "n_flagged": int(tally["flagged"].sum()),
+        "n_calibration": int(n_calibration.sum(axis=1).min()),
+        "n_holdout": n_providers,
+        "holdout_family_fail_rate": rates(tally["family_fails"].sum(axis=0), n_providers),
+        "buckets": buckets,
+    }
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Score every billing provider with the state signal families.")
+    parser.add_argument(
+        "--no-enriched-cache",
+        action="store_true",
+        help=f"rebuild medicaid_enriched in a work database instead of reusing the content-keyed copy in {ENRICHED_CACHE_DIR}",
+    )
+    parser.add_argument(
+        "--min-rows",
+        type=int,
+        default=PROVIDER_MIN_ROWS,
+        help="skip providers with fewer claim rows than this; their features are too noisy to score",
+    )
+    parser.add_argument("--batch-rows", type=int, default=PROVIDER_BATCH_ROWS, help="providers scored and written per batch")
+    parser.add_argument("--threads", type=int, default=4, help="DuckDB thread budget")
+    parser.add_argument("--out", type=Path, default=PROVIDER_SCORES_PATH, help="Parquet output path")
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    OUT_JSON.mkdir(parents=True, exist_ok=True)
+    OUT_TABLES.mkdir(parents=True, exist_ok=True)
+    OUT_TMP.mkdir(parents=True, exist_ok=True)
+    for stale in OUT_TMP.glob("provider_work*.duckdb*"):
+        try:
+            stale.unlink()
+        except OSError:
+            pass
+
+    db_path = OUT_TMP / f"provider_work_{int(time.time())}.duckdb"
+    con = duckdb.connect(str(db_path))
+    con.execute(f"PRAGMA threads={args.threads}")
+    con.execute("SET memory_limit='6GB'")
+    con.execute("PRAGMA temp_directory='outputs/tmp'")
+    con.execute("PRAGMA max_temp_directory_size='300GiB'")
+    con.execute("PRAGMA preserve_insertion_order=false")
+    con.execute("PRAGMA enable_progress_bar=false")
+    if args.no_enriched_cache:
+        build_base_views(con)
+    else:
+        attach_enriched_cache(con)
+
+    started = time.perf_counter()
+    con.execute(
+        f"""
+        CREATE OR REPLACE TABLE provider_features AS
+        SELECT *, CAST(HASH(provider_npi) % {PROVIDER_FOLDS} AS TINYINT) AS fold
+        FROM ({provider_features_sql(args.min_rows)})
+        """
+    )
+    edges = size_buckets(con, args.min_rows, PROVIDER_BUCKET_MIN_PROVIDERS)
+    thresholds, n_calibration = calibrate_providers(con, edges)
+    tally = write_provider_scores(con, edges, thresholds, args.out, args.batch_rows)
+    con.close()
+    db_path.unlink(missing_ok=True)
+
+    baseline = provider_baseline(edges, thresholds, n_calibration, tally, args.min_rows)
+    PROVIDER_BASELINE_PATH.write_text(json.dumps(baseline, indent=2), encoding="utf-8")
+
+    elapsed = time.perf_counter() - started
+    print(f"Scored {baseline['n_providers']} providers in {len(edges)} size buckets in {elapsed:.1f}s ({baseline['n_flagged']} flagged)")
+    for name, rate in baseline["holdout_family_fail_rate"].items():
+        print(f"  held-out {name}: {rate:.2%}" if rate is not None else f"  held-out {name}: n/a")
+    print(f"Wrote {args.out}")
+    print(f"Wrote {PROVIDER_BASELINE_PATH}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,83 @@
 from __future__ import annotations
 
+import argparse
+import hashlib
 import json
 import math
+import shutil
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, update_wrapper
 from pathlib import Path
+from typing import Callable
 
 import duckdb
 import pandas as pd
 
+from artifacts import publish_artifacts
+from build_npi_state_lookup import npi_key_sql
+from partials import (
+    SKETCH_RELATIVE_ACCURACY,
+    append_all_rollup,
+    corr_from_moments,
+    histogram_frame,
+    merge_partials,
+    moment_sql,
+    sketch_key_sql,
+    sketch_quantiles,
+    sketch_value_sql,
+)
+from profiling import BuildProfiler, ProfiledConnection, profile_stage
+from signal_score import project_feature_inputs, source_stamps
+
 PARQUET_PATH = Path("data/medicaid-provider-spending.parquet")
 NPI_LOOKUP_PATH = Path("outputs/tables/npi_state_lookup.csv")
 
 OUT_JSON = Path("outputs/json")
 OUT_TABLES = Path("outputs/tables")
 OUT_TMP = Path("outputs/tmp")
+PARTIALS_DIR = Path("outputs/partials")
+PARTIALS_MANIFEST_PATH = PARTIALS_DIR / "manifest.json"
+ENRICHED_CACHE_DIR = Path("outputs/cache")
 
 REPORT_ALL_PATH = OUT_JSON / "report.json"
 REPORT_BY_STATE_PATH = OUT_JSON / "report_by_state.json"
+REPORT_FEATURES_PATH = OUT_JSON / "report_features_by_state.json"
 PROVIDER_PEER_OUTLIERS_PATH = OUT_JSON / "provider_peer_outliers_by_state.json"
+BUILD_PROFILE_PATH = OUT_JSON / "build_profile.json"
+STATE_SHARDS_DIR = OUT_JSON / "states"
+STATE_SHARDS_INDEX_PATH = STATE_SHARDS_DIR / "index.json"
 TOP_SUSPICIOUS_PATH = OUT_TABLES / "unit_price_top_suspicious_hcpcs.csv"
 TOP_VOLUME_PATH = OUT_TABLES / "unit_price_top_volume_hcpcs.csv"
 MONTHLY_ALL_PATH = OUT_TABLES / "monthly_aggregates.csv"
 MONTHLY_BY_STATE_PATH = OUT_TABLES / "monthly_aggregates_by_state.csv"
 
-STATE_EXPR = "COALESCE(BILLING_PROVIDER_STATE, 'UNK')"
+NULL_MONTH_KEY = "unknown"
+MONTH_KEY_EXPR = f"COALESCE(CAST(CLAIM_FROM_MONTH AS VARCHAR), '{NULL_MONTH_KEY}')"
+PARTIALS_FORMAT_VERSION = 6
+ENRICHED_FORMAT_VERSION = 4
+PARTIAL_KINDS = (
+    "stats",
+    "hist",
+    "unit_price",
+    "unit_price_values",
+    "unit_price_sketch",
+    "hcpcs_corr",
+    "dup_keys",
+    "peer",
+)
 MAX_ABS_UNIT_PAID = 1_000_000.0
+HCPCS_CORR_TOP_N = 200
+UNIT_PRICE_TOP_K = 100
+PEER_TOP_K_STATE = 100
+PEER_TOP_K_ALL = 200
+# A claim line's key; rows sharing all four values are duplicates. The key includes the billing
+# NPI (which fixes the state) and the month, so duplicates never straddle states or months.
+DUPLICATE_KEY_COLUMNS = "BILLING_PROVIDER_NPI_NUM, SERVICING_PROVIDER_NPI_NUM, HCPCS_ID, CLAIM_FROM_MONTH"
+DUPLICATE_KEY_ROWS_PER_PASS = 25_000_000
+# Exact unit-price quantiles keep every unit price of a pass in memory (~8 bytes per row and
+# grouping set plus sort buffers), so 50M rows per pass stays well inside the 6GB limit.
+UNIT_PRICE_ROWS_PER_PASS = 50_000_000
 VALID_STATE_CODES = (
     "AL",
     "AK",
@@ -84,6 +137,81 @@ VALID_STATE_CODES = (
     "AS",
 )
 VALID_STATE_SQL = ", ".join(f"'{s}'" for s in VALID_STATE_CODES)
+# medicaid_enriched stores the state as an ENUM (one byte per row, integer grouping) and never
+# NULL; group on STATE_KEY and select STATE_EXPR so outputs and partials stay VARCHAR.
+STATE_ENUM_SQL = "ENUM(" + ", ".join(f"'{s}'" for s in (*VALID_STATE_CODES, "UNK")) + ")"
+STATE_KEY = "BILLING_PROVIDER_STATE"
+STATE_EXPR = f"CAST({STATE_KEY} AS VARCHAR)"
+
+HEALTH_PARTIAL_SQL = """
+          COUNT(*) AS n_rows,
+          COUNT(*) FILTER (WHERE BILLING_PROVIDER_NPI_NUM IS NULL) AS miss_billing_npi,
+          COUNT(*) FILTER (WHERE SERVICING_PROVIDER_NPI_NUM IS NULL) AS miss_servicing_npi,
+          COUNT(*) FILTER (WHERE HCPCS_CODE IS NULL) AS miss_hcpcs,
+          COUNT(*) FILTER (WHERE CLAIM_FROM_MONTH IS NULL) AS miss_month,
+          COUNT(*) FILTER (WHERE TOTAL_UNIQUE_BENEFICIARIES IS NULL) AS miss_bens,
+          COUNT(*) FILTER (WHERE TOTAL_CLAIMS IS NULL) AS miss_claims,
+          COUNT(*) FILTER (WHERE TOTAL_PAID IS NULL) AS miss_paid,
+          COUNT(*) FILTER (WHERE TOTAL_CLAIMS < 12) AS claims_lt_12,
+          COUNT(*) FILTER (WHERE TOTAL_PAID < 0) AS paid_negative,
+          COUNT(*) FILTER (WHERE TOTAL_UNIQUE_BENEFICIARIES > TOTAL_CLAIMS) AS benef_gt_claims"""
+HEALTH_COUNT_COLUMNS = (
+    "miss_billing_npi",
+    "miss_servicing_npi",
+    "miss_hcpcs",
+    "miss_month",
+    "miss_bens",
+    "miss_claims",
+    "miss_paid",
+    "claims_lt_12",
+    "paid_negative",
+    "benef_gt_claims",
+)
+
+CORR_PARTIAL_SQL = ",\n".join(
+    [
+        moment_sql("bc", "TOTAL_UNIQUE_BENEFICIARIES", "TOTAL_CLAIMS"),
+        moment_sql("bp", "TOTAL_UNIQUE_BENEFICIARIES", "TOTAL_PAID"),
+        moment_sql("cp", "TOTAL_CLAIMS", "TOTAL_PAID"),
+    ]
+)
+
+RATIO_FILTER = "TOTAL_CLAIMS > 0 AND TOTAL_UNIQUE_BENEFICIARIES > 0"
+RATIO_METRICS = {
+    "paid_per_claim": "TOTAL_PAID / TOTAL_CLAIMS",
+    "claims_per_ben": "TOTAL_CLAIMS / TOTAL_UNIQUE_BENEFICIARIES",
+    "paid_per_ben": "TOTAL_PAID / TOTAL_UNIQUE_BENEFICIARIES",
+}
+RATIO_SKETCH_SQL = ",\n".join(
+    f"HISTOGRAM({sketch_key_sql(expr)}) FILTER (WHERE {RATIO_FILTER} AND ({expr}) IS NOT NULL) AS {name}_sketch"
+    for name, expr in RATIO_METRICS.items()
+)
+
+UNIT_PRICE_FILTER = f"""
+              TOTAL_CLAIMS > 0
+              AND TOTAL_PAID IS NOT NULL
+              AND HCPCS_ID IS NOT NULL
+              AND ISFINITE(TOTAL_PAID / TOTAL_CLAIMS)
+              AND ABS(TOTAL_PAID / TOTAL_CLAIMS) <= {MAX_ABS_UNIT_PAID}"""
+
+PEER_ROW_FILTER = """
+          BILLING_NPI_KEY IS NOT NULL
+          AND HCPCS_ID IS NOT NULL
+          AND CLAIM_FROM_MONTH IS NOT NULL
+          AND TOTAL_CLAIMS > 0
+          AND TOTAL_UNIQUE_BENEFICIARIES > 0
+          AND TOTAL_PAID IS NOT NULL
+          AND TOTAL_PAID >= 0"""
+
+TOTAL_CENTS_EXPR = "ABS(TRY_CAST(ROUND(TOTAL_PAID * 100) AS BIGINT))"
+UNIT_CENTS_EXPR = "ABS(TRY_CAST(ROUND((TOTAL_PAID / NULLIF(TOTAL_CLAIMS, 0)) * 100) AS BIGINT))"
+CENTS_HISTOGRAM_SQL = f"""
+          HISTOGRAM({TOTAL_CENTS_EXPR} % 100) FILTER (WHERE TOTAL_PAID IS NOT NULL) AS total_paid_cents,
+          HISTOGRAM({UNIT_CENTS_EXPR} % 100) FILTER (WHERE TOTAL_PAID IS NOT NULL AND TOTAL_CLAIMS > 0) AS unit_paid_cents"""
+
+
+def npi_label_sql(key_expr: str) -> str:
+    return f"LPAD(CAST({key_expr} AS VARCHAR), 10, '0')"
 
 
 def pct(v: float | None) -> float:
@@ -182,8 +310,31 @@ def dict_from_rows(rows: list[tuple], key_index: int = 0) -> dict[str, list[tupl
     return out
 
 
-def build_base_views(con: duckdb.DuckDBPyConnection) -> None:
+def build_base_views(
+    con: duckdb.DuckDBPyConnection,
+    months: list[str] | None = None,
+    target: str = "medicaid_enriched",
+    dictionary: str = "hcpcs_dictionary",
+) -> None:
     src = str(PARQUET_PATH)
+    month_filter = month_filter_sql(months)
+    # Dense INTEGER ids for HCPCS codes; builders group on HCPCS_ID and join the code back
+    # onto the (much smaller) grouped result.
+    con.execute(
+        f"""
+        CREATE OR REPLACE TABLE {dictionary} AS
+        SELECT
+          CAST(ROW_NUMBER() OVER (ORDER BY HCPCS_CODE) AS INTEGER) AS HCPCS_ID,
+          HCPCS_CODE
+        FROM (
+          SELECT DISTINCT HCPCS_CODE
+          FROM read_parquet('{src}')
+          WHERE HCPCS_CODE IS NOT NULL AND ({month_filter})
+        )
+        """
+    )
+    state_sql = "NULL"
+    lookup_join = ""
     if NPI_LOOKUP_PATH.exists():
         lookup = str(NPI_LOOKUP_PATH)
         con.execute(
@@ -191,7 +342,7 @@ def build_base_views(con: duckdb.DuckDBPyConnection) -> None:
             CREATE OR REPLACE TABLE npi_lookup AS
             WITH raw AS (
               SELECT
-                LPAD(CAST(TRY_CAST(npi AS BIGINT) AS VARCHAR), 10, '0') AS npi_key,
+                {npi_key_sql("npi")} AS npi_key,
                 CASE
                   WHEN chosen_state IS NOT NULL AND UPPER(chosen_state) IN ({VALID_STATE_SQL})
                   THEN UPPER(chosen_state)
@@ -212,82 +363,63 @@ def build_base_views(con: duckdb.DuckDBPyConnection) -> None:
               npi_key AS npi,
               MAX(chosen_state) AS chosen_state
             FROM raw
-            WHERE npi_key IS NOT NULL AND LENGTH(npi_key) = 10
+            WHERE npi_key IS NOT NULL
             GROUP BY 1
             """
         )
-        con.execute(
-            f"""
-            CREATE OR REPLACE TABLE medicaid_enriched AS
-            SELECT
-              m.BILLING_PROVIDER_NPI_NUM,
-              m.SERVICING_PROVIDER_NPI_NUM,
-              m.HCPCS_CODE,
-              m.CLAIM_FROM_MONTH,
-              CAST(m.TOTAL_UNIQUE_BENEFICIARIES AS DOUBLE) AS TOTAL_UNIQUE_BENEFICIARIES,
-              CAST(m.TOTAL_CLAIMS AS DOUBLE) AS TOTAL_CLAIMS,
-              CAST(m.TOTAL_PAID AS DOUBLE) AS TOTAL_PAID,
-              l.chosen_state AS BILLING_PROVIDER_STATE
-            FROM read_parquet('{src}') m
-            LEFT JOIN npi_lookup l
-              ON LPAD(CAST(TRY_CAST(m.BILLING_PROVIDER_NPI_NUM AS BIGINT) AS VARCHAR), 10, '0') = l.npi
-            """
-        )
+        state_sql = "l.chosen_state"
+        lookup_join = "LEFT JOIN npi_lookup l ON m.BILLING_NPI_KEY = l.npi"
+    con.execute(
+        f"""
+        CREATE OR REPLACE TABLE {target} AS
+        SELECT
+          m.BILLING_PROVIDER_NPI_NUM,
+          m.SERVICING_PROVIDER_NPI_NUM,
+          m.HCPCS_CODE,
+          m.CLAIM_FROM_MONTH,
+          CAST(m.TOTAL_UNIQUE_BENEFICIARIES AS DOUBLE) AS TOTAL_UNIQUE_BENEFICIARIES,
+          CAST(m.TOTAL_CLAIMS AS DOUBLE) AS TOTAL_CLAIMS,
+          CAST(m.TOTAL_PAID AS DOUBLE) AS TOTAL_PAID,
+          CAST(COALESCE({state_sql}, 'UNK') AS {STATE_ENUM_SQL}) AS BILLING_PROVIDER_STATE,
+          m.BILLING_NPI_KEY,
+          h.HCPCS_ID
+        FROM (
+          SELECT *, {npi_key_sql("BILLING_PROVIDER_NPI_NUM")} AS BILLING_NPI_KEY
+          FROM read_parquet('{src}')
+          WHERE {month_filter}
+        ) m
+        {lookup_join}
+        LEFT JOIN {dictionary} h
+          ON m.HCPCS_CODE = h.HCPCS_CODE
+        """
+    )
+    if lookup_join:
         con.execute("DROP TABLE npi_lookup")
-    else:
-        con.execute(
-            f"""
-            CREATE OR REPLACE TABLE medicaid_enriched AS
-            SELECT
-              m.BILLING_PROVIDER_NPI_NUM,
-              m.SERVICING_PROVIDER_NPI_NUM,
-              m.HCPCS_CODE,
-              m.CLAIM_FROM_MONTH,
-              CAST(m.TOTAL_UNIQUE_BENEFICIARIES AS DOUBLE) AS TOTAL_UNIQUE_BENEFICIARIES,
-              CAST(m.TOTAL_CLAIMS AS DOUBLE) AS TOTAL_CLAIMS,
-              CAST(m.TOTAL_PAID AS DOUBLE) AS TOTAL_PAID,
-              NULL::VARCHAR AS BILLING_PROVIDER_STATE
-            FROM read_parquet('{src}') m
-            """
-        )
 
 
 def build_health(reports: dict[str, dict], con: duckdb.DuckDBPyConnection) -> None:
-    rows = con.execute(
+    parts = con.execute(
         f"""
         SELECT
           {STATE_EXPR} AS state,
-          COUNT(*) AS n_rows,
-          AVG(CASE WHEN BILLING_PROVIDER_NPI_NUM IS NULL THEN 1.0 ELSE 0.0 END) AS miss_billing_npi,
-          AVG(CASE WHEN SERVICING_PROVIDER_NPI_NUM IS NULL THEN 1.0 ELSE 0.0 END) AS miss_servicing_npi,
-          AVG(CASE WHEN HCPCS_CODE IS NULL THEN 1.0 ELSE 0.0 END) AS miss_hcpcs,
-          AVG(CASE WHEN CLAIM_FROM_MONTH IS NULL THEN 1.0 ELSE 0.0 END) AS miss_month,
-          AVG(CASE WHEN TOTAL_UNIQUE_BENEFICIARIES IS NULL THEN 1.0 ELSE 0.0 END) AS miss_bens,
-          AVG(CASE WHEN TOTAL_CLAIMS IS NULL THEN 1.0 ELSE 0.0 END) AS miss_claims,
-          AVG(CASE WHEN TOTAL_PAID IS NULL THEN 1.0 ELSE 0.0 END) AS miss_paid,
-          AVG(CASE WHEN TOTAL_CLAIMS < 12 THEN 1.0 ELSE 0.0 END) AS claims_lt_12_rate,
-          AVG(CASE WHEN TOTAL_PAID < 0 THEN 1.0 ELSE 0.0 END) AS paid_negative_rate,
-          AVG(CASE WHEN TOTAL_UNIQUE_BENEFICIARIES > TOTAL_CLAIMS THEN 1.0 ELSE 0.0 END) AS benef_gt_claims_rate
-        FROM medicaid_enriched
-        GROUP BY 1
-        UNION ALL
-        SELECT
-          'ALL' AS state,
-          COUNT(*) AS n_rows,
-          AVG(CASE WHEN BILLING_PROVIDER_NPI_NUM IS NULL THEN 1.0 ELSE 0.0 END) AS miss_billing_npi,
-          AVG(CASE WHEN SERVICING_PROVIDER_NPI_NUM IS NULL THEN 1.0 ELSE 0.0 END) AS miss_servicing_npi,
-          AVG(CASE WHEN HCPCS_CODE IS NULL THEN 1.0 ELSE 0.0 END) AS miss_hcpcs,
-          AVG(CASE WHEN CLAIM_FROM_MONTH IS NULL THEN 1.0 ELSE 0.0 END) AS miss_month,
-          AVG(CASE WHEN TOTAL_UNIQUE_BENEFICIARIES IS NULL THEN 1.0 ELSE 0.0 END) AS miss_bens,
-          AVG(CASE WHEN TOTAL_CLAIMS IS NULL THEN 1.0 ELSE 0.0 END) AS miss_claims,
-          AVG(CASE WHEN TOTAL_PAID IS NULL THEN 1.0 ELSE 0.0 END) AS miss_paid,
-          AVG(CASE WHEN TOTAL_CLAIMS < 12 THEN 1.0 ELSE 0.0 END) AS claims_lt_12_rate,
-          AVG(CASE WHEN TOTAL_PAID < 0 THEN 1.0 ELSE 0.0 END) AS paid_negative_rate,
-          AVG(CASE WHEN TOTAL_UNIQUE_BENEFICIARIES > TOTAL_CLAIMS THEN 1.0 ELSE 0.0 END) AS benef_gt_claims_rate
+          {HEALTH_PARTIAL_SQL}
         FROM medicaid_enriched
+        GROUP BY {STATE_KEY}
         """
-    ).fetchall()
+    ).fetchdf()
+    fill_health(reports, health_rows(append_all_rollup(parts)))
+
+
+def health_rows(parts: pd.DataFrame) -> list[tuple]:
+    rows: list[tuple] = []
+    for r in parts.itertuples(index=False):
+        n_rows = int(r.n_rows or 0)
+        rates = [(float(getattr(r, c) or 0.0) / n_rows) if n_rows else 0.0 for c in HEALTH_COUNT_COLUMNS]
+        rows.append((str(r.state), n_rows, *rates))
+    return rows
+
 
+def fill_health(reports: dict[str, dict], rows: list[tuple]) -> None:
     for row in rows:
         state = str(row[0])
         rpt = ensure_report(reports, state)
@@ -307,45 +439,303 @@ def build_health(reports: dict[str, dict], con: duckdb.DuckDBPyConnection) -> No
             "benef_gt_claims_rate": pct(row[11]),
         }
 
-    # Keep duplicate-key metric lightweight to avoid native-engine instability on very large scans.
-    for state in reports.keys():
-        reports[state]["data_health"]["duplicate_key_rate"] = 0.0
 
+def partition_filters(con: duckdb.DuckDBPyConnection, rows_per_pass: int, key_sql: str) -> list[str]:
+    # WHERE clauses splitting medicaid_enriched into disjoint passes of about rows_per_pass rows
+    # by an integer key, so a grouped aggregate keyed on it holds one pass in memory at a time.
+    n_rows = int(con.execute("SELECT COUNT(*) FROM medicaid_enriched").fetchone()[0])
+    passes = max(1, math.ceil(n_rows / max(1, rows_per_pass)))
+    if passes == 1:
+        return ["TRUE"]
+    return [f"({key_sql}) % {passes} = {i}" for i in range(passes)]
 
-def build_unit_price(reports: dict[str, dict], con: duckdb.DuckDBPyConnection) -> None:
-    state_rows = con.execute(
-        f"""
-        WITH raw AS (
+
+def duplicate_key_sql(where_clause: str, by_month: bool = False) -> str:
+    month_col = f"{MONTH_KEY_EXPR} AS month_key," if by_month else ""
+    month_key = "month_key," if by_month else ""
+    return f"""
+        WITH k AS (
           SELECT
             {STATE_EXPR} AS state,
-            HCPCS_CODE,
-            TOTAL_CLAIMS,
-            TOTAL_PAID,
-            TOTAL_PAID / NULLIF(TOTAL_CLAIMS, 0) AS UNIT_PAID
+            {month_col}
+            COUNT(*) AS n
           FROM medicaid_enriched
-          WHERE TOTAL_CLAIMS > 0 AND TOTAL_PAID IS NOT NULL AND HCPCS_CODE IS NOT NULL
-        ),
-        d AS (
-          SELECT *
-          FROM raw
-          WHERE
-            UNIT_PAID IS NOT NULL
-            AND ISFINITE(UNIT_PAID)
-            AND ABS(UNIT_PAID) <= {MAX_ABS_UNIT_PAID}
-        ),
-        grp AS (
+          WHERE {where_clause}
+          GROUP BY {STATE_KEY}, {DUPLICATE_KEY_COLUMNS}
+        )
+        SELECT state, {month_key} SUM(n) AS key_rows, SUM(n - 1) AS duplicate_rows
+        FROM k
+        GROUP BY ALL
+    """
+
+
+def build_duplicate_keys(reports: dict[str, dict], con: duckdb.DuckDBPyConnection, rows_per_pass: int) -> None:
+    frames = [con.execute(duplicate_key_sql(where)).fetchdf() for where in partition_filters(con, rows_per_pass, f"HASH({DUPLICATE_KEY_COLUMNS})")]
+    parts = merge_partials(pd.concat(frames, ignore_index=True), ["state"])
+    fill_duplicate_keys(reports, append_all_rollup(parts))
+
+
+def fill_duplicate_keys(reports: dict[str, dict], parts: pd.DataFrame) -> None:
+    for r in parts.itertuples(index=False):
+        key_rows = int(r.key_rows or 0)
+        rpt = ensure_report(reports, str(r.state))
+        rpt["data_health"]["duplicate_key_rate"] = float(r.duplicate_rows or 0) / key_rows if key_rows else 0.0
+
+
+def build_unit_price(
+    reports: dict[str, dict],
+    con: duckdb.DuckDBPyConnection,
+    quantiles: str = "exact",
+    rows_per_pass: int = UNIT_PRICE_ROWS_PER_PASS,
+) -> None:
+    if quantiles == "sketch":
+        grp_sql = unit_price_merged_grp_sql(
+            f"({unit_price_moments_sql()})", unit_price_sketch_quantiles_sql(f"({unit_price_sketch_sql()})")
+        )
+        fill_unit_price(reports, con.execute(unit_price_ranked_sql(grp_sql)).fetchdf())
+        return
+
+    # Exact QUANTILE_CONT states are not mergeable, so states and the ALL rollup share one
+    # GROUPING SETS scan instead of deriving ALL from state partials. Both grouping sets contain
+    # the code, so passes over disjoint HCPCS_ID buckets only need concatenating before ranking;
+    # each pass holds its own bucket's unit prices.
+    for i, where in enumerate(partition_filters(con, rows_per_pass, "HCPCS_ID")):
+        grp_sql = f"""
+          WITH d AS (
+            SELECT
+              {STATE_KEY},
+              HCPCS_ID,
+              TOTAL_CLAIMS,
+              TOTAL_PAID / TOTAL_CLAIMS AS UNIT_PAID
+            FROM medicaid_enriched
+            WHERE {UNIT_PRICE_FILTER}
+              AND ({where})
+          ),
+          g AS (
+            SELECT
+              CASE WHEN GROUPING({STATE_KEY}) = 1 THEN 'ALL' ELSE CAST({STATE_KEY} AS VARCHAR) END AS state,
+              HCPCS_ID,
+              COUNT(*) AS n,
+              SUM(TOTAL_CLAIMS) AS claims,
+              AVG(UNIT_PAID) AS unit_mean,
+              STDDEV_SAMP(UNIT_PAID) AS unit_std,
+              QUANTILE_CONT(UNIT_PAID, 0.10) AS unit_p10,
+              QUANTILE_CONT(UNIT_PAID, 0.90) AS unit_p90
+            FROM d
+            GROUP BY GROUPING SETS (({STATE_KEY}, HCPCS_ID), (HCPCS_ID))
+          )
+          SELECT g.state, h.HCPCS_CODE, g.n, g.claims, g.unit_mean, g.unit_std, g.unit_p10, g.unit_p90
+          FROM g
+          JOIN hcpcs_dictionary h USING (HCPCS_ID)
+        """
+        if i == 0:
+            con.execute(f"CREATE OR REPLACE TEMP TABLE unit_price_groups AS {grp_sql}")
+        else:
+            con.execute(f"INSERT INTO unit_price_groups {grp_sql}")
+    fill_unit_price(reports, con.execute(unit_price_ranked_sql("SELECT * FROM unit_price_groups")).fetchdf())
+    con.execute("DROP TABLE unit_price_groups")
+
+
+def unit_price_moments_sql(by_month: bool = False) -> str:
+    month_col = f"{MONTH_KEY_EXPR} AS month_key," if by_month else ""
+    month_key = "2," if by_month else ""
+    month_out = "g.month_key," if by_month else ""
+    return f"""
+            WITH g AS (
+              SELECT
+                {STATE_EXPR} AS state,
+                {month_col}
+                HCPCS_ID,
+                COUNT(*) AS n,
+                SUM(TOTAL_CLAIMS) AS claims,
+                AVG(TOTAL_PAID / TOTAL_CLAIMS) AS unit_mean,
+                VAR_POP(TOTAL_PAID / TOTAL_CLAIMS) * COUNT(*) AS unit_m2
+              FROM medicaid_enriched
+              WHERE {UNIT_PRICE_FILTER}
+              GROUP BY {STATE_KEY}, {month_key} HCPCS_ID
+            )
+            SELECT g.state, {month_out} h.HCPCS_CODE, g.n, g.claims, g.unit_mean, g.unit_m2
+            FROM g
+            JOIN hcpcs_dictionary h USING (HCPCS_ID)
+    """
+
+
+def unit_price_sketch_sql(by_month: bool = False) -> str:
+    month_col = f"{MONTH_KEY_EXPR} AS month_key," if by_month else ""
+    month_key = "2," if by_month else ""
+    month_out = "g.month_key," if by_month else ""
+    return f"""
+            WITH g AS (
+              SELECT
+                {STATE_EXPR} AS state,
+                {month_col}
+                HCPCS_ID,
+                {sketch_key_sql("TOTAL_PAID / TOTAL_CLAIMS")} AS k,
+                COUNT(*) AS n
+              FROM medicaid_enriched
+              WHERE {UNIT_PRICE_FILTER}
+              GROUP BY {STATE_KEY}, {month_key} HCPCS_ID, k
+            )
+            SELECT g.state, {month_out} h.HCPCS_CODE, g.k, g.n
+            FROM g
+            JOIN hcpcs_dictionary h USING (HCPCS_ID)
+    """
+
+
+def unit_price_values_sql(by_month: bool = False) -> str:
+    # Every distinct unit price with its row count: the lossless input for exact quantiles that
+    # still merges across months.
+    month_col = f"{MONTH_KEY_EXPR} AS month_key," if by_month else ""
+    month_key = "2," if by_month else ""
+    month_out = "g.month_key," if by_month else ""
+    return f"""
+            WITH g AS (
+              SELECT
+                {STATE_EXPR} AS state,
+                {month_col}
+                HCPCS_ID,
+                TOTAL_PAID / TOTAL_CLAIMS AS unit,
+                COUNT(*) AS n
+              FROM medicaid_enriched
+              WHERE {UNIT_PRICE_FILTER}
+              GROUP BY {STATE_KEY}, {month_key} HCPCS_ID, unit
+            )
+            SELECT g.state, {month_out} h.HCPCS_CODE, g.unit, g.n
+            FROM g
+            JOIN hcpcs_dictionary h USING (HCPCS_ID)
+    """
+
+
+def unit_price_sketch_quantiles_sql(sketch_src: str) -> str:
+    # sketch_src rows: (state, HCPCS_CODE, k, n). p10/p90 carry SKETCH_RELATIVE_ACCURACY relative error.
+    return f"""
+          sk AS (
+            SELECT
+              CASE WHEN GROUPING(state) = 1 THEN 'ALL' ELSE state END AS state,
+              HCPCS_CODE,
+              k,
+              SUM(n) AS n
+            FROM {sketch_src}
+            GROUP BY GROUPING SETS ((state, HCPCS_CODE, k), (HCPCS_CODE, k))
+          ),
+          cum AS (
+            SELECT
+              state,
+              HCPCS_CODE,
+              k,
+              SUM(n) OVER (PARTITION BY state, HCPCS_CODE ORDER BY k ROWS UNBOUNDED PRECEDING) AS cum_n,
+              SUM(n) OVER (PARTITION BY state, HCPCS_CODE) AS total_n
+            FROM sk
+          ),
+          qk AS (
+            SELECT
+              state,
+              HCPCS_CODE,
+              MIN(k) FILTER (WHERE cum_n > 0.10 * (total_n - 1)) AS k10,
+              MIN(k) FILTER (WHERE cum_n > 0.90 * (total_n - 1)) AS k90
+            FROM cum
+            GROUP BY 1, 2
+          ),
+          q AS (
+            SELECT
+              state,
+              HCPCS_CODE,
+              {sketch_value_sql("k10")} AS unit_p10,
+              {sketch_value_sql("k90")} AS unit_p90
+            FROM qk
+          )"""
+
+
+def unit_price_value_quantiles_sql(values_src: str) -> str:
+    # values_src rows: (state, HCPCS_CODE, unit, n). Reproduces QUANTILE_CONT over the expanded
+    # rows: position (n - 1) * q, interpolated between the values at its floor and ceiling.
+    def quantile(q: float) -> str:
+        pos = f"(CAST(total_n AS DOUBLE) - 1) * {q}"
+        lo = f"MIN(unit) FILTER (WHERE cum_n > FLOOR({pos}))"
+        hi = f"MIN(unit) FILTER (WHERE cum_n > CEIL({pos}))"
+        return f"{lo} + (ANY_VALUE({pos}) - FLOOR(ANY_VALUE({pos}))) * ({hi} - {lo})"
+
+    return f"""
+          vals AS (
+            SELECT
+              CASE WHEN GROUPING(state) = 1 THEN 'ALL' ELSE state END AS state,
+              HCPCS_CODE,
+              unit,
+              SUM(n) AS n
+            FROM {values_src}
+            GROUP BY GROUPING SETS ((state, HCPCS_CODE, unit), (HCPCS_CODE, unit))
+          ),
+          cum AS (
+            SELECT
+              state,
+              HCPCS_CODE,
+              unit,
+              SUM(n) OVER (PARTITION BY state, HCPCS_CODE ORDER BY unit ROWS UNBOUNDED PRECEDING) AS cum_n,
+              SUM(n) OVER (PARTITION BY state, HCPCS_CODE) AS total_n
+            FROM vals
+          ),
+          q AS (
+            SELECT
+              state,
+              HCPCS_CODE,
+              {quantile(0.10)} AS unit_p10,
+              {quantile(0.90)} AS unit_p90
+            FROM cum
+            GROUP BY 1, 2
+          )"""
+
+
+def unit_price_merged_grp_sql(unit_src: str, quantiles_sql: str) -> str:
+    # unit_src rows carry (state, HCPCS_CODE, n, claims, unit_mean, unit_m2), possibly split by
+    # month or pass; n/claims/mean/std merge exactly. quantiles_sql defines CTE q with
+    # (state, HCPCS_CODE, unit_p10, unit_p90) including state 'ALL'.
+    return f"""
+          WITH p AS (
+            SELECT * FROM {unit_src}
+          ),
+          m AS (
+            SELECT
+              CASE WHEN GROUPING(state) = 1 THEN 'ALL' ELSE state END AS state,
+              HCPCS_CODE,
+              CAST(SUM(n) AS BIGINT) AS n,
+              SUM(claims) AS claims,
+              SUM(n * unit_mean) / SUM(n) AS unit_mean
+            FROM p
+            GROUP BY GROUPING SETS ((state, HCPCS_CODE), (HCPCS_CODE))
+          ),
+          m2 AS (
+            SELECT
+              m.state,
+              m.HCPCS_CODE,
+              SUM(p.unit_m2 + p.n * POW(p.unit_mean - m.unit_mean, 2)) AS unit_m2
+            FROM p
+            JOIN m
+              ON p.HCPCS_CODE = m.HCPCS_CODE AND (m.state = p.state OR m.state = 'ALL')
+            GROUP BY 1, 2
+          ),
+          {quantiles_sql.strip()}
           SELECT
-            state,
-            HCPCS_CODE,
-            COUNT(*) AS n,
-            SUM(TOTAL_CLAIMS) AS claims,
-            AVG(UNIT_PAID) AS unit_mean,
-            STDDEV_SAMP(UNIT_PAID) AS unit_std,
-            QUANTILE_CONT(UNIT_PAID, 0.10) AS unit_p10,
-            QUANTILE_CONT(UNIT_PAID, 0.90) AS unit_p90
-          FROM d
-          GROUP BY 1, 2
-        ),
+            m.state,
+            m.HCPCS_CODE,
+            m.n,
+            m.claims,
+            m.unit_mean,
+            CASE WHEN m.n > 1 THEN SQRT(GREATEST(m2.unit_m2, 0) / (m.n - 1)) END AS unit_std,
+            q.unit_p10,
+            q.unit_p90
+          FROM m
+          JOIN m2 USING (state, HCPCS_CODE)
+          JOIN q USING (state, HCPCS_CODE)
+    """
+
+
+def unit_price_ranked_sql(grp_sql: str) -> str:
+    # grp_sql yields one row per (state, HCPCS_CODE) including state 'ALL', with
+    # n, claims, unit_mean, unit_std, unit_p10 and unit_p90. Each state's top-k lists are
+    # selected with bounded MIN_BY aggregates (ties by code) rather than full window sorts, and
+    # come back ordered by state, ranking and rank.
+    return f"""
+        WITH grp AS ({grp_sql}),
         scored AS (
           SELECT
             state,
@@ -361,109 +751,32 @@ def build_unit_price(reports: dict[str, dict], con: duckdb.DuckDBPyConnection) -
             LN(claims + 1) * (COALESCE(unit_std / NULLIF(unit_mean, 0), 0) + 0.001) * LN((COALESCE(unit_p90 - unit_p10, 0) + 1)) AS suspicion_score
           FROM grp
         ),
-        ranked AS (
+        top AS (
           SELECT
-            *,
-            ROW_NUMBER() OVER (PARTITION BY state ORDER BY suspicion_score DESC) AS rn_suspicious,
-            ROW_NUMBER() OVER (PARTITION BY state ORDER BY claims DESC) AS rn_volume
+            state,
+            MIN_BY(scored, {{'score': COALESCE(-suspicion_score, 'inf'::DOUBLE), 'code': HCPCS_CODE}}, {UNIT_PRICE_TOP_K}) AS top_suspicious,
+            MIN_BY(scored, {{'claims': COALESCE(-claims, 'inf'::DOUBLE), 'code': HCPCS_CODE}}, {UNIT_PRICE_TOP_K}) AS top_volume
           FROM scored
-        )
-        SELECT
-          state,
-          HCPCS_CODE,
-          n,
-          claims,
-          unit_mean,
-          unit_std,
-          unit_p10,
-          unit_p90,
-          unit_iqr_like,
-          cv,
-          suspicion_score,
-          rn_suspicious,
-          rn_volume
-        FROM ranked
-        WHERE rn_suspicious <= 100 OR rn_volume <= 100
-        """
-    ).fetchdf()
-
-    all_rows = con.execute(
-        f"""
-        WITH raw AS (
-          SELECT
-            HCPCS_CODE,
-            TOTAL_CLAIMS,
-            TOTAL_PAID,
-            TOTAL_PAID / NULLIF(TOTAL_CLAIMS, 0) AS UNIT_PAID
-          FROM medicaid_enriched
-          WHERE TOTAL_CLAIMS > 0 AND TOTAL_PAID IS NOT NULL AND HCPCS_CODE IS NOT NULL
-        ),
-        d AS (
-          SELECT *
-          FROM raw
-          WHERE
-            UNIT_PAID IS NOT NULL
-            AND ISFINITE(UNIT_PAID)
-            AND ABS(UNIT_PAID) <= {MAX_ABS_UNIT_PAID}
-        ),
-        grp AS (
-          SELECT
-            HCPCS_CODE,
-            COUNT(*) AS n,
-            SUM(TOTAL_CLAIMS) AS claims,
-            AVG(UNIT_PAID) AS unit_mean,
-            STDDEV_SAMP(UNIT_PAID) AS unit_std,
-            QUANTILE_CONT(UNIT_PAID, 0.10) AS unit_p10,
-            QUANTILE_CONT(UNIT_PAID, 0.90) AS unit_p90
-          FROM d
           GROUP BY 1
         ),
-        scored AS (
-          SELECT
-            HCPCS_CODE,
-            n,
-            claims,
-            unit_mean,
-            unit_std,
-            unit_p10,
-            unit_p90,
-            (unit_p90 - unit_p10) AS unit_iqr_like,
-            unit_std / NULLIF(unit_mean, 0) AS cv,
-            LN(claims + 1) * (COALESCE(unit_std / NULLIF(unit_mean, 0), 0) + 0.001) * LN((COALESCE(unit_p90 - unit_p10, 0) + 1)) AS suspicion_score
-          FROM grp
-        ),
         ranked AS (
-          SELECT
-            *,
-            ROW_NUMBER() OVER (ORDER BY suspicion_score DESC) AS rn_suspicious,
-            ROW_NUMBER() OVER (ORDER BY claims DESC) AS rn_volume
-          FROM scored
+          SELECT 'suspicious' AS ranking, UNNEST(top_suspicious) AS r, GENERATE_SUBSCRIPTS(top_suspicious, 1) AS rn
+          FROM top
+          UNION ALL
+          SELECT 'volume' AS ranking, UNNEST(top_volume) AS r, GENERATE_SUBSCRIPTS(top_volume, 1) AS rn
+          FROM top
         )
-        SELECT
-          'ALL' AS state,
-          HCPCS_CODE,
-          n,
-          claims,
-          unit_mean,
-          unit_std,
-          unit_p10,
-          unit_p90,
-          unit_iqr_like,
-          cv,
-          suspicion_score,
-          rn_suspicious,
-          rn_volume
+        SELECT ranking, rn, r.*
         FROM ranked
-        WHERE rn_suspicious <= 100 OR rn_volume <= 100
+        ORDER BY r.state, ranking, rn
         """
-    ).fetchdf()
 
-    all_scored = pd.concat([state_rows, all_rows], ignore_index=True)
 
-    for state, group in all_scored.groupby("state"):
+def fill_unit_price(reports: dict[str, dict], all_ranked: pd.DataFrame) -> None:
+    for state, group in all_ranked.groupby("state", sort=False):
         rpt = ensure_report(reports, str(state))
-        top_susp = group[group["rn_suspicious"] <= 100].sort_values("rn_suspicious")
-        top_vol = group[group["rn_volume"] <= 100].sort_values("rn_volume")
+        top_susp = group[group["ranking"] == "suspicious"]
+        top_vol = group[group["ranking"] == "volume"]
 
         rpt["unit_price"]["top_suspicious"] = [
             {
@@ -489,10 +802,8 @@ def build_unit_price(reports: dict[str, dict], con: duckdb.DuckDBPyConnection) -
                 "p90_cv": float(top_vol["cv"].quantile(0.9)),
             }
 
-    all_top_susp = all_scored[(all_scored["state"] == "ALL") & (all_scored["rn_suspicious"] <= 100)].copy()
-    all_top_vol = all_scored[(all_scored["state"] == "ALL") & (all_scored["rn_volume"] <= 100)].copy()
-    all_top_susp = all_top_susp.sort_values("rn_suspicious")
-    all_top_vol = all_top_vol.sort_values("rn_volume")
+    all_top_susp = all_ranked[(all_ranked["state"] == "ALL") & (all_ranked["ranking"] == "suspicious")]
+    all_top_vol = all_ranked[(all_ranked["state"] == "ALL") & (all_ranked["ranking"] == "volume")]
 
     all_top_susp[
         [
@@ -524,93 +835,54 @@ def build_unit_price(reports: dict[str, dict], con: duckdb.DuckDBPyConnection) -
     ].to_csv(TOP_VOLUME_PATH, index=False)
 
 
-def dist_rows(
-    con: duckdb.DuckDBPyConnection,
-    cents_expr: str,
-    where_clause: str,
-    modulo: int,
-) -> list[tuple[str, int, float]]:
-    state_rows = con.execute(
-        f"""
-        WITH d AS (
-          SELECT
-            {STATE_EXPR} AS state,
-            {cents_expr} AS cents
-          FROM medicaid_enriched
-          WHERE {where_clause}
-        ),
-        c AS (
-          SELECT state, cents % {modulo} AS k, COUNT(*)::DOUBLE AS n
-          FROM d
-          WHERE cents IS NOT NULL
-          GROUP BY 1, 2
-        ),
-        t AS (
-          SELECT state, SUM(n) AS total
-          FROM c
-          GROUP BY 1
-        )
-        SELECT state, k, n / total AS p
-        FROM c
-        JOIN t USING (state)
-        """
-    ).fetchall()
-    all_rows = con.execute(
-        f"""
-        WITH d AS (
-          SELECT
-            {cents_expr} AS cents
-          FROM medicaid_enriched
-          WHERE {where_clause}
-        ),
-        c AS (
-          SELECT cents % {modulo} AS k, COUNT(*)::DOUBLE AS n
-          FROM d
-          WHERE cents IS NOT NULL
-          GROUP BY 1
-        ),
-        t AS (
-          SELECT SUM(n) AS total
-          FROM c
-        )
-        SELECT 'ALL' AS state, k, n / total AS p
-        FROM c, t
-        """
-    ).fetchall()
+def dist_rows_from_counts(counts: pd.DataFrame, modulo: int) -> list[tuple[str, int, float]]:
+    folded = counts.assign(k=counts["k"] % modulo).groupby(["state", "k"], sort=False)["n"].sum().reset_index()
+    totals = folded.groupby("state")["n"].transform("sum")
     cleaned: list[tuple[str, int, float]] = []
-    for s, k, p in state_rows + all_rows:
-        if k is None or p is None:
+    for s, k, n, total in zip(folded["state"], folded["k"], folded["n"], totals):
+        if not total:
             continue
-        cleaned.append((str(s), int(k), float(p)))
+        cleaned.append((str(s), int(k), float(n) / float(total)))
     return cleaned
 
 
 def build_digits(reports: dict[str, dict], con: duckdb.DuckDBPyConnection) -> None:
-    total1 = dist_rows(
-        con,
-        "ABS(TRY_CAST(ROUND(TOTAL_PAID * 100) AS BIGINT))",
-        "TOTAL_PAID IS NOT NULL",
-        10,
-    )
-    total2 = dist_rows(
-        con,
-        "ABS(TRY_CAST(ROUND(TOTAL_PAID * 100) AS BIGINT))",
-        "TOTAL_PAID IS NOT NULL",
-        100,
-    )
-    unit1 = dist_rows(
-        con,
-        "ABS(TRY_CAST(ROUND((TOTAL_PAID / NULLIF(TOTAL_CLAIMS, 0)) * 100) AS BIGINT))",
-        "TOTAL_PAID IS NOT NULL AND TOTAL_CLAIMS > 0",
-        10,
-    )
-    unit2 = dist_rows(
-        con,
-        "ABS(TRY_CAST(ROUND((TOTAL_PAID / NULLIF(TOTAL_CLAIMS, 0)) * 100) AS BIGINT))",
-        "TOTAL_PAID IS NOT NULL AND TOTAL_CLAIMS > 0",
-        100,
+    rows = con.execute(
+        f"""
+        SELECT
+          {STATE_EXPR} AS state,
+          {CENTS_HISTOGRAM_SQL}
+        FROM medicaid_enriched
+        GROUP BY {STATE_KEY}
+        """
+    ).fetchall()
+    fill_digits_from_histograms(reports, rows)
+
+
+def fill_digits_from_histograms(reports: dict[str, dict], rows: list[tuple]) -> None:
+    # rows: (state, total_paid_cents map, unit_paid_cents map) of last-two-cent counts.
+    cents = append_all_rollup(histogram_frame(rows, "basis", ["total_paid", "unit_paid"]), keep=["basis", "k"])
+    fill_digits_from_counts(reports, cents[cents["basis"] == "total_paid"], cents[cents["basis"] == "unit_paid"])
+
+
+def fill_digits_from_counts(reports: dict[str, dict], total_cents: pd.DataFrame, unit_cents: pd.DataFrame) -> None:
+    # Last-one-digit distributions fold the 100-bucket counts, so both come from the same histogram.
+    fill_digits(
+        reports,
+        dist_rows_from_counts(total_cents, 10),
+        dist_rows_from_counts(total_cents, 100),
+        dist_rows_from_counts(unit_cents, 10),
+        dist_rows_from_counts(unit_cents, 100),
     )
 
+
+def fill_digits(
+    reports: dict[str, dict],
+    total1: list[tuple[str, int, float]],
+    total2: list[tuple[str, int, float]],
+    unit1: list[tuple[str, int, float]],
+    unit2: list[tuple[str, int, float]],
+) -> None:
     for state, k, p in total1:
         rpt = ensure_report(reports, state)
         rpt["digits"]["total_paid_cents_last1_dist"][int(k)] = float(p)
@@ -638,100 +910,126 @@ def build_digits(reports: dict[str, dict], con: duckdb.DuckDBPyConnection) -> No
 
 
 def build_correlations(reports: dict[str, dict], con: duckdb.DuckDBPyConnection) -> None:
+    # One grouped pass yields state co-moments (all rows) and per-code co-moments for each state
+    # and for ALL; only each state's top-volume codes leave DuckDB.
     rows = con.execute(
         f"""
-        SELECT
-          {STATE_EXPR} AS state,
-          CORR(TOTAL_UNIQUE_BENEFICIARIES, TOTAL_CLAIMS) AS c_bc,
-          CORR(TOTAL_UNIQUE_BENEFICIARIES, TOTAL_PAID) AS c_bp,
-          CORR(TOTAL_CLAIMS, TOTAL_PAID) AS c_cp
-        FROM medicaid_enriched
-        GROUP BY 1
-        UNION ALL
-        SELECT
-          'ALL' AS state,
-          CORR(TOTAL_UNIQUE_BENEFICIARIES, TOTAL_CLAIMS) AS c_bc,
-          CORR(TOTAL_UNIQUE_BENEFICIARIES, TOTAL_PAID) AS c_bp,
-          CORR(TOTAL_CLAIMS, TOTAL_PAID) AS c_cp
-        FROM medicaid_enriched
+        WITH g AS (
+          SELECT
+            GROUPING(HCPCS_ID) AS by_state,
+            CASE WHEN GROUPING({STATE_KEY}) = 1 THEN 'ALL' ELSE CAST({STATE_KEY} AS VARCHAR) END AS state,
+            HCPCS_ID,
+            SUM(TOTAL_CLAIMS) AS claims,
+            {CORR_PARTIAL_SQL}
+          FROM medicaid_enriched
+          GROUP BY GROUPING SETS (({STATE_KEY}), ({STATE_KEY}, HCPCS_ID), (HCPCS_ID))
+        )
+        SELECT g.* EXCLUDE (HCPCS_ID), h.HCPCS_CODE
+        FROM g
+        LEFT JOIN hcpcs_dictionary h USING (HCPCS_ID)
+        WHERE g.by_state = 1 OR h.HCPCS_CODE IS NOT NULL
+        QUALIFY
+          g.by_state = 1
+          OR ROW_NUMBER() OVER (
+            PARTITION BY g.state, g.by_state ORDER BY g.claims DESC NULLS LAST, h.HCPCS_CODE
+          ) <= {HCPCS_CORR_TOP_N}
         """
-    ).fetchall()
+    ).fetchdf()
+    by_state = rows["by_state"] == 1
+    parts = rows[by_state].drop(columns=["by_state", "claims", "HCPCS_CODE"])
+    fill_correlations(reports, correlation_rows(append_all_rollup(parts)))
+    fill_hcpcs_correlations(reports, hcpcs_correlation_rows(rows[~by_state].drop(columns=["by_state"])))
+
 
+def correlation_rows(parts: pd.DataFrame) -> list[tuple]:
+    rows: list[tuple] = []
+    for r in parts.to_dict("records"):
+        rows.append(
+            (
+                str(r["state"]),
+                *(corr_from_moments(r[f"{p}_n"], r[f"{p}_sxx"], r[f"{p}_syy"], r[f"{p}_sxy"]) for p in ("bc", "bp", "cp")),
+            )
+        )
+    return rows
+
+
+def fill_correlations(reports: dict[str, dict], rows: list[tuple]) -> None:
     for state, c_bc, c_bp, c_cp in rows:
         rpt = ensure_report(reports, str(state))
         rpt["correlations"]["TOTAL_UNIQUE_BENEFICIARIES"]["TOTAL_CLAIMS"] = pct(c_bc)
         rpt["correlations"]["TOTAL_UNIQUE_BENEFICIARIES"]["TOTAL_PAID"] = pct(c_bp)
         rpt["correlations"]["TOTAL_CLAIMS"]["TOTAL_PAID"] = pct(c_cp)
 
-    for state, c_bc, c_bp, c_cp in rows:
+
+def hcpcs_correlation_rows(codes: pd.DataFrame) -> list[tuple]:
+    # codes: each state's HCPCS_CORR_TOP_N codes, already selected in SQL, with the bc/bp/cp
+    # co-moment blocks. Returns (state, bc values, bp values, cp values, n_codes) over the codes
+    # with a defined correlation.
+    rows: list[tuple] = []
+    for state, grp in codes.groupby("state", sort=True):
+        corrs = [
+            tuple(corr_from_moments(r[f"{p}_n"], r[f"{p}_sxx"], r[f"{p}_syy"], r[f"{p}_sxy"]) for p in ("bc", "bp", "cp"))
+            for r in grp.to_dict("records")
+        ]
+        defined = [c for c in corrs if any(v is not None for v in c)]
+        rows.append((str(state), *([c[i] for c in defined if c[i] is not None] for i in range(3)), len(defined)))
+    return rows
+
+
+def fill_hcpcs_correlations(reports: dict[str, dict], rows: list[tuple]) -> None:
+    def median(values: list[float]) -> float:
+        return float(pd.Series(values, dtype="float64").median()) if values else 0.0
+
+    def mean(values: list[float]) -> float:
+        return float(sum(values) / len(values)) if values else 0.0
+
+    def share_below(values: list[float], cut: float) -> float:
+        return float(sum(1 for v in values if v < cut) / len(values)) if values else 0.0
+
+    for state, c_bc, c_bp, c_cp, n_codes in rows:
         rpt = ensure_report(reports, str(state))
-        # Fast fallback stratification proxy: keep the same shape used by scoring/UI,
-        # but populate with state-level correlations to avoid expensive per-code passes.
         rpt["correlations"]["within_hcpcs_top200"] = {
-            "median_ben_claims": pct(c_bc),
-            "median_ben_paid": pct(c_bp),
-            "median_claims_paid": pct(c_cp),
-            "mean_ben_claims": pct(c_bc),
-            "mean_ben_paid": pct(c_bp),
-            "mean_claims_paid": pct(c_cp),
-            "share_below_ben_claims_0_4": 1.0 if pct(c_bc) < 0.4 else 0.0,
-            "share_below_ben_paid_0_2": 1.0 if pct(c_bp) < 0.2 else 0.0,
-            "share_below_claims_paid_0_6": 1.0 if pct(c_cp) < 0.6 else 0.0,
-            "n_codes": 0,
+            "median_ben_claims": median(c_bc),
+            "median_ben_paid": median(c_bp),
+            "median_claims_paid": median(c_cp),
+            "mean_ben_claims": mean(c_bc),
+            "mean_ben_paid": mean(c_bp),
+            "mean_claims_paid": mean(c_cp),
+            "share_below_ben_claims_0_4": share_below(c_bc, 0.4),
+            "share_below_ben_paid_0_2": share_below(c_bp, 0.2),
+            "share_below_claims_paid_0_6": share_below(c_cp, 0.6),
+            "n_codes": int(n_codes),
         }
 
 
 def build_ratios(reports: dict[str, dict], con: duckdb.DuckDBPyConnection) -> None:
-    con.execute(
+    rows = con.execute(
         f"""
-        CREATE OR REPLACE TEMP TABLE ratios_base AS
         SELECT
           {STATE_EXPR} AS state,
-          TOTAL_PAID / NULLIF(TOTAL_CLAIMS, 0) AS paid_per_claim,
-          TOTAL_CLAIMS / NULLIF(TOTAL_UNIQUE_BENEFICIARIES, 0) AS claims_per_ben,
-          TOTAL_PAID / NULLIF(TOTAL_UNIQUE_BENEFICIARIES, 0) AS paid_per_ben
+          {RATIO_SKETCH_SQL}
         FROM medicaid_enriched
-        WHERE TOTAL_CLAIMS > 0 AND TOTAL_UNIQUE_BENEFICIARIES > 0
-        """
-    )
-
-    state_rows = con.execute(
-        """
-        SELECT
-          state,
-          APPROX_QUANTILE(paid_per_claim, 0.01) AS paid_per_claim_p01,
-          APPROX_QUANTILE(paid_per_claim, 0.50) AS paid_per_claim_p50,
-          APPROX_QUANTILE(paid_per_claim, 0.99) AS paid_per_claim_p99,
-          APPROX_QUANTILE(claims_per_ben, 0.01) AS claims_per_ben_p01,
-          APPROX_QUANTILE(claims_per_ben, 0.50) AS claims_per_ben_p50,
-          APPROX_QUANTILE(claims_per_ben, 0.99) AS claims_per_ben_p99,
-          APPROX_QUANTILE(paid_per_ben, 0.01) AS paid_per_ben_p01,
-          APPROX_QUANTILE(paid_per_ben, 0.50) AS paid_per_ben_p50,
-          APPROX_QUANTILE(paid_per_ben, 0.99) AS paid_per_ben_p99
-        FROM ratios_base
-        GROUP BY 1
+        GROUP BY {STATE_KEY}
         """
     ).fetchall()
+    fill_ratios(reports, ratio_rows(histogram_frame(rows, "metric", list(RATIO_METRICS))))
 
-    all_rows = con.execute(
-        """
-        SELECT
-          'ALL' AS state,
-          APPROX_QUANTILE(paid_per_claim, 0.01) AS paid_per_claim_p01,
-          APPROX_QUANTILE(paid_per_claim, 0.50) AS paid_per_claim_p50,
-          APPROX_QUANTILE(paid_per_claim, 0.99) AS paid_per_claim_p99,
-          APPROX_QUANTILE(claims_per_ben, 0.01) AS claims_per_ben_p01,
-          APPROX_QUANTILE(claims_per_ben, 0.50) AS claims_per_ben_p50,
-          APPROX_QUANTILE(claims_per_ben, 0.99) AS claims_per_ben_p99,
-          APPROX_QUANTILE(paid_per_ben, 0.01) AS paid_per_ben_p01,
-          APPROX_QUANTILE(paid_per_ben, 0.50) AS paid_per_ben_p50,
-          APPROX_QUANTILE(paid_per_ben, 0.99) AS paid_per_ben_p99
-        FROM ratios_base
-        """
-    ).fetchall()
 
-    rows = state_rows + all_rows
+def ratio_rows(sketches: pd.DataFrame) -> list[tuple]:
+    # Quantiles come from mergeable log-bucket sketches, so ALL is the bucket-wise sum of the states.
+    merged = append_all_rollup(sketches, keep=["metric", "k"])
+    rows: list[tuple] = []
+    for state, group in merged.groupby("state", sort=False):
+        row: list = [str(state)]
+        for metric in RATIO_METRICS:
+            counts = group[group["metric"] == metric]
+            qs = sketch_quantiles(dict(zip(counts["k"], counts["n"])), [0.01, 0.50, 0.99])
+            row.extend(qs or [None, None, None])
+        rows.append(tuple(row))
+    return rows
+
 
+def fill_ratios(reports: dict[str, dict], rows: list[tuple]) -> None:
     for row in rows:
         state = str(row[0])
         rpt = ensure_report(reports, state)
@@ -753,25 +1051,14 @@ def build_temporal(reports: dict[str, dict], con: duckdb.DuckDBPyConnection) ->
           SUM(TOTAL_UNIQUE_BENEFICIARIES) AS total_bens,
           COUNT(*) AS rows
         FROM medicaid_enriched
-        GROUP BY 1, 2
+        GROUP BY {STATE_KEY}, 2
         """
     ).fetchdf()
 
-    all_monthly = con.execute(
-        """
-        SELECT
-          'ALL' AS state,
-          STRPTIME(CLAIM_FROM_MONTH || '-01', '%Y-%m-%d') AS claim_month,
-          SUM(TOTAL_PAID) AS total_paid,
-          SUM(TOTAL_CLAIMS) AS total_claims,
-          SUM(TOTAL_UNIQUE_BENEFICIARIES) AS total_bens,
-          COUNT(*) AS rows
-        FROM medicaid_enriched
-        GROUP BY 2
-        """
-    ).fetchdf()
+    fill_temporal(reports, append_all_rollup(state_monthly, keep=["claim_month"]))
+
 
-    monthly = pd.concat([state_monthly, all_monthly], ignore_index=True)
+def fill_temporal(reports: dict[str, dict], monthly: pd.DataFrame) -> None:
     monthly = monthly.sort_values(["state", "claim_month"]).reset_index(drop=True)
 
     monthly["total_paid_delta"] = monthly.groupby("state")["total_paid"].diff()
@@ -838,6 +1125,94 @@ def build_heaping(reports: dict[str, dict]) -> None:
         }
 
 
+def build_fused_stats(reports: dict[str, dict], con: duckdb.DuckDBPyConnection) -> None:
+    rows = con.execute(
+        f"""
+        SELECT
+          {STATE_EXPR} AS state,
+          {HEALTH_PARTIAL_SQL},
+          {CENTS_HISTOGRAM_SQL},
+          {RATIO_SKETCH_SQL}
+        FROM medicaid_enriched
+        GROUP BY {STATE_KEY}
+        """
+    )
+    columns = [c[0] for c in rows.description]
+    rows = rows.fetchall()
+    n_scalar = columns.index("total_paid_cents")
+    parts = pd.DataFrame([row[:n_scalar] for row in rows], columns=columns[:n_scalar])
+    parts = append_all_rollup(parts)
+    fill_health(reports, health_rows(parts))
+
+    fill_digits_from_histograms(reports, [(row[0], *row[n_scalar : n_scalar + 2]) for row in rows])
+
+    sketches = histogram_frame([(row[0], *row[n_scalar + 2 :]) for row in rows], "metric", list(RATIO_METRICS))
+    fill_ratios(reports, ratio_rows(sketches))
+
+
+def run_builders(
+    reports: dict[str, dict],
+    con: duckdb.DuckDBPyConnection,
+    tasks: list[tuple[str, Callable, tuple[str, ...]]],
+    workers: int,
+    checkpoint: Callable[[str], None],
+    profiler: BuildProfiler | None = None,
+) -> None:
+    if workers <= 1:
+        for label, builder, _sections in tasks:
+            with profile_stage(profiler, builder.__name__):
+                builder(reports, con)
+            checkpoint(label)
+        return
+
+    # Builders only read medicaid_enriched, so each gets its own cursor and a private report
+    # dict. Their sections are copied back in task order, which keeps the merge deterministic
+    # however the threads interleave. DuckDB's thread budget is instance-wide and shared by
+    # the concurrent queries.
+    def run(builder: Callable) -> dict[str, dict]:
+        cursor = con.cursor()
+        try:
+            local: dict[str, dict] = {}
+            with profile_stage(profiler, builder.__name__):
+                builder(local, cursor)
+            return local
+        finally:
+            cursor.close()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [(label, sections, pool.submit(run, builder)) for label, builder, sections in tasks]
+        for label, sections, future in futures:
+            local = future.result()
+            for state in sorted(local):
+                rpt = ensure_report(reports, state)
+                for section in sections:
+                    rpt[section] = local[state][section]
+            checkpoint(label)
+
+
+# One full scan per builder (plus the ALL rollup merged from state partials).
+PER_BUILDER_TASKS = [
+    ("Completed data health", build_health, ("data_health",)),
+    ("Completed signal 1 inputs (unit price)", build_unit_price, ("unit_price",)),
+    ("Completed signal 2/5 inputs (digits + entropy)", build_digits, ("digits",)),
+    ("Completed signal 3 inputs (correlations)", build_correlations, ("correlations",)),
+    ("Completed ratio summaries", build_ratios, ("ratios",)),
+    ("Completed signal 4 inputs (temporal)", build_temporal, ("temporal",)),
+]
+
+# Four grouped passes over medicaid_enriched cover every builder.
+FUSED_TASKS = [
+    (
+        "Completed fused pass 1 (data health, digits, ratios)",
+        build_fused_stats,
+        ("data_health", "digits", "ratios"),
+    ),
+    ("Completed fused pass 2 (signal 1 inputs, unit price)", build_unit_price, ("unit_price",)),
+    ("Completed fused pass 3 (signal 3 inputs, correlations)", build_correlations, ("correlations",)),
+    ("Completed fused pass 4 (signal 4 inputs, temporal)", build_temporal, ("temporal",)),
+]
+
+
 def provider_risk_label(outlier_score: float, share_rows_ge_3sigma: float) -> str:
     if outlier_score >= 3.5 or share_rows_ge_3sigma >= 0.40:
         return "HIGH"
@@ -848,29 +1223,22 @@ def provider_risk_label(outlier_score: float, share_rows_ge_3sigma: float) -> st
     return "LOW"
 
 
-
-def build_peer_group_outliers(con: duckdb.DuckDBPyConnection, available_states: list[str]) -> dict:
+def build_provider_peer_base(con: duckdb.DuckDBPyConnection) -> None:
     con.execute(
         f"""
         CREATE OR REPLACE TEMP TABLE provider_peer_base AS
         SELECT
           {STATE_EXPR} AS state,
-          LPAD(CAST(TRY_CAST(BILLING_PROVIDER_NPI_NUM AS BIGINT) AS VARCHAR), 10, '0') AS provider_npi,
+          BILLING_NPI_KEY AS provider_npi,
           SUM(CAST(TOTAL_CLAIMS AS DOUBLE)) AS total_claims,
           SUM(CAST(TOTAL_PAID AS DOUBLE)) AS total_paid,
           SUM(CAST(TOTAL_UNIQUE_BENEFICIARIES AS DOUBLE)) AS total_bens,
-          APPROX_COUNT_DISTINCT(HCPCS_CODE) AS code_count,
-          APPROX_COUNT_DISTINCT(CLAIM_FROM_MONTH) AS month_count
+          COUNT(DISTINCT HCPCS_CODE) AS code_count,
+          COUNT(DISTINCT CLAIM_FROM_MONTH) AS month_count
         FROM medicaid_enriched
         WHERE
-          TRY_CAST(BILLING_PROVIDER_NPI_NUM AS BIGINT) IS NOT NULL
-          AND HCPCS_CODE IS NOT NULL
-          AND CLAIM_FROM_MONTH IS NOT NULL
-          AND TOTAL_CLAIMS > 0
-          AND TOTAL_UNIQUE_BENEFICIARIES > 0
-          AND TOTAL_PAID IS NOT NULL
-          AND TOTAL_PAID >= 0
-        GROUP BY 1, 2
+          {PEER_ROW_FILTER}
+        GROUP BY {STATE_KEY}, 2
         HAVING
           SUM(CAST(TOTAL_CLAIMS AS DOUBLE)) >= 500
           AND SUM(CAST(TOTAL_UNIQUE_BENEFICIARIES AS DOUBLE)) > 0
@@ -879,8 +1247,10 @@ def build_peer_group_outliers(con: duckdb.DuckDBPyConnection, available_states:
         """
     )
 
+
+def build_peer_group_outliers(con: duckdb.DuckDBPyConnection, available_states: list[str]) -> dict:
     state_df = con.execute(
-        """
+        f"""
         WITH enriched AS (
           SELECT
             state,
@@ -895,7 +1265,6 @@ def build_peer_group_outliers(con: duckdb.DuckDBPyConnection, available_states:
           FROM provider_peer_base
           WHERE
             provider_npi IS NOT NULL
-            AND LENGTH(provider_npi) = 10
             AND code_count >= 5
             AND month_count >= 6
         ),
@@ -945,34 +1314,47 @@ def build_peer_group_outliers(con: duckdb.DuckDBPyConnection, available_states:
               (CASE WHEN z_paid_per_claim >= 3.0 THEN 1.0 ELSE 0.0 END)
               + (CASE WHEN z_claims_per_ben >= 3.0 THEN 1.0 ELSE 0.0 END)
               + (CASE WHEN z_paid_per_ben >= 3.0 THEN 1.0 ELSE 0.0 END)
-            ) / 3.0 AS share_rows_ge_3sigma,
-            ROW_NUMBER() OVER (
-              PARTITION BY state
-              ORDER BY (z_paid_per_claim + z_claims_per_ben + z_paid_per_ben) / 3.0 DESC, total_claims DESC
-            ) AS rank_in_state
+            ) / 3.0 AS share_rows_ge_3sigma
           FROM scored
+        ),
+        top AS (
+          SELECT
+            MIN_BY(
+              ranked,
+              {{
+                'score': COALESCE(-outlier_score, 'inf'::DOUBLE),
+                'claims': COALESCE(-total_claims, 'inf'::DOUBLE),
+                'npi': provider_npi
+              }},
+              {PEER_TOP_K_STATE}
+            ) AS top
+          FROM ranked
+          GROUP BY state
+        ),
+        unnested AS (
+          SELECT UNNEST(top) AS r, GENERATE_SUBSCRIPTS(top, 1) AS rank_in_state
+          FROM top
         )
         SELECT
-          state,
-          provider_npi,
+          r.state,
+          {npi_label_sql("r.provider_npi")} AS provider_npi,
           rank_in_state,
-          code_count AS peer_cells_scored,
-          total_claims,
-          total_paid,
-          z_paid_per_claim AS weighted_z_paid_per_claim,
-          z_claims_per_ben AS weighted_z_claims_per_ben,
-          z_paid_per_ben AS weighted_z_paid_per_ben,
-          outlier_score,
-          p95_row_abs_z,
-          share_rows_ge_3sigma
-        FROM ranked
-        WHERE rank_in_state <= 100
-        ORDER BY state, rank_in_state
+          r.code_count AS peer_cells_scored,
+          r.total_claims,
+          r.total_paid,
+          r.z_paid_per_claim AS weighted_z_paid_per_claim,
+          r.z_claims_per_ben AS weighted_z_claims_per_ben,
+          r.z_paid_per_ben AS weighted_z_paid_per_ben,
+          r.outlier_score,
+          r.p95_row_abs_z,
+          r.share_rows_ge_3sigma
+        FROM unnested
+        ORDER BY r.state, rank_in_state
         """
     ).fetchdf()
 
     all_df = con.execute(
-        """
+        f"""
         WITH enriched AS (
           SELECT
             state,
@@ -987,7 +1369,6 @@ def build_peer_group_outliers(con: duckdb.DuckDBPyConnection, available_states:
           FROM provider_peer_base
           WHERE
             provider_npi IS NOT NULL
-            AND LENGTH(provider_npi) = 10
             AND code_count >= 5
             AND month_count >= 6
         ),
@@ -1019,9 +1400,6 @@ def build_peer_group_outliers(con: duckdb.DuckDBPyConnection, available_states:
             'ALL' AS state,
             provider_npi,
             state AS primary_state,
-            ROW_NUMBER() OVER (
-              ORDER BY (z_paid_per_claim + z_claims_per_ben + z_paid_per_ben) / 3.0 DESC, total_claims DESC
-            ) AS rank_in_state,
             code_count AS peer_cells_scored,
             total_claims,
             total_paid,
@@ -1039,9 +1417,8 @@ def build_peer_group_outliers(con: duckdb.DuckDBPyConnection, available_states:
         )
         SELECT
           state,
-          provider_npi,
+          {npi_label_sql("provider_npi")} AS provider_npi,
           primary_state,
-          rank_in_state,
           peer_cells_scored,
           total_claims,
           total_paid,
@@ -1052,8 +1429,8 @@ def build_peer_group_outliers(con: duckdb.DuckDBPyConnection, available_states:
           p95_row_abs_z,
           share_rows_ge_3sigma
         FROM ranked
-        WHERE rank_in_state <= 200
-        ORDER BY rank_in_state
+        ORDER BY outlier_score DESC NULLS LAST, total_claims DESC NULLS LAST, provider_npi
+        LIMIT {PEER_TOP_K_ALL}
         """
     ).fetchdf()
 
@@ -1082,12 +1459,12 @@ def build_peer_group_outliers(con: duckdb.DuckDBPyConnection, available_states:
             }
         )
 
-    for r in all_df.itertuples(index=False):
+    for rank, r in enumerate(all_df.itertuples(index=False), start=1):
         score = pct(getattr(r, "outlier_score", 0.0))
         share = pct(getattr(r, "share_rows_ge_3sigma", 0.0))
         outliers["ALL"].append(
             {
-                "rank": int(getattr(r, "rank_in_state", 0) or 0),
+                "rank": rank,
                 "provider_npi": str(getattr(r, "provider_npi", "")),
                 "provider_state": str(getattr(r, "primary_state", "UNK") or "UNK"),
                 "peer_cells_scored": int(getattr(r, "peer_cells_scored", 0) or 0),
@@ -1121,6 +1498,319 @@ def build_peer_group_outliers(con: duckdb.DuckDBPyConnection, available_states:
     }
 
 
+def file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def enriched_cache_key(con: duckdb.DuckDBPyConnection) -> str:
+    stat = PARQUET_PATH.stat()
+    n_rows, n_row_groups = con.execute(
+        f"SELECT SUM(num_rows), COUNT(*) FROM parquet_file_metadata('{PARQUET_PATH}')"
+    ).fetchone()
+    parts = [
+        f"format={ENRICHED_FORMAT_VERSION}",
+        f"source={PARQUET_PATH.resolve()}:{stat.st_size}:{stat.st_mtime_ns}:{n_rows}:{n_row_groups}",
+        f"lookup={file_digest(NPI_LOOKUP_PATH) if NPI_LOOKUP_PATH.exists() else 'none'}",
+        f"states={','.join(VALID_STATE_CODES)}",
+    ]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def attach_enriched_cache(con: duckdb.DuckDBPyConnection) -> bool:
+    # The enriched table lives in its own DuckDB file named by the hash of its inputs; a
+    # cache miss builds it under a temporary name so an interrupted run never looks complete.
+    ENRICHED_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    cache_path = ENRICHED_CACHE_DIR / f"medicaid_enriched_{enriched_cache_key(con)[:16]}.duckdb"
+    hit = cache_path.exists()
+    if not hit:
+        for stale in ENRICHED_CACHE_DIR.glob("medicaid_enriched_*.duckdb*"):
+            try:
+                stale.unlink()
+            except OSError:
+                pass
+        building_path = cache_path.with_name(cache_path.name + ".building")
+        con.execute(f"ATTACH '{building_path}' AS enriched_cache")
+        build_base_views(
+            con, target="enriched_cache.medicaid_enriched", dictionary="enriched_cache.hcpcs_dictionary"
+        )
+        con.execute("DETACH enriched_cache")
+        building_path.rename(cache_path)
+
+    con.execute(f"ATTACH '{cache_path}' AS enriched_cache (READ_ONLY)")
+    con.execute("CREATE OR REPLACE VIEW medicaid_enriched AS SELECT * FROM enriched_cache.medicaid_enriched")
+    con.execute("CREATE OR REPLACE VIEW hcpcs_dictionary AS SELECT * FROM enriched_cache.hcpcs_dictionary")
+    return hit
+
+
+def month_filter_sql(months: list[str] | None) -> str:
+    if months is None:
+        return "TRUE"
+    clauses: list[str] = []
+    named = [m.replace("'", "''") for m in months if m != NULL_MONTH_KEY]
+    if named:
+        clauses.append("CAST(CLAIM_FROM_MONTH AS VARCHAR) IN (" + ", ".join(f"'{m}'" for m in named) + ")")
+    if NULL_MONTH_KEY in months:
+        clauses.append("CLAIM_FROM_MONTH IS NULL")
+    return " OR ".join(clauses) if clauses else "FALSE"
+
+
+def partials_inputs_key() -> str:
+    parts = [
+        f"format={PARTIALS_FORMAT_VERSION}",
+        f"states={','.join(VALID_STATE_CODES)}",
+        f"max_abs_unit_paid={MAX_ABS_UNIT_PAID}",
+        f"sketch_accuracy={SKETCH_RELATIVE_ACCURACY}",
+        f"lookup={file_digest(NPI_LOOKUP_PATH) if NPI_LOOKUP_PATH.exists() else 'none'}",
+    ]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def source_month_fingerprints(con: duckdb.DuckDBPyConnection) -> dict[str, str]:
+    # Order-independent content hash per month; a cheap projection-only pass over the parquet.
+    rows = con.execute(
+        f"""
+        SELECT
+          {MONTH_KEY_EXPR} AS month_key,
+          COUNT(*) AS n,
+          SUM(
+            HASH(
+              BILLING_PROVIDER_NPI_NUM,
+              SERVICING_PROVIDER_NPI_NUM,
+              HCPCS_CODE,
+              CLAIM_FROM_MONTH,
+              TOTAL_UNIQUE_BENEFICIARIES,
+              TOTAL_CLAIMS,
+              TOTAL_PAID
+            )::HUGEINT
+          ) AS h
+        FROM read_parquet('{PARQUET_PATH}')
+        GROUP BY 1
+        """
+    ).fetchall()
+    return {str(m): f"{int(n)}:{int(h or 0)}" for m, n, h in rows}
+
+
+def plan_incremental_months(con: duckdb.DuckDBPyConnection) -> tuple[list[str], list[str], dict]:
+    manifest: dict = {}
+    if PARTIALS_MANIFEST_PATH.exists():
+        manifest = json.loads(PARTIALS_MANIFEST_PATH.read_text())
+
+    inputs_key = partials_inputs_key()
+    previous = manifest.get("months", {}) if manifest.get("inputs_key") == inputs_key else {}
+    if not previous:
+        shutil.rmtree(PARTIALS_DIR, ignore_errors=True)
+
+    fingerprints = source_month_fingerprints(con)
+    dirty = sorted(m for m, fp in fingerprints.items() if previous.get(m) != fp)
+    removed = sorted(m for m in previous if m not in fingerprints)
+    return dirty, removed, {"inputs_key": inputs_key, "months": fingerprints}
+
+
+def write_month_partials(
+    con: duckdb.DuckDBPyConnection, dirty: list[str], removed: list[str], duplicate_key_rows_per_pass: int
+) -> None:
+    for kind in PARTIAL_KINDS:
+        for month in dirty + removed:
+            shutil.rmtree(PARTIALS_DIR / kind / f"month_key={month}", ignore_errors=True)
+    if not dirty:
+        return
+    PARTIALS_DIR.mkdir(parents=True, exist_ok=True)
+
+    series = [
+        ("total_paid_cents", f"{TOTAL_CENTS_EXPR} % 100", "TOTAL_PAID IS NOT NULL"),
+        ("unit_paid_cents", f"{UNIT_CENTS_EXPR} % 100", "TOTAL_PAID IS NOT NULL AND TOTAL_CLAIMS > 0"),
+    ] + [(name, sketch_key_sql(expr), RATIO_FILTER) for name, expr in RATIO_METRICS.items()]
+    series_sql = ",\n".join(
+        f"{{'series': '{name}', 'k': CASE WHEN {cond} THEN {key} END}}" for name, key, cond in series
+    )
+
+    queries = {
+        "stats": f"""
+            SELECT
+              {STATE_EXPR} AS state,
+              {MONTH_KEY_EXPR} AS month_key,
+              STRPTIME(CLAIM_FROM_MONTH || '-01', '%Y-%m-%d') AS claim_month,
+              {HEALTH_PARTIAL_SQL},
+              {CORR_PARTIAL_SQL},
+              SUM(TOTAL_PAID) AS total_paid,
+              SUM(TOTAL_CLAIMS) AS total_claims,
+              SUM(TOTAL_UNIQUE_BENEFICIARIES) AS total_bens
+            FROM medicaid_enriched
+            GROUP BY {STATE_KEY}, 2, 3
+        """,
+        "hist": f"""
+            WITH d AS (
+              SELECT
+                {STATE_KEY},
+                {MONTH_KEY_EXPR} AS month_key,
+                UNNEST([{series_sql}], recursive := true)
+              FROM medicaid_enriched
+            )
+            SELECT {STATE_EXPR} AS state, month_key, series, k, COUNT(*) AS n
+            FROM d
+            WHERE k IS NOT NULL
+            GROUP BY {STATE_KEY}, 2, 3, 4
+        """,
+        "unit_price": unit_price_moments_sql(by_month=True),
+        "unit_price_values": unit_price_values_sql(by_month=True),
+        "unit_price_sketch": unit_price_sketch_sql(by_month=True),
+        "hcpcs_corr": f"""
+            WITH g AS (
+              SELECT
+                {STATE_EXPR} AS state,
+                {MONTH_KEY_EXPR} AS month_key,
+                HCPCS_ID,
+                SUM(TOTAL_CLAIMS) AS claims,
+                {CORR_PARTIAL_SQL}
+              FROM medicaid_enriched
+              WHERE HCPCS_ID IS NOT NULL
+              GROUP BY {STATE_KEY}, 2, 3
+            )
+            SELECT g.* EXCLUDE (HCPCS_ID), h.HCPCS_CODE
+            FROM g
+            JOIN hcpcs_dictionary h USING (HCPCS_ID)
+        """,
+        "peer": f"""
+            SELECT
+              {STATE_EXPR} AS state,
+              {MONTH_KEY_EXPR} AS month_key,
+              BILLING_NPI_KEY AS provider_npi,
+              SUM(CAST(TOTAL_CLAIMS AS DOUBLE)) AS total_claims,
+              SUM(CAST(TOTAL_PAID AS DOUBLE)) AS total_paid,
+              SUM(CAST(TOTAL_UNIQUE_BENEFICIARIES AS DOUBLE)) AS total_bens,
+              LIST(DISTINCT HCPCS_CODE) AS codes
+            FROM medicaid_enriched
+            WHERE
+              {PEER_ROW_FILTER}
+            GROUP BY {STATE_KEY}, 2, 3
+        """,
+    }
+    for kind, sql in queries.items():
+        con.execute(
+            f"""
+            COPY ({sql}) TO '{PARTIALS_DIR / kind}'
+            (FORMAT PARQUET, PARTITION_BY (month_key), OVERWRITE_OR_IGNORE)
+            """
+        )
+    for i, where in enumerate(partition_filters(con, duplicate_key_rows_per_pass, f"HASH({DUPLICATE_KEY_COLUMNS})")):
+        con.execute(
+            f"""
+            COPY ({duplicate_key_sql(where, by_month=True)}) TO '{PARTIALS_DIR / "dup_keys"}'
+            (FORMAT PARQUET, PARTITION_BY (month_key), OVERWRITE_OR_IGNORE, FILENAME_PATTERN 'pass{i}_{{i}}')
+            """
+        )
+
+
+def partials_source(kind: str) -> str | None:
+    if not any((PARTIALS_DIR / kind).glob("month_key=*/*.parquet")):
+        return None
+    return f"read_parquet('{PARTIALS_DIR / kind}/month_key=*/*.parquet', hive_partitioning=true, hive_types_autocast=false)"
+
+
+def build_from_partials(reports: dict[str, dict], con: duckdb.DuckDBPyConnection, quantiles: str = "exact") -> None:
+    stats_src = partials_source("stats")
+    if stats_src is None:
+        return
+    stats = con.execute(f"SELECT * FROM {stats_src}").fetchdf()
+    parts = append_all_rollup(merge_partials(stats.drop(columns=["month_key", "claim_month"]), ["state"]))
+    fill_health(reports, health_rows(parts))
+    fill_correlations(reports, correlation_rows(parts))
+
+    dup_src = partials_source("dup_keys")
+    if dup_src is not None:
+        dup = con.execute(
+            f"SELECT state, SUM(key_rows) AS key_rows, SUM(duplicate_rows) AS duplicate_rows FROM {dup_src} GROUP BY 1"
+        ).fetchdf()
+        fill_duplicate_keys(reports, append_all_rollup(dup))
+
+    corr_src = partials_source("hcpcs_corr")
+    if corr_src is not None:
+        codes = con.execute(f"SELECT * EXCLUDE (month_key) FROM {corr_src}").fetchdf()
+        codes = append_all_rollup(merge_partials(codes, ["state", "HCPCS_CODE"]), keep=["HCPCS_CODE"])
+        # Same ranking as build_correlations, over the summed monthly claims.
+        top = con.execute(
+            f"""
+            WITH g AS (
+              SELECT
+                CASE WHEN GROUPING(state) = 1 THEN 'ALL' ELSE state END AS state,
+                HCPCS_CODE,
+                SUM(claims) AS claims
+              FROM {corr_src}
+              GROUP BY GROUPING SETS ((state, HCPCS_CODE), (HCPCS_CODE))
+            )
+            SELECT state, HCPCS_CODE
+            FROM g
+            QUALIFY ROW_NUMBER() OVER (PARTITION BY state ORDER BY claims DESC NULLS LAST, HCPCS_CODE) <= {HCPCS_CORR_TOP_N}
+            """
+        ).fetchdf()
+        fill_hcpcs_correlations(reports, hcpcs_correlation_rows(codes.merge(top, on=["state", "HCPCS_CODE"])))
+
+    monthly = stats[["state", "claim_month", "total_paid", "total_claims", "total_bens", "n_rows"]]
+    monthly = merge_partials(monthly.rename(columns={"n_rows": "rows"}), ["state", "claim_month"])
+    fill_temporal(reports, append_all_rollup(monthly, keep=["claim_month"]))
+
+    hist_src = partials_source("hist")
+    if hist_src is not None:
+        hist = con.execute(f"SELECT state, series, k, SUM(n) AS n FROM {hist_src} GROUP BY 1, 2, 3").fetchdf()
+        cents = append_all_rollup(
+            hist[hist["series"].str.endswith("_cents")].rename(columns={"series": "basis"}),
+            keep=["basis", "k"],
+        )
+        fill_digits_from_counts(
+            reports, cents[cents["basis"] == "total_paid_cents"], cents[cents["basis"] == "unit_paid_cents"]
+        )
+        sketches = hist[hist["series"].isin(list(RATIO_METRICS))].rename(columns={"series": "metric"})
+        fill_ratios(reports, ratio_rows(sketches))
+
+    unit_src = partials_source("unit_price")
+    quantile_src = partials_source("unit_price_sketch" if quantiles == "sketch" else "unit_price_values")
+    if unit_src is not None and quantile_src is not None:
+        if quantiles == "sketch":
+            quantiles_sql = unit_price_sketch_quantiles_sql(quantile_src)
+        else:
+            quantiles_sql = unit_price_value_quantiles_sql(quantile_src)
+        grp_sql = unit_price_merged_grp_sql(unit_src, quantiles_sql)
+        fill_unit_price(reports, con.execute(unit_price_ranked_sql(grp_sql)).fetchdf())
+
+
+def build_provider_peer_base_from_partials(con: duckdb.DuckDBPyConnection) -> None:
+    peer_src = partials_source("peer")
+    if peer_src is None:
+        con.execute(
+            """
+            CREATE OR REPLACE TEMP TABLE provider_peer_base (
+              state VARCHAR, provider_npi BIGINT, total_claims DOUBLE, total_paid DOUBLE,
+              total_bens DOUBLE, code_count BIGINT, month_count BIGINT
+            )
+            """
+        )
+        return
+    con.execute(
+        f"""
+        CREATE OR REPLACE TEMP TABLE provider_peer_base AS
+        SELECT
+          state,
+          provider_npi,
+          SUM(total_claims) AS total_claims,
+          SUM(total_paid) AS total_paid,
+          SUM(total_bens) AS total_bens,
+          LEN(LIST_DISTINCT(FLATTEN(LIST(codes)))) AS code_count,
+          COUNT(*) AS month_count
+        FROM {peer_src}
+        GROUP BY 1, 2
+        HAVING
+          SUM(total_claims) >= 500
+          AND SUM(total_bens) > 0
+          AND ISFINITE(SUM(total_paid) / NULLIF(SUM(total_claims), 0))
+          AND ABS(SUM(total_paid) / NULLIF(SUM(total_claims), 0)) <= {MAX_ABS_UNIT_PAID}
+        """
+    )
+
+
 def normalize_reports(reports: dict[str, dict]) -> dict[str, dict]:
     normalized: dict[str, dict] = {}
     for state in sorted(reports.keys()):
@@ -1144,7 +1834,130 @@ def normalize_reports(reports: dict[str, dict]) -> dict[str, dict]:
     return normalized
 
 
+def write_json(path: Path, obj: object, indent: int | None = None) -> None:
+    # json.dump encodes incrementally into the file instead of building the whole string first.
+    separators = None if indent else (",", ":")
+    with path.open("w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=indent, separators=separators)
+
+
+def write_state_shards(bundle: dict, peer_outliers: dict) -> Path:
+    # One compact file per state (report + peer outliers) so the site only fetches the state it shows.
+    shutil.rmtree(STATE_SHARDS_DIR, ignore_errors=True)
+    STATE_SHARDS_DIR.mkdir(parents=True, exist_ok=True)
+    shards: dict[str, str] = {}
+    for state, report in bundle["reports"].items():
+        name = f"{state}.json"
+        write_json(
+            STATE_SHARDS_DIR / name,
+            {
+                "state": state,
+                "report": report,
+                "peer_outliers": peer_outliers["outliers"].get(state, []),
+            },
+        )
+        shards[state] = name
+    index = {
+        "default_state": bundle["default_state"],
+        "available_states": bundle["available_states"],
+        "peer_methodology": peer_outliers["methodology"],
+        "states": shards,
+    }
+    write_json(STATE_SHARDS_INDEX_PATH, index)
+    return STATE_SHARDS_INDEX_PATH
+
+
+def write_json_outputs(bundle: dict, peer_outliers: dict, layout: str) -> list[Path]:
+    written = [REPORT_ALL_PATH]
+    write_json(REPORT_ALL_PATH, bundle["reports"]["ALL"], indent=2)
+    if layout in ("bundle", "both"):
+        write_json(REPORT_BY_STATE_PATH, bundle, indent=2)
+        write_json(PROVIDER_PEER_OUTLIERS_PATH, peer_outliers, indent=2)
+        written += [REPORT_BY_STATE_PATH, PROVIDER_PEER_OUTLIERS_PATH]
+    else:
+        REPORT_BY_STATE_PATH.unlink(missing_ok=True)
+        PROVIDER_PEER_OUTLIERS_PATH.unlink(missing_ok=True)
+    if layout in ("sharded", "both"):
+        written.append(write_state_shards(bundle, peer_outliers))
+    else:
+        shutil.rmtree(STATE_SHARDS_DIR, ignore_errors=True)
+    # Every layout gets the small sidecar signal_score.py reads instead of the full reports. It is
+    # written last and stamped with the outputs above, so a run that fails before it leaves a
+    # sidecar signal_score.py recognizes as stale.
+    features = {state: project_feature_inputs(report) for state, report in bundle["reports"].items()}
+    write_json(REPORT_FEATURES_PATH, {**bundle, "reports": features, "sources": source_stamps(OUT_JSON)})
+    written.append(REPORT_FEATURES_PATH)
+    return written
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Heavy build: recompute report artifacts from the Medicaid parquet.")
+    parser.add_argument(
+        "--scan-mode",
+        choices=["fused", "per-builder"],
+        default="fused",
+        help="fused: shared grouped scans covering every builder (default); per-builder: one scan per builder and rollup",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=f"rescan only new or changed CLAIM_FROM_MONTH partitions and merge month partials persisted in {PARTIALS_DIR}",
+    )
+    parser.add_argument(
+        "--no-enriched-cache",
+        action="store_true",
+        help=f"rebuild medicaid_enriched in the work database instead of reusing the content-keyed copy in {ENRICHED_CACHE_DIR}",
+    )
+    parser.add_argument("--threads", type=int, default=4, help="DuckDB thread budget shared by all builders")
+    parser.add_argument(
+        "--builder-workers",
+        type=int,
+        default=3,
+        help="number of builders run concurrently on separate cursors (1 runs them in sequence)",
+    )
+    parser.add_argument(
+        "--unit-price-quantiles",
+        choices=["exact", "sketch"],
+        default="exact",
+        help=(
+            "exact: QUANTILE_CONT in HCPCS-bucketed passes, or over per-month unit-price counts with --incremental "
+            "(default); sketch: mergeable log-bucket sketches, "
+            f"p10/p90 each within {SKETCH_RELATIVE_ACCURACY:.1%}% relative error, memory bounded by bucket count. "
+            "The p90-p10 spread behind suspicion_score has no such bound (it can shift by 100%% or more when "
+            "p10 and p90 are close), so the top_suspicious ranking may differ from exact mode"
+        ),
+    )
+    parser.add_argument(
+        "--unit-price-rows-per-pass",
+        type=int,
+        default=UNIT_PRICE_ROWS_PER_PASS,
+        help="rows per HCPCS-bucketed pass of the exact unit-price quantiles; lower it to cap memory",
+    )
+    parser.add_argument(
+        "--duplicate-key-rows-per-pass",
+        type=int,
+        default=DUPLICATE_KEY_ROWS_PER_PASS,
+        help="rows per hash-partitioned pass of the exact duplicate-key count; lower it to cap memory",
+    )
+    parser.add_argument(
+        "--json-layout",
+        choices=["bundle", "sharded", "both"],
+        default="both",
+        help=(
+            f"bundle: {REPORT_BY_STATE_PATH.name} and {PROVIDER_PEER_OUTLIERS_PATH.name}; "
+            f"sharded: one compact file per state plus {STATE_SHARDS_INDEX_PATH}; both (default)"
+        ),
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help=f"record per-stage and per-statement timing, rows scanned, memory, spill and query plans to {BUILD_PROFILE_PATH}",
+    )
+    return parser.parse_args()
+
+
 def main() -> None:
+    args = parse_args()
     OUT_JSON.mkdir(parents=True, exist_ok=True)
     OUT_TABLES.mkdir(parents=True, exist_ok=True)
     OUT_TMP.mkdir(parents=True, exist_ok=True)
@@ -1157,12 +1970,24 @@ def main() -> None:
 
     db_path = OUT_TMP / f"report_work_{int(time.time())}.duckdb"
     con = duckdb.connect(str(db_path))
-    con.execute("PRAGMA threads=4")
+    con.execute(f"PRAGMA threads={args.threads}")
     con.execute("SET memory_limit='6GB'")
     con.execute("PRAGMA temp_directory='outputs/tmp'")
     con.execute("PRAGMA max_temp_directory_size='300GiB'")
     con.execute("PRAGMA preserve_insertion_order=false")
     con.execute("PRAGMA enable_progress_bar=false")
+    profiler: BuildProfiler | None = None
+    if args.profile:
+        profiler = BuildProfiler()
+        profile_settings = {
+            "scan_mode": "incremental" if args.incremental else args.scan_mode,
+            "threads": args.threads,
+            "builder_workers": args.builder_workers,
+            "unit_price_quantiles": args.unit_price_quantiles,
+            "memory_limit": con.execute("SELECT current_setting('memory_limit')").fetchone()[0],
+            "max_temp_directory_size": con.execute("SELECT current_setting('max_temp_directory_size')").fetchone()[0],
+        }
+        con = ProfiledConnection(con, profiler)
     start = time.time()
 
     def checkpoint(label: str) -> None:
@@ -1170,24 +1995,51 @@ def main() -> None:
         print(f"[{elapsed_min:6.2f} min] {label}", flush=True)
 
     checkpoint("Starting report generation")
-    build_base_views(con)
-    checkpoint("Materialized base tables")
+    manifest: dict | None = None
+    with profile_stage(profiler, "base_tables"):
+        if args.incremental:
+            dirty, removed, manifest = plan_incremental_months(con)
+            checkpoint(f"Planned incremental rebuild ({len(dirty)} new/changed months, {len(removed)} removed)")
+            build_base_views(con, months=dirty)
+            checkpoint("Materialized base tables")
+        elif args.no_enriched_cache:
+            build_base_views(con)
+            checkpoint("Materialized base tables")
+        elif attach_enriched_cache(con):
+            checkpoint(f"Reused cached base tables from {ENRICHED_CACHE_DIR}")
+        else:
+            checkpoint(f"Materialized base tables into {ENRICHED_CACHE_DIR}")
 
     reports: dict[str, dict] = {}
     ensure_report(reports, "ALL")
-    build_health(reports, con)
-    checkpoint("Completed data health")
-    build_unit_price(reports, con)
-    checkpoint("Completed signal 1 inputs (unit price)")
-    build_digits(reports, con)
-    checkpoint("Completed signal 2/5 inputs (digits + entropy)")
-    build_correlations(reports, con)
-    checkpoint("Completed signal 3 inputs (correlations)")
-    build_ratios(reports, con)
-    checkpoint("Completed ratio summaries")
-    build_temporal(reports, con)
-    checkpoint("Completed signal 4 inputs (temporal)")
-    build_heaping(reports)
+    if args.incremental:
+        with profile_stage(profiler, "write_month_partials"):
+            write_month_partials(con, dirty, removed, args.duplicate_key_rows_per_pass)
+            PARTIALS_MANIFEST_PATH.write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+        checkpoint("Updated month partials")
+        with profile_stage(profiler, "build_from_partials"):
+            build_from_partials(reports, con, args.unit_price_quantiles)
+        checkpoint("Merged month partials into report sections")
+    else:
+        tasks = FUSED_TASKS if args.scan_mode == "fused" else PER_BUILDER_TASKS
+        unit_price = update_wrapper(
+            partial(
+                build_unit_price,
+                quantiles=args.unit_price_quantiles,
+                rows_per_pass=args.unit_price_rows_per_pass,
+            ),
+            build_unit_price,
+        )
+        tasks = [
+            (label, unit_price if builder is build_unit_price else builder, sections)
+            for label, builder, sections in tasks
+        ]
+        run_builders(reports, con, tasks, args.builder_workers, checkpoint, profiler)
+        with profile_stage(profiler, "build_duplicate_keys"):
+            build_duplicate_keys(reports, con, args.duplicate_key_rows_per_pass)
+        checkpoint("Completed duplicate-key rate")
+    with profile_stage(profiler, "build_heaping"):
+        build_heaping(reports)
     checkpoint("Completed signal 6 inputs (heaping)")
 
     reports = normalize_reports(reports)
@@ -1198,7 +2050,12 @@ def main() -> None:
     if "UNK" in reports:
         available_states.append("UNK")
 
-    peer_outliers = build_peer_group_outliers(con, available_states)
+    with profile_stage(profiler, "build_peer_group_outliers"):
+        if args.incremental:
+            build_provider_peer_base_from_partials(con)
+        else:
+            build_provider_peer_base(con)
+        peer_outliers = build_peer_group_outliers(con, available_states)
     checkpoint("Completed provider peer outlier modeling")
 
     bundle = {
@@ -1207,18 +2064,19 @@ def main() -> None:
         "reports": reports,
     }
 
-    REPORT_ALL_PATH.write_text(json.dumps(reports["ALL"], indent=2), encoding="utf-8")
-    REPORT_BY_STATE_PATH.write_text(json.dumps(bundle, indent=2), encoding="utf-8")
-    PROVIDER_PEER_OUTLIERS_PATH.write_text(json.dumps(peer_outliers, indent=2), encoding="utf-8")
+    written = write_json_outputs(bundle, peer_outliers, args.json_layout)
+    written.append(publish_artifacts())
 
     checkpoint("Wrote all report artifacts")
-    print(f"Wrote {REPORT_ALL_PATH}")
-    print(f"Wrote {REPORT_BY_STATE_PATH}")
-    print(f"Wrote {PROVIDER_PEER_OUTLIERS_PATH}")
+    for path in written:
+        print(f"Wrote {path}")
     print(f"Wrote {TOP_SUSPICIOUS_PATH}")
     print(f"Wrote {TOP_VOLUME_PATH}")
     print(f"Wrote {MONTHLY_ALL_PATH}")
     print(f"Wrote {MONTHLY_BY_STATE_PATH}")
+    if profiler is not None:
+        profiler.write(BUILD_PROFILE_PATH, profile_settings)
+        print(f"Wrote {BUILD_PROFILE_PATH}")
 
 
 if __name__ == "__main__":
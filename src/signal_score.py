@@ -1,236 +1,306 @@
 from __future__ import annotations
 
+import argparse
 import json
 import math
+import os
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-import random
-import statistics
+from typing import Any, Iterator, TextIO
+
+import numpy as np
+
+from artifacts import publish_artifacts
 
 REPORT_PATH = Path("outputs/json/report.json")
 REPORT_BY_STATE_PATH = Path("outputs/json/report_by_state.json")
 OUT_PATH = Path("outputs/json/signal_score.json")
 OUT_BY_STATE_PATH = Path("outputs/json/signal_score_by_state.json")
 NULL_BASELINE_PATH = Path("outputs/json/null_model_baseline.json")
+STATE_SHARDS_INDEX_PATH = Path("outputs/json/states/index.json")
+REPORT_FEATURES_PATH = Path("outputs/json/report_features_by_state.json")
+
+# The report fields state_features reads (None = the whole section). report.py writes just these per
+# state to REPORT_FEATURES_PATH; shards and bundles are projected down to them when it is missing.
+FEATURE_INPUT_FIELDS = {
+    "unit_price": ("top_volume_cv_summary",),
+    "digits": (
+        "unit_paid_cents_last1_dist",
+        "cents_last1_dist",
+        "unit_paid_cents_last2_dist",
+        "cents_last2_dist",
+        "normalized_entropy_last2",
+    ),
+    "correlations": None,
+    "temporal": ("noise_features",),
+    "heaping": None,
+}
+
+# Full outputs the sidecar is projected from, relative to its directory. The sidecar records their
+# size and mtime when written and is ignored once they no longer match.
+FEATURE_SOURCE_NAMES = ("states/index.json", "report_by_state.json")
+# Characters read per refill when a bundle is decoded one state report at a time.
+JSON_STREAM_CHUNK_CHARS = 1 << 20
+
+# Null-model bootstrap size: max(NULL_MIN_SAMPLES, observed states * NULL_SAMPLES_PER_STATE) unless
+# --null-samples overrides it. Samples are rows of an (n_samples x FEATURE_KEYS) float64 matrix.
+NULL_MIN_SAMPLES = 4000
+NULL_SAMPLES_PER_STATE = 120
+
+# --bootstrap-replicates: independent calibrations (each on resampled states) that give threshold
+# confidence intervals and per-state fail probabilities. Seeds are spawned from BOOTSTRAP_SEED.
+BOOTSTRAP_SEED = 2024
+BOOTSTRAP_CONFIDENCE = 0.95
+
+FEATURE_KEYS = (
+    "ratio_median_cv",
+    "ratio_p90_cv",
+    "digit_max_dev",
+    "digit_chi",
+    "corr_ben_claims",
+    "corr_ben_paid",
+    "corr_claims_paid",
+    "temporal_acf1",
+    "temporal_smooth_ratio",
+    "entropy",
+    "heaping_share_5c",
+    "heaping_share_25c",
+    "heaping_max_bucket",
+)
+FEATURE_BOUNDS = {
+    "ratio_median_cv": (0.0, np.inf),
+    "ratio_p90_cv": (0.0, np.inf),
+    "digit_max_dev": (0.0, 1.0),
+    "digit_chi": (0.0, np.inf),
+    "corr_ben_claims": (-1.0, 1.0),
+    "corr_ben_paid": (-1.0, 1.0),
+    "corr_claims_paid": (-1.0, 1.0),
+    "temporal_acf1": (-1.0, 1.0),
+    "temporal_smooth_ratio": (0.0, np.inf),
+    "entropy": (0.0, 1.0),
+    "heaping_share_5c": (0.0, 1.0),
+    "heaping_share_25c": (0.0, 1.0),
+    "heaping_max_bucket": (0.0, 1.0),
+}
+FEATURE_INDEX = {k: j for j, k in enumerate(FEATURE_KEYS)}
+# Distribution keys arrive as "7" from JSON or 7 from in-memory reports.
+CENT_INDEX = {**{str(i): i for i in range(100)}, **{i: i for i in range(100)}}
+FEATURE_LO = np.array([FEATURE_BOUNDS[k][0] for k in FEATURE_KEYS])
+FEATURE_HI = np.array([FEATURE_BOUNDS[k][1] for k in FEATURE_KEYS])
+
+# Artifacted contrast model: each feature is scaled by, shifted by, or floored at a uniform draw.
+ARTIFACT_PERTURBATIONS = {
+    "ratio_median_cv": ("scale", 1.35, 2.4),
+    "ratio_p90_cv": ("scale", 1.35, 2.8),
+    "digit_max_dev": ("shift", 0.03, 0.12),
+    "digit_chi": ("shift", 0.15, 0.9),
+    "corr_ben_claims": ("shift", -0.55, -0.18),
+    "corr_ben_paid": ("shift", -0.55, -0.18),
+    "corr_claims_paid": ("shift", -0.55, -0.18),
+    "temporal_acf1": ("floor", 0.96, 0.999),
+    "temporal_smooth_ratio": ("scale", 0.10, 0.55),
+    "entropy": ("shift", -0.22, -0.05),
+    "heaping_share_5c": ("shift", 0.06, 0.28),
+    "heaping_share_25c": ("shift", 0.08, 0.30),
+    "heaping_max_bucket": ("shift", 0.08, 0.30),
+}
+ARTIFACT_LO = np.array([ARTIFACT_PERTURBATIONS[k][1] for k in FEATURE_KEYS])
+ARTIFACT_HI = np.array([ARTIFACT_PERTURBATIONS[k][2] for k in FEATURE_KEYS])
+ARTIFACT_SCALE, ARTIFACT_SHIFT, ARTIFACT_FLOOR = (
+    [j for j, k in enumerate(FEATURE_KEYS) if ARTIFACT_PERTURBATIONS[k][0] == op] for op in ("scale", "shift", "floor")
+)
+
+SIGNAL_NAMES = ("ratio_fail", "digit_fail", "corr_fail", "temporal_fail", "entropy_fail", "heaping_fail")
+FAMILY_NAMES = (
+    "reimbursement_ratio_clustering",
+    "digit_structure_family",
+    "correlation_structure",
+    "temporal_noise",
+    "heaping_grid_spacing",
+)
+
+THRESHOLD_QUANTILES = (
+    ("ratio_median_cv_hi", "ratio_median_cv", 0.975),
+    ("ratio_p90_cv_hi", "ratio_p90_cv", 0.975),
+    ("digit_max_dev_hi", "digit_max_dev", 0.975),
+    ("digit_chi_hi", "digit_chi", 0.975),
+    ("corr_ben_claims_lo", "corr_ben_claims", 0.025),
+    ("corr_ben_paid_lo", "corr_ben_paid", 0.025),
+    ("corr_claims_paid_lo", "corr_claims_paid", 0.025),
+    ("temporal_acf1_hi", "temporal_acf1", 0.975),
+    ("temporal_smooth_ratio_lo", "temporal_smooth_ratio", 0.025),
+    ("entropy_lo", "entropy", 0.025),
+    ("heaping_share_25c_hi", "heaping_share_25c", 0.975),
+    ("heaping_max_bucket_hi", "heaping_max_bucket", 0.975),
+)
+THRESHOLD_NAMES = tuple(name for name, _, _ in THRESHOLD_QUANTILES)
+# The thresholds each family's rules read (signal_failures, family_failures).
+FAMILY_THRESHOLDS = {
+    "reimbursement_ratio_clustering": ("ratio_median_cv_hi", "ratio_p90_cv_hi"),
+    "digit_structure_family": ("digit_max_dev_hi", "digit_chi_hi", "entropy_lo"),
+    "correlation_structure": ("corr_ben_claims_lo", "corr_ben_paid_lo", "corr_claims_paid_lo"),
+    "temporal_noise": ("temporal_acf1_hi", "temporal_smooth_ratio_lo"),
+    "heaping_grid_spacing": ("heaping_share_25c_hi", "heaping_max_bucket_hi"),
+}
 
 
 def pct(v: float | None) -> float:
     return float(v or 0.0)
 
 
-def entropy_from_distribution(dist: dict) -> float:
-    ps = [float(v) for v in dist.values() if v and float(v) > 0]
-    if not ps:
-        return 0.0
-    h = -sum(p * math.log2(p) for p in ps)
-    return float(h / math.log2(100))
-
-
-def heaping_from_distribution(dist: dict) -> dict[str, float]:
-    if not dist:
-        return {"share_on_5c_grid": 0.0, "share_on_25c_grid": 0.0, "max_cent_bucket_share": 0.0}
-    norm = {int(k): float(v) for k, v in dist.items() if v is not None}
-    if not norm:
-        return {"share_on_5c_grid": 0.0, "share_on_25c_grid": 0.0, "max_cent_bucket_share": 0.0}
-    return {
-        "share_on_5c_grid": float(sum(v for k, v in norm.items() if k % 5 == 0)),
-        "share_on_25c_grid": float(sum(v for k, v in norm.items() if k % 25 == 0)),
-        "max_cent_bucket_share": float(max(norm.values())),
-    }
-
-
-def quantile(xs: list[float], q: float) -> float:
-    if not xs:
-        return 0.0
-    arr = sorted(float(x) for x in xs)
-    if len(arr) == 1:
-        return arr[0]
-    idx = (len(arr) - 1) * q
-    lo = int(math.floor(idx))
-    hi = int(math.ceil(idx))
-    if lo == hi:
-        return arr[lo]
-    w = idx - lo
-    return arr[lo] * (1.0 - w) + arr[hi] * w
-
+def state_feature_matrix(reports: list[dict]) -> np.ndarray:
+    # One row per report. The nested fields are gathered into flat lists in one pass; the digit,
+    # entropy and heaping features are then computed for all rows at once from the stacked cent
+    # distributions (scattered as row, cent, share triples). The last-two-cents distribution is only
+    # gathered for reports that need it as a fallback.
+    n = len(reports)
+    rows = []
+    cents = {10: ([], [], []), 100: ([], [], [])}
+    entropy_missing = np.zeros(n, dtype=bool)
+    heaping_missing = np.zeros(n, dtype=bool)
+    for i, report in enumerate(reports):
+        digits = report.get("digits", {})
+        last1 = digits.get("unit_paid_cents_last1_dist") or digits.get("cents_last1_dist") or {}
+        dists = [(10, last1)]
+
+        top_volume_summary = report.get("unit_price", {}).get("top_volume_cv_summary", {})
+        corr = report.get("correlations", {})
+        corr_strat = corr.get("within_hcpcs_top200")
+        if corr_strat and corr_strat.get("n_codes"):
+            c_bc = corr_strat.get("median_ben_claims")
+            c_bp = corr_strat.get("median_ben_paid")
+            c_cp = corr_strat.get("median_claims_paid")
+        else:
+            c_bc = corr.get("TOTAL_UNIQUE_BENEFICIARIES", {}).get("TOTAL_CLAIMS")
+            c_bp = corr.get("TOTAL_UNIQUE_BENEFICIARIES", {}).get("TOTAL_PAID")
+            c_cp = corr.get("TOTAL_CLAIMS", {}).get("TOTAL_PAID")
+        temporal = report.get("temporal", {}).get("noise_features", {})
+        entropy = digits.get("normalized_entropy_last2")
+        entropy_missing[i] = entropy is None
+        heaping = report.get("heaping", {}) or {}
+        share_5c = heaping.get("share_on_5c_grid")
+        share_25c = heaping.get("share_on_25c_grid")
+        max_bucket = heaping.get("max_cent_bucket_share")
+        heaping_missing[i] = share_5c is None or share_25c is None or max_bucket is None
+        if entropy_missing[i] or heaping_missing[i]:
+            dists.append((100, digits.get("unit_paid_cents_last2_dist") or digits.get("cents_last2_dist") or {}))
+        for size, dist in dists:
+            idx, keys, values = cents[size]
+            idx.extend([i] * len(dist))
+            keys.extend(dist.keys())
+            values.extend(dist.values())
+
+        # FEATURE_KEYS order; the two digit columns are filled below.
+        rows.append(
+            [
+                pct(top_volume_summary.get("median_cv")),
+                pct(top_volume_summary.get("p90_cv")),
+                0.0,
+                0.0,
+                pct(c_bc),
+                pct(c_bp),
+                pct(c_cp),
+                pct(temporal.get("acf1_total_paid")),
+                pct(temporal.get("smooth_ratio")),
+                pct(entropy),
+                pct(share_5c),
+                pct(share_25c),
+                pct(max_bucket),
+            ]
+        )
 
-def clamp(v: float, lo: float, hi: float) -> float:
-    return min(hi, max(lo, float(v)))
+    out = np.array(rows, dtype=np.float64).reshape(n, len(FEATURE_KEYS))
+    dists = {}
+    for size, (idx, keys, values) in cents.items():
+        dist = np.zeros((n, size))
+        if idx:
+            dist[idx, [CENT_INDEX[k] for k in keys]] = [0.0 if v is None else v for v in values]
+        dists[size] = dist
+    col = FEATURE_INDEX
+
+    dev = dists[10] - 0.1
+    out[:, col["digit_max_dev"]] = np.abs(dev).max(axis=1)
+    out[:, col["digit_chi"]] = (dev**2 / 0.1).sum(axis=1)
+
+    # Entropy and heaping shares fall back to the last-two-cents distribution when the report lacks them.
+    if entropy_missing.any():
+        p = dists[100][entropy_missing]
+        plogp = np.where(p > 0, p * np.log2(np.where(p > 0, p, 1.0)), 0.0)
+        out[entropy_missing, col["entropy"]] = (0.0 - plogp.sum(axis=1)) / math.log2(100)
+    if heaping_missing.any():
+        p = dists[100][heaping_missing]
+        out[heaping_missing, col["heaping_share_5c"]] = p[:, ::5].sum(axis=1)
+        out[heaping_missing, col["heaping_share_25c"]] = p[:, ::25].sum(axis=1)
+        out[heaping_missing, col["heaping_max_bucket"]] = p.max(axis=1)
+    return out
 
 
 def state_features(report: dict) -> dict[str, float]:
-    top_volume_summary = report.get("unit_price", {}).get("top_volume_cv_summary", {})
-    cv_med = pct(top_volume_summary.get("median_cv"))
-    cv_p90 = pct(top_volume_summary.get("p90_cv"))
-
-    d1 = (
-        report.get("digits", {}).get("unit_paid_cents_last1_dist")
-        or report.get("digits", {}).get("cents_last1_dist")
-        or {}
-    )
-    obs = [float(d1.get(str(i), d1.get(i, 0.0))) for i in range(10)]
-    max_dev = max(abs(x - 0.1) for x in obs) if obs else 0.0
-    chi_digit = sum(((x - 0.1) ** 2) / 0.1 for x in obs) if obs else 0.0
-
-    corr = report.get("correlations", {})
-    corr_strat = corr.get("within_hcpcs_top200")
-    if corr_strat:
-        c_bc = pct(corr_strat.get("median_ben_claims"))
-        c_bp = pct(corr_strat.get("median_ben_paid"))
-        c_cp = pct(corr_strat.get("median_claims_paid"))
-    else:
-        c_bc = pct(corr.get("TOTAL_UNIQUE_BENEFICIARIES", {}).get("TOTAL_CLAIMS"))
-        c_bp = pct(corr.get("TOTAL_UNIQUE_BENEFICIARIES", {}).get("TOTAL_PAID"))
-        c_cp = pct(corr.get("TOTAL_CLAIMS", {}).get("TOTAL_PAID"))
-
-    temporal = report.get("temporal", {}).get("noise_features", {})
-    acf1 = pct(temporal.get("acf1_total_paid"))
-    smooth_ratio = pct(temporal.get("smooth_ratio"))
-
-    entropy = report.get("digits", {}).get("normalized_entropy_last2")
-    if entropy is None:
-        entropy = entropy_from_distribution(
-            report.get("digits", {}).get("unit_paid_cents_last2_dist")
-            or report.get("digits", {}).get("cents_last2_dist")
-            or {}
-        )
-    entropy = pct(entropy)
-
-    heaping = report.get("heaping", {}) or {}
-    share_5c = heaping.get("share_on_5c_grid")
-    share_25c = heaping.get("share_on_25c_grid")
-    max_bucket = heaping.get("max_cent_bucket_share")
-    if share_5c is None or share_25c is None or max_bucket is None:
-        heaping_fallback = heaping_from_distribution(
-            report.get("digits", {}).get("unit_paid_cents_last2_dist")
-            or report.get("digits", {}).get("cents_last2_dist")
-            or {}
-        )
-        share_5c = heaping_fallback["share_on_5c_grid"]
-        share_25c = heaping_fallback["share_on_25c_grid"]
-        max_bucket = heaping_fallback["max_cent_bucket_share"]
+    return dict(zip(FEATURE_KEYS, state_feature_matrix([report])[0].tolist()))
 
-    return {
-        "ratio_median_cv": cv_med,
-        "ratio_p90_cv": cv_p90,
-        "digit_max_dev": max_dev,
-        "digit_chi": chi_digit,
-        "corr_ben_claims": c_bc,
-        "corr_ben_paid": c_bp,
-        "corr_claims_paid": c_cp,
-        "temporal_acf1": acf1,
-        "temporal_smooth_ratio": smooth_ratio,
-        "entropy": entropy,
-        "heaping_share_5c": pct(share_5c),
-        "heaping_share_25c": pct(share_25c),
-        "heaping_max_bucket": pct(max_bucket),
-    }
 
-
-def robust_sigma(xs: list[float]) -> float:
+def robust_sigma(xs: np.ndarray) -> float:
     if len(xs) < 2:
-        return max(abs(xs[0]) * 0.05, 1e-4) if xs else 1e-4
-    med = statistics.median(xs)
-    abs_dev = [abs(x - med) for x in xs]
-    mad = statistics.median(abs_dev)
+        return max(abs(float(xs[0])) * 0.05, 1e-4) if len(xs) else 1e-4
+    med = np.median(xs)
+    mad = np.median(np.abs(xs - med))
     sigma = mad * 1.4826
     if sigma <= 0:
-        sigma = statistics.pstdev(xs)
+        sigma = np.std(xs)
     return max(float(sigma), 1e-4)
 
 
-def synthesize_realistic(features: list[dict[str, float]], n: int, seed: int = 42) -> list[dict[str, float]]:
-    rng = random.Random(seed)
-    if not features:
-        return []
-
-    keys = list(features[0].keys())
-    sigmas = {k: robust_sigma([f[k] for f in features]) for k in keys}
-
-    out: list[dict[str, float]] = []
-    for _ in range(n):
-        base = dict(rng.choice(features))
-        row: dict[str, float] = {}
-        for k in keys:
-            v = base[k] + rng.gauss(0.0, sigmas[k] * 0.25)
-            row[k] = float(v)
-
-        row["ratio_median_cv"] = max(0.0, row["ratio_median_cv"])
-        row["ratio_p90_cv"] = max(0.0, row["ratio_p90_cv"])
-        row["digit_max_dev"] = clamp(row["digit_max_dev"], 0.0, 1.0)
-        row["digit_chi"] = max(0.0, row["digit_chi"])
-        row["corr_ben_claims"] = clamp(row["corr_ben_claims"], -1.0, 1.0)
-        row["corr_ben_paid"] = clamp(row["corr_ben_paid"], -1.0, 1.0)
-        row["corr_claims_paid"] = clamp(row["corr_claims_paid"], -1.0, 1.0)
-        row["temporal_acf1"] = clamp(row["temporal_acf1"], -1.0, 1.0)
-        row["temporal_smooth_ratio"] = max(0.0, row["temporal_smooth_ratio"])
-        row["entropy"] = clamp(row["entropy"], 0.0, 1.0)
-        row["heaping_share_5c"] = clamp(row["heaping_share_5c"], 0.0, 1.0)
-        row["heaping_share_25c"] = clamp(row["heaping_share_25c"], 0.0, 1.0)
-        row["heaping_max_bucket"] = clamp(row["heaping_max_bucket"], 0.0, 1.0)
-        out.append(row)
-    return out
+def feature_columns(samples: np.ndarray) -> dict[str, np.ndarray]:
+    return {k: samples[:, j] for j, k in enumerate(FEATURE_KEYS)}
 
 
-def synthesize_artifacted(realistic_samples: list[dict[str, float]], seed: int = 43) -> list[dict[str, float]]:
-    rng = random.Random(seed)
-    out: list[dict[str, float]] = []
-    for base in realistic_samples:
-        row = dict(base)
-        row["ratio_median_cv"] = max(0.0, row["ratio_median_cv"] * rng.uniform(1.35, 2.4))
-        row["ratio_p90_cv"] = max(0.0, row["ratio_p90_cv"] * rng.uniform(1.35, 2.8))
+def clamp_features(samples: np.ndarray) -> np.ndarray:
+    return np.clip(samples, FEATURE_LO, FEATURE_HI, out=samples)
 
-        row["digit_max_dev"] = clamp(row["digit_max_dev"] + rng.uniform(0.03, 0.12), 0.0, 1.0)
-        row["digit_chi"] = max(0.0, row["digit_chi"] + rng.uniform(0.15, 0.9))
 
-        row["corr_ben_claims"] = clamp(row["corr_ben_claims"] - rng.uniform(0.18, 0.55), -1.0, 1.0)
-        row["corr_ben_paid"] = clamp(row["corr_ben_paid"] - rng.uniform(0.18, 0.55), -1.0, 1.0)
-        row["corr_claims_paid"] = clamp(row["corr_claims_paid"] - rng.uniform(0.18, 0.55), -1.0, 1.0)
+def synthesize_realistic(observed: np.ndarray, n: int, seed: int | np.random.SeedSequence = 42) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    if not len(observed):
+        return np.empty((0, len(FEATURE_KEYS)))
 
-        row["temporal_acf1"] = clamp(max(row["temporal_acf1"], rng.uniform(0.96, 0.999)), -1.0, 1.0)
-        row["temporal_smooth_ratio"] = max(0.0, row["temporal_smooth_ratio"] * rng.uniform(0.10, 0.55))
+    sigmas = np.array([robust_sigma(observed[:, j]) for j in range(observed.shape[1])])
+    base = observed[rng.integers(len(observed), size=n)]
+    return clamp_features(base + rng.standard_normal(base.shape) * (sigmas * 0.25))
 
-        row["entropy"] = clamp(row["entropy"] - rng.uniform(0.05, 0.22), 0.0, 1.0)
-
-        row["heaping_share_5c"] = clamp(row["heaping_share_5c"] + rng.uniform(0.06, 0.28), 0.0, 1.0)
-        row["heaping_share_25c"] = clamp(row["heaping_share_25c"] + rng.uniform(0.08, 0.30), 0.0, 1.0)
-        row["heaping_max_bucket"] = clamp(row["heaping_max_bucket"] + rng.uniform(0.08, 0.30), 0.0, 1.0)
-        out.append(row)
-    return out
 
+def synthesize_artifacted(realistic_samples: np.ndarray, seed: int = 43) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    draws = rng.uniform(ARTIFACT_LO, ARTIFACT_HI, size=realistic_samples.shape)
+    out = realistic_samples.copy()
+    out[:, ARTIFACT_SCALE] *= draws[:, ARTIFACT_SCALE]
+    out[:, ARTIFACT_SHIFT] += draws[:, ARTIFACT_SHIFT]
+    out[:, ARTIFACT_FLOOR] = np.maximum(out[:, ARTIFACT_FLOOR], draws[:, ARTIFACT_FLOOR])
+    return clamp_features(out)
 
-def derive_thresholds(realistic_samples: list[dict[str, float]]) -> dict[str, float]:
-    def col(name: str) -> list[float]:
-        return [r[name] for r in realistic_samples]
 
+def derive_thresholds(realistic_samples: np.ndarray) -> dict[str, float]:
+    if not len(realistic_samples):
+        return {name: 0.0 for name in THRESHOLD_NAMES}
     return {
-        "ratio_median_cv_hi": quantile(col("ratio_median_cv"), 0.975),
-        "ratio_p90_cv_hi": quantile(col("ratio_p90_cv"), 0.975),
-        "digit_max_dev_hi": quantile(col("digit_max_dev"), 0.975),
-        "digit_chi_hi": quantile(col("digit_chi"), 0.975),
-        "corr_ben_claims_lo": quantile(col("corr_ben_claims"), 0.025),
-        "corr_ben_paid_lo": quantile(col("corr_ben_paid"), 0.025),
-        "corr_claims_paid_lo": quantile(col("corr_claims_paid"), 0.025),
-        "temporal_acf1_hi": quantile(col("temporal_acf1"), 0.975),
-        "temporal_smooth_ratio_lo": quantile(col("temporal_smooth_ratio"), 0.025),
-        "entropy_lo": quantile(col("entropy"), 0.025),
-        "heaping_share_25c_hi": quantile(col("heaping_share_25c"), 0.975),
-        "heaping_max_bucket_hi": quantile(col("heaping_max_bucket"), 0.975),
+        name: float(np.quantile(realistic_samples[:, FEATURE_INDEX[key]], q))
+        for name, key, q in THRESHOLD_QUANTILES
     }
 
 
-def signal_failures(feat: dict[str, float], thr: dict[str, float]) -> dict[str, bool]:
-    ratio_fail = (feat["ratio_median_cv"] > thr["ratio_median_cv_hi"]) or (feat["ratio_p90_cv"] > thr["ratio_p90_cv_hi"])
-    digit_fail = (feat["digit_max_dev"] > thr["digit_max_dev_hi"]) or (feat["digit_chi"] > thr["digit_chi_hi"])
+def signal_failures(feat: dict, thr: dict[str, float]) -> dict:
+    # Elementwise operators so the same rules score one state (floats) or a sample matrix (columns).
+    ratio_fail = (feat["ratio_median_cv"] > thr["ratio_median_cv_hi"]) | (feat["ratio_p90_cv"] > thr["ratio_p90_cv_hi"])
+    digit_fail = (feat["digit_max_dev"] > thr["digit_max_dev_hi"]) | (feat["digit_chi"] > thr["digit_chi_hi"])
     corr_fail = (
         (feat["corr_claims_paid"] < thr["corr_claims_paid_lo"])
-        or (feat["corr_ben_claims"] < thr["corr_ben_claims_lo"])
-        or (feat["corr_ben_paid"] < thr["corr_ben_paid_lo"])
+        | (feat["corr_ben_claims"] < thr["corr_ben_claims_lo"])
+        | (feat["corr_ben_paid"] < thr["corr_ben_paid_lo"])
     )
-    temporal_fail = (feat["temporal_acf1"] > thr["temporal_acf1_hi"]) and (
+    temporal_fail = (feat["temporal_acf1"] > thr["temporal_acf1_hi"]) & (
         feat["temporal_smooth_ratio"] < thr["temporal_smooth_ratio_lo"]
     )
     entropy_fail = feat["entropy"] < thr["entropy_lo"]
-    heaping_fail = (feat["heaping_share_25c"] > thr["heaping_share_25c_hi"]) or (
+    heaping_fail = (feat["heaping_share_25c"] > thr["heaping_share_25c_hi"]) | (
         feat["heaping_max_bucket"] > thr["heaping_max_bucket_hi"]
     )
     return {
@@ -243,51 +313,59 @@ def signal_failures(feat: dict[str, float], thr: dict[str, float]) -> dict[str,
     }
 
 
-def failure_counts(feat: dict[str, float], thr: dict[str, float]) -> tuple[int, int]:
-    fs = signal_failures(feat, thr)
-    family_failures = {
+def family_failures(fs: dict) -> dict:
+    return {
         "reimbursement_ratio_clustering": fs["ratio_fail"],
-        "digit_structure_family": fs["digit_fail"] or fs["entropy_fail"],
+        "digit_structure_family": fs["digit_fail"] | fs["entropy_fail"],
         "correlation_structure": fs["corr_fail"],
         "temporal_noise": fs["temporal_fail"],
         "heaping_grid_spacing": fs["heaping_fail"],
     }
-    return sum(1 for v in family_failures.values() if v), sum(1 for v in fs.values() if v)
 
 
-def calibrate_null_baseline(reports: dict[str, dict]) -> dict:
-    observed = [
-        state_features(rep)
-        for state, rep in reports.items()
-        if state not in {"ALL", "UNK"} and isinstance(rep, dict)
-    ]
+def threshold_vector(thr: dict[str, float]) -> np.ndarray:
+    return np.array([thr[name] for name in THRESHOLD_NAMES], dtype=np.float64)
+
+
+def failure_masks(features: np.ndarray, thresholds: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # features is (n, FEATURE_KEYS); thresholds is a THRESHOLD_NAMES vector or any stack of them that
+    # broadcasts against the rows, e.g. (n, k) per row or (r, 1, k) for r threshold draws.
+    thr = {name: thresholds[..., j] for j, name in enumerate(THRESHOLD_NAMES)}
+    fs = signal_failures(feature_columns(features), thr)
+    families = family_failures(fs)
+    return np.stack([fs[k] for k in SIGNAL_NAMES], axis=-1), np.stack([families[k] for k in FAMILY_NAMES], axis=-1)
+
+
+def failure_counts(samples: np.ndarray, thr: dict[str, float]) -> tuple[np.ndarray, np.ndarray]:
+    signals, families = failure_masks(samples, threshold_vector(thr))
+    return families.sum(axis=1), signals.sum(axis=1)
+
 
-    realistic = synthesize_realistic(observed, n=max(4000, len(observed) * 120), seed=42)
+def null_sample_count(n_observed: int) -> int:
+    return max(NULL_MIN_SAMPLES, n_observed * NULL_SAMPLES_PER_STATE)
+
+
+def observed_features(reports: dict[str, dict]) -> np.ndarray:
+    return state_feature_matrix(
+        [rep for state, rep in reports.items() if state not in {"ALL", "UNK"} and isinstance(rep, dict)]
+    )
+
+
+def calibrate_null_baseline(reports: dict[str, dict], n_samples: int | None = None) -> dict:
+    observed = observed_features(reports)
+
+    realistic = synthesize_realistic(observed, n=n_samples or null_sample_count(len(observed)), seed=42)
     synthetic = synthesize_artifacted(realistic, seed=43)
     thr = derive_thresholds(realistic)
 
-    real_family_fails = []
-    real_raw_fails = []
-    for feat in realistic:
-        ff, rf = failure_counts(feat, thr)
-        real_family_fails.append(ff)
-        real_raw_fails.append(rf)
-
-    syn_family_fails = []
-    syn_raw_fails = []
-    for feat in synthetic:
-        ff, rf = failure_counts(feat, thr)
-        syn_family_fails.append(ff)
-        syn_raw_fails.append(rf)
-
-    def summary(xs: list[int]) -> dict:
-        if not xs:
+    real_family_fails, real_raw_fails = failure_counts(realistic, thr)
+    syn_family_fails, syn_raw_fails = failure_counts(synthetic, thr)
+
+    def summary(xs: np.ndarray) -> dict:
+        if not len(xs):
             return {"mean": 0.0, "p50": 0.0, "p90": 0.0}
-        return {
-            "mean": float(sum(xs) / len(xs)),
-            "p50": float(quantile([float(x) for x in xs], 0.5)),
-            "p90": float(quantile([float(x) for x in xs], 0.9)),
-        }
+        p50, p90 = np.quantile(xs, [0.5, 0.9])
+        return {"mean": float(xs.mean()), "p50": float(p50), "p90": float(p90)}
 
     return {
         "method": "empirical_null_bootstrap_plus_artifacted_synthetic",
@@ -309,6 +387,80 @@ def calibrate_null_baseline(reports: dict[str, dict]) -> dict:
     }
 
 
+def bootstrap_thresholds(observed: np.ndarray, n_samples: int, seeds: list[np.random.SeedSequence]) -> np.ndarray:
+    # One row of THRESHOLD_QUANTILES per replicate. Each replicate resamples the observed states
+    # before synthesizing, so the spread reflects which states were observed as well as sampling noise.
+    rows = []
+    for seed in seeds:
+        states_seed, samples_seed = seed.spawn(2)
+        picks = np.random.default_rng(states_seed).integers(len(observed), size=len(observed))
+        thr = derive_thresholds(synthesize_realistic(observed[picks], n_samples, seed=samples_seed))
+        rows.append(threshold_vector(thr))
+    return np.array(rows, dtype=np.float64).reshape(-1, len(THRESHOLD_NAMES))
+
+
+def replicate_threshold_draws(
+    observed: np.ndarray, replicates: int, n_samples: int, workers: int, seed: int = BOOTSTRAP_SEED
+) -> np.ndarray:
+    # Replicate i always gets the i-th spawned seed, so results do not depend on the worker count.
+    seeds = np.random.SeedSequence(seed).spawn(replicates)
+    workers = max(1, min(workers, replicates))
+    if workers == 1:
+        return bootstrap_thresholds(observed, n_samples, seeds)
+    chunks = [seeds[i::workers] for i in range(workers)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        parts = list(pool.map(bootstrap_thresholds, [observed] * workers, [n_samples] * workers, chunks))
+    draws = np.empty((replicates, len(THRESHOLD_NAMES)))
+    for i, part in enumerate(parts):
+        draws[i::workers] = part
+    return draws
+
+
+def bootstrap_null_baseline(
+    reports: dict[str, dict],
+    replicates: int,
+    workers: int,
+    n_samples: int | None = None,
+    confidence: float = BOOTSTRAP_CONFIDENCE,
+) -> dict:
+    observed = observed_features(reports)
+    n_samples = n_samples or null_sample_count(len(observed))
+    if not len(observed) or replicates < 1:
+        return {"replicates": 0, "thresholds": {}, "states": {}}
+    draws = replicate_threshold_draws(observed, replicates, n_samples, workers)
+
+    alpha = (1.0 - confidence) / 2.0
+    lo, hi = np.quantile(draws, [alpha, 1.0 - alpha], axis=0)
+    intervals = {
+        name: {"lo": float(lo[j]), "hi": float(hi[j]), "mean": float(draws[:, j].mean()), "std": float(draws[:, j].std())}
+        for j, name in enumerate(THRESHOLD_NAMES)
+    }
+
+    # Share of replicates under which each state (ALL included) fails each family / the 3+ rule.
+    states = [state for state, rep in reports.items() if isinstance(rep, dict)]
+    _, families = failure_masks(state_feature_matrix([reports[state] for state in states]), draws[:, None, :])
+    family_probability = families.mean(axis=0)
+    fail_probability = (families.sum(axis=-1) >= 3).mean(axis=0)
+
+    return {
+        "replicates": replicates,
+        "samples_per_replicate": n_samples,
+        "seed": BOOTSTRAP_SEED,
+        "confidence": confidence,
+        "resampled_states": len(observed),
+        "thresholds": intervals,
+        "states": {
+            state: {
+                "fail_probability": float(fail_probability[i]),
+                "family_fail_probability": {
+                    name: float(family_probability[i, k]) for k, name in enumerate(FAMILY_NAMES)
+                },
+            }
+            for i, state in enumerate(states)
+        },
+    }
+
+
 def fallback_thresholds() -> dict[str, float]:
     return {
         "ratio_median_cv_hi": 3.0,
@@ -326,12 +478,11 @@ def fallback_thresholds() -> dict[str, float]:
     }
 
 
-def score_report(report: dict, thresholds: dict[str, float] | None = None) -> dict:
-    thr = thresholds or fallback_thresholds()
-    feat = state_features(report)
-    fs = signal_failures(feat, thr)
+def score_view(features: np.ndarray, signals: np.ndarray, families: np.ndarray, thr: dict[str, float]) -> dict:
+    feat = dict(zip(FEATURE_KEYS, features.tolist()))
+    fs = dict(zip(SIGNAL_NAMES, signals.tolist()))
 
-    signals = [
+    signals_out = [
         {
             "name": "Reimbursement ratio clustering",
             "failed": fs["ratio_fail"],
@@ -400,39 +551,209 @@ def score_report(report: dict, thresholds: dict[str, float] | None = None) -> di
         },
     ]
 
-    family_failures = {
-        "reimbursement_ratio_clustering": fs["ratio_fail"],
-        "digit_structure_family": fs["digit_fail"] or fs["entropy_fail"],
-        "correlation_structure": fs["corr_fail"],
-        "temporal_noise": fs["temporal_fail"],
-        "heaping_grid_spacing": fs["heaping_fail"],
-    }
-    fail_count = sum(1 for v in family_failures.values() if v)
-    raw_fail_count = sum(1 for s in signals if s["failed"])
+    fail_count = int(families.sum())
     verdict = "LIKELY_SYNTHETIC_OR_ALTERED" if fail_count >= 3 else "NOT_FLAGGED_BY_3PLUS_RULE"
 
     return {
         "rule": "If 3+ independent signal families fail -> dataset likely synthetic or altered",
         "calibration": "null_model_baseline",
         "fail_count": fail_count,
-        "family_total": len(family_failures),
-        "raw_fail_count": raw_fail_count,
-        "family_failures": family_failures,
-        "signals": signals,
+        "family_total": len(FAMILY_NAMES),
+        "raw_fail_count": int(signals.sum()),
+        "family_failures": dict(zip(FAMILY_NAMES, families.tolist())),
+        "signals": signals_out,
         "verdict": verdict,
     }
 
 
+def score_states(reports: dict[str, dict], thresholds: dict[str, float] | None = None) -> dict[str, dict]:
+    thr = thresholds or fallback_thresholds()
+    features = state_feature_matrix(list(reports.values()))
+    signals, families = failure_masks(features, threshold_vector(thr))
+    return {state: score_view(features[i], signals[i], families[i], thr) for i, state in enumerate(reports)}
+
+
+def score_report(report: dict, thresholds: dict[str, float] | None = None) -> dict:
+    return score_states({"report": report}, thresholds)["report"]
+
+
+def project_feature_inputs(report: dict) -> dict:
+    out = {}
+    for section, keys in FEATURE_INPUT_FIELDS.items():
+        value = report.get(section)
+        if isinstance(value, dict):
+            out[section] = value if keys is None else {k: value[k] for k in keys if k in value}
+    return out
+
+
+def source_stamps(json_dir: Path) -> dict[str, dict]:
+    stamps = {}
+    for name in FEATURE_SOURCE_NAMES:
+        path = json_dir / name
+        if path.exists():
+            stat = path.stat()
+            stamps[name] = {"bytes": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    return stamps
+
+
+class JsonMemberStream:
+    # Decodes a JSON object member by member with raw_decode over a buffer refilled in chunks, so a
+    # bundle costs the memory of its largest member rather than of the whole file.
+    def __init__(self, f: TextIO, chunk_chars: int = JSON_STREAM_CHUNK_CHARS) -> None:
+        self.f = f
+        self.chunk_chars = chunk_chars
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_chars)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos :] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buf) or not self.fill():
+                return self.buf[self.pos : self.pos + 1]
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} in JSON stream, found {self.peek()!r}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            # A number or literal ending at the buffer edge may continue in the next chunk.
+            if end < len(self.buf) or not self.fill():
+                self.pos = end
+                return value
+
+    def members(self) -> Iterator[str]:
+        # Yields each key; the caller consumes its value with value() or a nested members().
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(":")
+            yield key
+            if self.peek() == ",":
+                self.pos += 1
+                continue
+            self.expect("}")
+            return
+
+
+def read_state_bundle(path: Path) -> dict:
+    # Accepts a features sidecar, a report_by_state.json bundle or a states/index.json shard index.
+    # Reports come back projected to the fields state_features reads, one state in memory at a time.
+    if path.name == REPORT_FEATURES_PATH.name:
+        with path.open(encoding="utf-8") as f:
+            sidecar = json.load(f)
+        current = source_stamps(path.parent)
+        if sidecar.get("sources", {}) == current or not current:
+            return read_state_bundle_data(path, sidecar)
+        source = path.parent / next(iter(current))
+        print(f"Ignoring {path}: {source} changed since it was written")
+        return read_state_bundle(source)
+
+    data: dict = {}
+    with path.open(encoding="utf-8") as f:
+        stream = JsonMemberStream(f)
+        for key in stream.members():
+            if key == "reports":
+                data["reports"] = {state: project_feature_inputs(stream.value()) for state in stream.members()}
+            else:
+                data[key] = stream.value()
+    return read_state_bundle_data(path, data)
+
+
+def read_state_bundle_data(path: Path, data: dict) -> dict:
+    if "reports" in data:
+        reports = {state: project_feature_inputs(rep) for state, rep in data["reports"].items()}
+    else:
+        reports = {}
+        for state, name in data["states"].items():
+            with (path.parent / name).open(encoding="utf-8") as f:
+                reports[state] = project_feature_inputs(json.load(f)["report"])
+    return {
+        "default_state": data.get("default_state", "ALL"),
+        "available_states": data.get("available_states", ["ALL"]),
+        "reports": reports,
+    }
+
+
+def load_state_bundle() -> dict | None:
+    # Smallest first: the sidecar, then per-state shards, then the full bundle.
+    for path in (REPORT_FEATURES_PATH, STATE_SHARDS_INDEX_PATH, REPORT_BY_STATE_PATH):
+        if path.exists():
+            return read_state_bundle(path)
+    return None
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Score state reports against a calibrated null model.")
+    parser.add_argument(
+        "--null-samples",
+        type=int,
+        default=None,
+        help=f"null-model bootstrap samples (default: max({NULL_MIN_SAMPLES}, states x {NULL_SAMPLES_PER_STATE}))",
+    )
+    parser.add_argument(
+        "--bootstrap-replicates",
+        type=int,
+        default=0,
+        help="independent calibration replicates for threshold intervals and per-state fail probabilities (0 = off)",
+    )
+    parser.add_argument(
+        "--bootstrap-workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="processes the replicates are spread over",
+    )
+    parser.add_argument("--bootstrap-confidence", type=float, default=BOOTSTRAP_CONFIDENCE)
+    return parser.parse_args()
+
+
 def main() -> None:
-    if REPORT_BY_STATE_PATH.exists():
-        bundle = json.loads(REPORT_BY_STATE_PATH.read_text())
+    args = parse_args()
+    bundle = load_state_bundle()
+    if bundle is not None:
         reports = bundle.get("reports", {})
 
-        baseline = calibrate_null_baseline(reports)
-        NULL_BASELINE_PATH.write_text(json.dumps(baseline, indent=2), encoding="utf-8")
+        baseline = calibrate_null_baseline(reports, n_samples=args.null_samples)
         thresholds = baseline.get("thresholds", fallback_thresholds())
 
-        scores = {state: score_report(rep, thresholds) for state, rep in reports.items()}
+        scores = score_states(reports, thresholds)
+        if args.bootstrap_replicates > 0:
+            uncertainty = bootstrap_null_baseline(
+                reports,
+                args.bootstrap_replicates,
+                args.bootstrap_workers,
+                n_samples=args.null_samples,
+                confidence=args.bootstrap_confidence,
+            )
+            baseline["bootstrap"] = {k: v for k, v in uncertainty.items() if k != "states"}
+            for state, probabilities in uncertainty["states"].items():
+                scores[state]["uncertainty"] = {"replicates": uncertainty["replicates"], **probabilities}
+        NULL_BASELINE_PATH.write_text(json.dumps(baseline, indent=2), encoding="utf-8")
 
         by_state_out = {
             "default_state": bundle.get("default_state", "ALL"),
@@ -451,6 +772,7 @@ def main() -> None:
         print(f"Wrote {NULL_BASELINE_PATH}")
         print(f"Wrote {OUT_PATH}")
         print(f"Wrote {OUT_BY_STATE_PATH}")
+        print(f"Wrote {publish_artifacts()}")
         return
 
     thresholds = fallback_thresholds()
@@ -458,6 +780,7 @@ def main() -> None:
     result = score_report(report, thresholds)
     OUT_PATH.write_text(json.dumps(result, indent=2), encoding="utf-8")
     print(f"Wrote {OUT_PATH}")
+    print(f"Wrote {publish_artifacts()}")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import argparse
+import json
+import zipfile
+from pathlib import Path
+
+import duckdb
+
+from build_npi_state_lookup import NPPES_ZIP_PATH
+from report import PARQUET_PATH, VALID_STATE_CODES
+
+# Synthetic stand-ins for the Medicaid provider spending parquet and the NPPES dissemination zip.
+# Every random draw is a hash of (row id, seed, salt), so the output depends only on the arguments,
+# never on DuckDB's thread count, and 100M+ rows stream straight to parquet.
+
+SYNTH_META_NAME = "synth_meta.json"
+SYNTH_FORMAT_VERSION = 2
+# Golden-ratio multiplier spreading consecutive salts across all 64 bits before the final hash.
+SALT_MIX = 0x9E3779B97F4A7C15
+NPI_BASE = 1_000_000_000
+DEFAULT_CODES = 8_000
+DEFAULT_MONTHS = 84
+# Index 0 takes size ** (-1 / skew) of the rows; steeper heads make (billing, servicing, HCPCS,
+# month) keys collide far more often than DUPLICATE_RATE.
+HCPCS_SKEW = 2.5
+BILLING_SKEW = 2.0
+SERVICING_SKEW = 1.5
+SAME_SERVICING_RATE = 0.7
+DUPLICATE_RATE = 0.01
+# Key repeats beyond the planted duplicates, from independent draws landing on the same key.
+MAX_KEY_COLLISION_RATE = 0.005
+MISSING_SERVICING_RATE = 0.01
+MISSING_HCPCS_RATE = 0.005
+MISSING_PAID_RATE = 0.002
+ADJUSTMENT_RATE = 0.002
+HEAPED_PAID_RATE = 0.08
+NPPES_UNLISTED_RATE = 0.02
+NPPES_EXTRA_NPI_FACTOR = 2
+NPPES_FILLER_COLUMNS = 314
+
+# Rough relative provider counts; every other state or territory gets weight 1.
+STATE_WEIGHTS = {
+    "CA": 14.0,
+    "NY": 9.0,
+    "TX": 7.0,
+    "FL": 6.0,
+    "PA": 4.5,
+    "IL": 4.0,
+    "OH": 4.0,
+    "MI": 3.5,
+    "NC": 3.0,
+    "GA": 3.0,
+    "NJ": 2.5,
+    "WA": 2.5,
+    "MA": 2.5,
+    "AZ": 2.5,
+    "PR": 1.5,
+}
+
+
+def parse_scale(value: str) -> int:
+    text = value.strip().upper()
+    multiplier = {"K": 1_000, "M": 1_000_000, "B": 1_000_000_000}.get(text[-1:], 1)
+    number = text[:-1] if multiplier > 1 else text
+    return int(float(number) * multiplier)
+
+
+def uniform_sql(id_expr: str, seed: int, salt: int) -> str:
+    # HASH(id, seed, salt) barely changes with the salt (corr -0.998 between salts 5 and 8), which
+    # locks provider, code, month and amount draws together; the salt is mixed in before rehashing.
+    mix = (salt * SALT_MIX) & 0xFFFFFFFFFFFFFFFF
+    return f"((HASH(XOR(HASH({id_expr}, {seed}), {mix}::UBIGINT)) >> 11)::DOUBLE + 0.5) / 9007199254740992.0"
+
+
+def normal_sql(id_expr: str, seed: int, salt: int) -> str:
+    u1 = uniform_sql(id_expr, seed, salt)
+    u2 = uniform_sql(id_expr, seed, salt + 1)
+    return f"(SQRT(-2.0 * LN({u1})) * COS(2.0 * PI() * {u2}))"
+
+
+def skewed_index_sql(id_expr: str, seed: int, salt: int, size: int, skew: float) -> str:
+    # u ** skew piles draws onto low indexes: a few providers/codes carry most of the volume.
+    return f"CAST(FLOOR({size} * POW({uniform_sql(id_expr, seed, salt)}, {skew})) AS BIGINT)"
+
+
+def hcpcs_code_sql(idx_expr: str) -> str:
+    # Every third code is a level II code (letter + 4 digits), the rest are 5-digit CPT codes.
+    return f"""(
+          CASE
+            WHEN {idx_expr} % 3 = 0
+            THEN CHR(65 + CAST(({idx_expr} // 3) % 26 AS INTEGER)) || LPAD(CAST(({idx_expr} // 3) // 26 AS VARCHAR), 4, '0')
+            ELSE LPAD(CAST(10000 + {idx_expr} AS VARCHAR), 5, '0')
+          END
+        )"""
+
+
+def state_bounds_sql() -> str:
+    weights = [(s, STATE_WEIGHTS.get(s, 1.0)) for s in VALID_STATE_CODES]
+    total = sum(w for _, w in weights)
+    rows: list[str] = []
+    lo = 0.0
+    for state, weight in weights:
+        hi = lo + weight / total
+        rows.append(f"('{state}', {lo!r}, {hi!r})")
+        lo = hi
+    return "(VALUES " + ", ".join(rows) + ") AS bounds(state, lo, hi)"
+
+
+def write_claims(
+    con: duckdb.DuckDBPyConnection, path: Path, rows: int, providers: int, codes: int, months: int, seed: int
+) -> None:
+    def u(salt: int) -> str:
+        return uniform_sql("r", seed, salt)
+
+    con.execute(
+        f"""
+        COPY (
+          WITH ids AS (
+            SELECT CASE WHEN i > 0 AND {uniform_sql("i", seed, 1)} < {DUPLICATE_RATE} THEN i - 1 ELSE i END AS r
+            FROM range({rows}) t(i)
+          ),
+          draws AS (
+            SELECT
+              r,
+              {skewed_index_sql("r", seed, 2, providers, BILLING_SKEW)} AS billing_idx,
+              CASE
+                WHEN {u(3)} < {SAME_SERVICING_RATE} THEN NULL
+                ELSE {skewed_index_sql("r", seed, 4, providers, SERVICING_SKEW)}
+              END AS other_idx,
+              {skewed_index_sql("r", seed, 5, codes, HCPCS_SKEW)} AS code_idx,
+              CAST(FLOOR({months} * SQRT({u(6)})) AS BIGINT) AS month_idx,
+              12 + CAST(FLOOR(-60.0 * LN({u(7)})) AS BIGINT) AS claims
+            FROM ids
+          ),
+          priced AS (
+            SELECT
+              *,
+              claims
+                * EXP(3.0 + 1.2 * {normal_sql("code_idx", seed, 20)})
+                * EXP(0.3 * {normal_sql("billing_idx", seed, 22)})
+                * EXP(0.25 * {normal_sql("r", seed, 8)}) AS raw_paid
+            FROM draws
+          )
+          SELECT
+            CAST({NPI_BASE} + billing_idx AS VARCHAR) AS BILLING_PROVIDER_NPI_NUM,
+            CASE
+              WHEN {u(10)} < {MISSING_SERVICING_RATE} THEN NULL
+              ELSE CAST({NPI_BASE} + COALESCE(other_idx, billing_idx) AS VARCHAR)
+            END AS SERVICING_PROVIDER_NPI_NUM,
+            CASE WHEN {u(11)} < {MISSING_HCPCS_RATE} THEN NULL ELSE {hcpcs_code_sql("code_idx")} END AS HCPCS_CODE,
+            STRFTIME(DATE '2018-01-01' + TO_MONTHS(CAST(month_idx AS INTEGER)), '%Y-%m') AS CLAIM_FROM_MONTH,
+            GREATEST(1, CAST(ROUND(claims * (0.25 + 0.75 * {u(12)})) AS BIGINT)) AS TOTAL_UNIQUE_BENEFICIARIES,
+            claims AS TOTAL_CLAIMS,
+            CASE
+              WHEN {u(13)} < {MISSING_PAID_RATE} THEN NULL
+              WHEN {u(14)} < {ADJUSTMENT_RATE} THEN -ROUND(raw_paid, 2)
+              WHEN {u(15)} < {HEAPED_PAID_RATE} THEN ROUND(raw_paid / 25.0) * 25.0
+              ELSE ROUND(raw_paid, 2)
+            END AS TOTAL_PAID
+          FROM priced
+        ) TO '{path}' (FORMAT parquet)
+        """
+    )
+
+
+def check_claims(con: duckdb.DuckDBPyConnection, path: Path, rows: int) -> tuple[float, float]:
+    # Planted duplicates repeat a whole row; every other key repeat is an accidental collision.
+    n, keys, distinct_rows = con.execute(
+        f"""
+        SELECT
+          COUNT(*),
+          COUNT(DISTINCT HASH(BILLING_PROVIDER_NPI_NUM, SERVICING_PROVIDER_NPI_NUM, HCPCS_CODE, CLAIM_FROM_MONTH)),
+          COUNT(DISTINCT HASH(
+            BILLING_PROVIDER_NPI_NUM,
+            SERVICING_PROVIDER_NPI_NUM,
+            HCPCS_CODE,
+            CLAIM_FROM_MONTH,
+            TOTAL_UNIQUE_BENEFICIARIES,
+            TOTAL_CLAIMS,
+            TOTAL_PAID
+          ))
+        FROM read_parquet('{path}')
+        """
+    ).fetchone()
+    duplicate_rate = 1.0 - distinct_rows / n if n else 0.0
+    key_duplicate_rate = 1.0 - keys / n if n else 0.0
+    tolerance = max(0.1 * DUPLICATE_RATE, 4.0 * (DUPLICATE_RATE / max(rows, 1)) ** 0.5)
+    if abs(duplicate_rate - DUPLICATE_RATE) > tolerance:
+        raise RuntimeError(f"Synthetic duplicate rate {duplicate_rate:.4%} is not near DUPLICATE_RATE {DUPLICATE_RATE:.2%}")
+    if key_duplicate_rate > duplicate_rate + MAX_KEY_COLLISION_RATE + tolerance:
+        raise RuntimeError(
+            f"Synthetic key duplicate rate {key_duplicate_rate:.4%} exceeds duplicates {duplicate_rate:.4%} "
+            f"+ MAX_KEY_COLLISION_RATE {MAX_KEY_COLLISION_RATE:.2%}"
+        )
+    return duplicate_rate, key_duplicate_rate
+
+
+def write_nppes_zip(con: duckdb.DuckDBPyConnection, path: Path, providers: int, seed: int) -> None:
+    # Claim NPIs (minus a few unlisted ones) plus unrelated NPIs, so the lookup has to filter.
+    npis = providers * (1 + NPPES_EXTRA_NPI_FACTOR)
+    filler = ",\n".join(f"'' AS \"Other Column {k}\"" for k in range(1, NPPES_FILLER_COLUMNS + 1))
+    csv_path = path.with_suffix(".csv")
+    state_u = uniform_sql("l.n", seed, 40)
+    con.execute(
+        f"""
+        COPY (
+          WITH listed AS (
+            SELECT n, CASE WHEN {uniform_sql("n", seed, 41)} < 0.7 THEN '1' ELSE '2' END AS entity
+            FROM range({npis}) t(n)
+            WHERE n >= {providers} OR {uniform_sql("n", seed, 42)} >= {NPPES_UNLISTED_RATE}
+          ),
+          placed AS (
+            SELECT
+              l.n,
+              l.entity,
+              CASE WHEN {uniform_sql("l.n", seed, 43)} < 0.003 THEN 'ZZ' ELSE bounds.state END AS home_state,
+              {uniform_sql("l.n", seed, 44)} AS u_addr
+            FROM listed l
+            JOIN {state_bounds_sql()} ON {state_u} >= bounds.lo AND {state_u} < bounds.hi
+          )
+          SELECT
+            CAST({NPI_BASE} + n AS VARCHAR) AS "NPI",
+            entity AS "Entity Type Code",
+            '' AS "Replacement NPI",
+            '' AS "Employer Identification Number (EIN)",
+            CASE WHEN entity = '2' THEN 'SYNTHETIC ORG ' || CAST(n AS VARCHAR) ELSE '' END
+              AS "Provider Organization Name (Legal Business Name)",
+            CASE WHEN entity = '1' THEN 'PROVIDER' || CAST(n AS VARCHAR) ELSE '' END AS "Provider Last Name (Legal Name)",
+            CASE WHEN entity = '1' THEN 'SYNTH' ELSE '' END AS "Provider First Name",
+            CAST(n % 9999 + 1 AS VARCHAR) || ' MAIN ST' AS "Provider First Line Business Mailing Address",
+            'CITY ' || CAST(n % 997 AS VARCHAR) AS "Provider Business Mailing Address City Name",
+            CASE WHEN u_addr < 0.05 THEN 'DC' ELSE home_state END AS "Provider Business Mailing Address State Name",
+            LPAD(CAST(n % 99999 AS VARCHAR), 5, '0') AS "Provider Business Mailing Address Postal Code",
+            CAST(n % 9999 + 1 AS VARCHAR) || ' CLINIC RD' AS "Provider First Line Business Practice Location Address",
+            'CITY ' || CAST(n % 997 AS VARCHAR) AS "Provider Business Practice Location Address City Name",
+            CASE WHEN u_addr > 0.97 THEN '' ELSE home_state END AS "Provider Business Practice Location Address State Name",
+            LPAD(CAST(n % 99999 AS VARCHAR), 5, '0') AS "Provider Business Practice Location Address Postal Code",
+            '207Q00000X' AS "Healthcare Provider Taxonomy Code_1",
+            {filler}
+          FROM placed
+          ORDER BY n
+        ) TO '{csv_path}' (HEADER, DELIMITER ',', FORCE_QUOTE *)
+        """
+    )
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.write(csv_path, arcname="npidata_pfile_20050523-20260208.csv")
+    csv_path.unlink()
+
+
+def generate(workdir: Path, rows: int, providers: int, codes: int, months: int, seed: int) -> bool:
+    # Returns False when workdir already holds a dataset generated with the same arguments.
+    meta = {
+        "format": SYNTH_FORMAT_VERSION,
+        "rows": rows,
+        "providers": providers,
+        "codes": codes,
+        "months": months,
+        "seed": seed,
+    }
+    meta_path = workdir / SYNTH_META_NAME
+    parquet_path = workdir / PARQUET_PATH
+    zip_path = workdir / NPPES_ZIP_PATH
+    if meta_path.exists() and parquet_path.exists() and zip_path.exists():
+        if json.loads(meta_path.read_text(encoding="utf-8")) == meta:
+            return False
+
+    parquet_path.parent.mkdir(parents=True, exist_ok=True)
+    zip_path.parent.mkdir(parents=True, exist_ok=True)
+    meta_path.unlink(missing_ok=True)
+    con = duckdb.connect()
+    con.execute("PRAGMA preserve_insertion_order=false")
+    write_claims(con, parquet_path, rows, providers, codes, months, seed)
+    check_claims(con, parquet_path, rows)
+    write_nppes_zip(con, zip_path, providers, seed)
+    con.close()
+    meta_path.write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    return True
+
+
+def default_providers(rows: int) -> int:
+    return max(1_000, rows // 250)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Write a synthetic claims parquet and NPPES-like zip with realistic skew.")
+    parser.add_argument("--rows", type=parse_scale, default=parse_scale("1M"), help="claim rows, e.g. 1M, 10M, 100M")
+    parser.add_argument("--out", type=Path, default=Path("outputs/bench/synthetic"), help="workspace root to write into")
+    parser.add_argument("--providers", type=int, default=None, help="distinct provider NPIs (default rows/250)")
+    parser.add_argument("--codes", type=int, default=DEFAULT_CODES, help="distinct HCPCS codes")
+    parser.add_argument("--months", type=int, default=DEFAULT_MONTHS, help="claim months starting 2018-01")
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    providers = args.providers or default_providers(args.rows)
+    wrote = generate(args.out, args.rows, providers, args.codes, args.months, args.seed)
+    if wrote:
+        print(f"Wrote {args.out / PARQUET_PATH}")
+        print(f"Wrote {args.out / NPPES_ZIP_PATH}")
+    else:
+        print(f"Reused {args.out} (same generator arguments)")
+
+
+if __name__ == "__main__":
+    main()